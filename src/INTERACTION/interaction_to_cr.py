@@ -1,7 +1,4 @@
 import warnings
-from commonroad.common.file_writer import CommonRoadFileWriter, OverwriteExistingFile
-from commonroad.scenario.obstacle import ObstacleType, DynamicObstacle
-from data_converters.src.planning_problem_utils import filt_traj_len
 
 __author__ = "Xiao Wang"
 __copyright__ = "TUM Cyber-Physical Systems Group"
@@ -19,146 +16,398 @@ import multiprocessing
 import numpy as np
 import pandas as pd
 
-from typing import Union, List
+from typing import Iterator, List, Set, Tuple, Union
+from collections import Counter
 
 from commonroad.scenario.scenario import Tag, Scenario, ScenarioID
 from commonroad.scenario.lanelet import LaneletNetwork
 from commonroad.common.file_reader import CommonRoadFileReader
 from commonroad.planning.planning_problem import PlanningProblemSet
 
-from data_converters.src.helper import load_yaml
-from data_converters.src.INTERACTION.obstacle_utils import generate_all_obstacles
-from data_converters.src.planning_problem_utils import (
-    generate_planning_problem,
-    NoCarException,
-    NoLengthException,
+from data_converters.src.catalog_utils import concat_catalogs
+from data_converters.src.conversion_utils import WorkUnit
+from data_converters.src.event_utils import merge_frames
+from data_converters.src.generator_utils import prefetch_generators
+from data_converters.src.helper import (
+    load_yaml,
+    print_conversion_report,
+    write_scenario,
+)
+from data_converters.src.INTERACTION.obstacle_utils import (
+    get_velocity,
+    interaction_track_table,
+)
+from data_converters.src.shard_utils import shard_locations
+from data_converters.src.track_utils import resample_tracks, TrackIndex
+from data_converters.src.kinematics_utils import track_kinematics
+from data_converters.src.lanelet_utils import (
+    LaneletGrid,
+    LaneletRegionIndex,
+    on_map_ratios,
+)
+from data_converters.src.window_utils import (
+    event_windows,
+    sliding_windows,
 )
 
 
-def generate_single_scenario(
-    output_dir,
-    id_segment,
-    tags,
-    interaction_config,
-    dt: float,
+def load_track_file(
+    path_file: str,
+    recording_dt: float,
+    x_offset_tracks: float,
+    y_offset_tracks: float,
     scenario_time_steps: int,
-    track_df: pd.DataFrame,
-    lanelet_network: LaneletNetwork,
-    benchmark_id: str,
-    obstacle_start_at_zero: bool = True,
-    keep_ego: bool = False,
-    num_planning_problems: int = 1,
-):
-    # if (id_segment + 1) % 10 == 0 or (id_segment + 1) == num_segments: print(
-    #     f"\t{id_segment + 1} / {num_segments} segments processed.")
-
-    # generate scenario of current segment
-    # time of scenario
-    if "length" not in track_df.columns:
-        raise NoLengthException(f"Track_df index has no length information.")
-    time_start_scenario = id_segment * scenario_time_steps + 1
-    time_end_scenario = (id_segment + 1) * scenario_time_steps + 1
-
-    # create CommonRoad scenario object
-    scenario = Scenario(dt=dt, scenario_id=ScenarioID.from_benchmark_id(benchmark_id, "2020a"))
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    lanelet_grid: Union[LaneletGrid, None] = None,
+    min_on_map_ratio: Union[float, None] = None,
+    report: Union[Counter, None] = None,
+    derive_kinematics: bool = False,
+) -> Tuple[pd.DataFrame, pd.DataFrame, float, int]:
+    """
+    Reads a track file of INTERACTION, resamples its tracks and translates them into the frame of the map
 
-    # add lanelet network to scenario
-    scenario.add_objects(lanelet_network)
+    :param path_file: path to the track file
+    :param recording_dt: time step size of the dataset
+    :param x_offset_tracks: x-offset of the tracks with respect to the map
+    :param y_offset_tracks: y-offset of the tracks with respect to the map
+    :param scenario_time_steps: maximal number of time steps per CommonRoad scenario
+    :param downsample: resample states of trajectories of dynamic obstacles every downsample steps
+    :param target_dt: time step size of the generated scenarios, overrides downsample
+    :param lanelet_grid: lanelet grid of the map, only required for min_on_map_ratio
+    :param min_on_map_ratio: minimal fraction of the positions of a car within the lanelets of the map, cars mostly
+    off the map are removed, all cars are kept if None
+    :param report: counter of the removed tracks, updated in place
+    :param derive_kinematics: whether the acceleration, yaw rate and jerk of all tracks are derived, see
+    kinematics_utils.track_kinematics
+    :return: tracks, first and last time step and agent type per track ID, time step size and number of segments
+    """
+    track_df = pd.read_csv(path_file, header=0)
+    # rounded instead of floored, the timestamps jitter around the multiples of the time step size
+    track_df["timestamp_ms"] = np.round(track_df["timestamp_ms"] / 1000.0 / recording_dt).astype(int)
 
-    # add all obstacles to scenario
-    scenario = generate_all_obstacles(
-        scenario,
+    # resample tracks to the time step size of the scenarios
+    track_df, dt = resample_tracks(
         track_df,
-        obstacle_start_at_zero,
-        time_start_scenario,
-        time_end_scenario,
+        "track_id",
+        "timestamp_ms",
+        recording_dt,
+        downsample,
+        target_dt,
+        angle_columns={"psi_rad": 2 * np.pi},
     )
+    time_min = track_df.timestamp_ms.min()
+    time_max = track_df.timestamp_ms.max()
+    num_segments = int((time_max - time_min) / scenario_time_steps)
 
-    # skip if there is only a few obstacles in the scenario
-    if len(scenario.dynamic_obstacles) < num_planning_problems:
-        return
+    # translate all positions
+    track_df["x"] -= x_offset_tracks
+    track_df["y"] -= y_offset_tracks
 
-    # generate planning problems
-    planning_problem_set = PlanningProblemSet()
-    filt_car_obstacles = []
-    # change the number of planning problems in the CHN Merging Scenario
-    if scenario.scenario_id.country_id == "CHN" and scenario.scenario_id.map_name == "Merging":
-        car_obstacles = [
-            obstacle
-            for obstacle in scenario.dynamic_obstacles
-            if obstacle.obstacle_type == ObstacleType.CAR and obstacle.initial_state.time_step == 0
-        ]
-        # add all car obstacles to planning problem set
-        filt_car_obstacles = filt_traj_len(car_obstacles)
-        num_planning_problems = len(filt_car_obstacles)
-
-    for i in range(num_planning_problems):
-        dynamic_obstacle_selected = filt_car_obstacles[i] if filt_car_obstacles else None
-        planning_problem = generate_planning_problem(
-            scenario,
-            keep_ego=keep_ego,
-            dynamic_obstacle_selected=dynamic_obstacle_selected,
+    if min_on_map_ratio is not None:
+        # pedestrians and bicycles use sidewalks and are kept
+        ratios = on_map_ratios(lanelet_grid, track_df.track_id.values, track_df.x.values, track_df.y.values)
+        cars = track_df.groupby("track_id").agent_type.first() == "car"
+        off_map_ids = ratios.index[cars.reindex(ratios.index).values & (ratios.values < min_on_map_ratio)]
+        if report is not None:
+            report["removed_off_map_tracks"] += len(off_map_ids)
+        track_df = track_df[~track_df.track_id.isin(off_map_ids)]
+
+    if derive_kinematics:
+        track_df = track_df.sort_values(["track_id", "timestamp_ms"], kind="stable").reset_index(drop=True)
+        kinematics = track_kinematics(
+            track_df.track_id.values, get_velocity(track_df).values, track_df.psi_rad.values, dt
         )
-        planning_problem_set.add_planning_problem(planning_problem)
-
-    # write new scenario
-    fw = CommonRoadFileWriter(
-        scenario,
-        planning_problem_set,
-        interaction_config.get("author"),
-        interaction_config.get("affiliation"),
-        interaction_config.get("source"),
-        tags,
+        track_df[kinematics.columns] = kinematics.values
+
+    tracks_meta_df = track_df.groupby("track_id").agg(
+        initial_frame=("timestamp_ms", "min"),
+        final_frame=("timestamp_ms", "max"),
+        agent_type=("agent_type", "first"),
     )
-    filename = os.path.join(output_dir, "{}.xml".format(scenario.scenario_id))
-    if obstacle_start_at_zero is True:
-        check_validity = True
+    return track_df, tracks_meta_df, dt, num_segments
+
+
+def number_segments(
+    id_config_first: int,
+    too_few_obstacles: np.ndarray,
+    no_ego_candidate: np.ndarray,
+    colliding: np.ndarray,
+    has_length: bool = True,
+) -> Tuple[np.ndarray, int]:
+    """
+    Numbers the segments of a track file, the configuration ids continue over the track files of a map. Segments with
+    too few obstacles keep their configuration id as if they were generated, segments without ego vehicle candidates,
+    with overlapping footprints or of track files without length information do not consume one. The numbering only
+    depends on the pre-screening, so that the converter, the export and the catalog agree independent of the catalog
+    filter and of the segments discarded while they are generated.
+
+    :param id_config_first: configuration id of the first segment which consumes one
+    :param too_few_obstacles: boolean mask of the segments with too few obstacles, see
+    conversion_utils.WorkUnit.prescreen
+    :param no_ego_candidate: boolean mask of the segments without ego vehicle candidates
+    :param colliding: boolean mask of the segments with overlapping footprints
+    :param has_length: whether the track file provides the extents of the vehicles
+    :return: configuration id of each segment and the first configuration id of the next track file
+    """
+    consumes = too_few_obstacles | (~(no_ego_candidate | colliding) & has_length)
+    return id_config_first + np.cumsum(consumes) - consumes, id_config_first + int(np.sum(consumes))
+
+
+def load_lanelet_network(location: str, map_dir: str, interaction_config) -> LaneletNetwork:
+    """
+    Reads the lanelet network of a map
+
+    :param location: location name
+    :param map_dir: path the directory of pre-generated .xml map files
+    :param interaction_config: configuration dictionary
+    :return: lanelet network of the map
+    """
+    path_map = f"{os.path.join(os.getcwd(), map_dir, interaction_config['maps'][location])}.xml"
+    assert os.path.isfile(path_map), f"Map file {path_map} not found."
+    return CommonRoadFileReader(path_map).open_lanelet_network()
+
+
+def get_locations(input_dir: str, interaction_config, shard: Union[Tuple[int, int], None] = None) -> List[str]:
+    """
+    Lists the locations of the maps to convert
+
+    :param input_dir: path to raw dataset directory
+    :param interaction_config: configuration dictionary
+    :param shard: index and number of shards, see shard_utils.shard_locations, all maps if None
+    :return: location names
+    """
+    locations = list(interaction_config["locations"].values())
+    directories = [os.path.join(input_dir, interaction_config["directory_data"][location]) for location in locations]
+    return shard_locations(shard, locations, directories)
+
+
+def get_segments(
+    track_df: pd.DataFrame,
+    num_segments: int,
+    scenario_time_steps: int,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    lanelet_network: Union[LaneletNetwork, None] = None,
+    lanelet_grid: Union[LaneletGrid, None] = None,
+) -> Tuple[np.ndarray, int]:
+    """
+    Separates a track file into consecutive segments, slides overlapping segments over it or places segments around
+    the merges of its tracks, i.e., the transitions into merging lanelets and the lateral lanelet changes
+
+    :param track_df: tracks of the track file in the frame of the map
+    :param num_segments: number of consecutive segments of the track file
+    :param scenario_time_steps: maximal number of time steps per CommonRoad scenario
+    :param event_margins: time steps of a window before and after its event, consecutive windows if None
+    :param stride: time steps between the starts of consecutive windows, overlapping windows if smaller than
+    the window length, disjoint windows if None; ignored for event windows
+    :param lanelet_network: lanelet network of the map, only required for event_margins
+    :param lanelet_grid: lanelet grid of the lanelet network, built once per map, only required for event_margins
+    :return: first time step of each segment and number of time steps per segment
+    """
+    frames = track_df.timestamp_ms.values
+    if event_margins is None and stride is None:
+        segment_time_steps = scenario_time_steps
+        time_starts_scenario = np.arange(num_segments) * scenario_time_steps + 1
+    elif event_margins is None:
+        segment_time_steps = scenario_time_steps
+        time_starts_scenario, _ = sliding_windows(int(frames.min()), int(frames.max()), segment_time_steps, stride)
     else:
-        check_validity = False
-    fw.write_to_file(filename, OverwriteExistingFile.ALWAYS, check_validity=check_validity)
-    # print("Scenario file stored in {}".format(filename))
+        segment_time_steps = sum(event_margins)
+        tracks_df = TrackIndex(track_df, "track_id", "timestamp_ms").tracks_df
+        lanelet_ids = lanelet_grid.assign(tracks_df.x.values, tracks_df.y.values)
+        merges = merge_frames(tracks_df.track_id.values, tracks_df.timestamp_ms.values, lanelet_ids, lanelet_network)
+        time_starts_scenario, _ = event_windows(merges, *event_margins, int(frames.min()), int(frames.max()))
+    # the frames derived from the timestamps can have gaps and repetitions, segments start at a frame recorded exactly
+    # once so that the obstacles have a unique state at time step zero
+    repeated = track_df.duplicated(["track_id", "timestamp_ms"], keep=False).values
+    start_frames = np.setdiff1d(frames, frames[repeated])
+    time_starts_scenario = start_frames[
+        np.minimum(np.searchsorted(start_frames, time_starts_scenario), len(start_frames) - 1)
+    ]
+    return np.unique(time_starts_scenario), segment_time_steps
 
 
-def generate_scenarios_for_map(
+def iter_track_files(
+    location: str,
+    directory_data: str,
+    interaction_config,
+    scenario_time_steps: int,
+    obstacle_start_at_zero: bool,
+    num_planning_problems: int,
+    keep_ego: bool,
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    collision_screen: bool = False,
+    min_on_map_ratio: Union[float, None] = None,
+    derive_kinematics: bool = False,
+    lanelet_network: Union[LaneletNetwork, None] = None,
+    lanelet_grid: Union[LaneletGrid, None] = None,
+    report: Union[Counter, None] = None,
+    min_ego_arc_length: float = 0.0,
+    critical_ego: bool = False,
+) -> Iterator[Tuple[str, float, TrackIndex, WorkUnit, List[str]]]:
+    """
+    Loads the track files of one map one by one and separates each into pre-screened segments, the configuration ids
+    of the benchmark IDs continue over the track files, see number_segments
+
+    :param location: location name
+    :param directory_data: path to the track files of the map
+    :param interaction_config: configuration dictionary
+    :param scenario_time_steps: maximal number of time steps per CommonRoad scenario
+    :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to have time step zero
+    :param num_planning_problems: number of planning problems per CommonRoad scenario
+    :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
+    :param downsample: resample states of trajectories of dynamic obstacles every downsample steps
+    :param target_dt: time step size of the generated scenarios, overrides downsample
+    :param event_margins: time steps of a window before and after its event, consecutive windows if None
+    :param stride: time steps between the starts of consecutive windows, overlapping windows if smaller than
+    the window length, disjoint windows if None; ignored for event windows
+    :param collision_screen: whether windows with overlapping footprints at their first frame or along the
+    trajectories of their ego candidates are discarded before their obstacles are built
+    :param min_on_map_ratio: minimal fraction of the positions of a vehicle within the lanelets of the map, vehicles
+    mostly off the map are removed before obstacles are generated, all vehicles are kept if None
+    :param derive_kinematics: whether the accelerations and yaw rates of the states are derived from the tracks,
+    see kinematics_utils.track_kinematics
+    :param lanelet_network: lanelet network of the map, only required for event_margins
+    :param lanelet_grid: lanelet grid of the map, only required for min_on_map_ratio and event_margins
+    :param report: counter of the removed tracks and of the windows skipped by the pre-screening, per reason,
+    updated in place
+    :param min_ego_arc_length: minimal length of the path driven by a car within a window to be selected as its ego
+    vehicle
+    :param critical_ego: whether the most critical ego candidates of each window become its ego vehicles instead of
+    random ones, see conversion_utils.WorkUnit.ego_scores
+    :return: iterator over the path, the time step size, the index of the tracks in the order of the rows of the
+    track table, the work unit and the benchmark ID of each segment of each track file
+    """
+    x_offset_tracks = interaction_config["offsets"][location]["x_offset_tracks"]
+    y_offset_tracks = interaction_config["offsets"][location]["y_offset_tracks"]
+    recording_dt = interaction_config["dt"]
+
+    # all cars of a CHN Merging scenario with a path longer than 100 m are used for planning problems
+    map_scenario_id = ScenarioID.from_benchmark_id("{0}_1_T-1".format(location), "2020a")
+    all_cars_to_planning_problems = map_scenario_id.country_id == "CHN" and map_scenario_id.map_name == "Merging"
+
+    # this specifies the configuration id of scenario
+    id_config_scenario = 1
+    for path_file in sorted(glob.glob(os.path.join(directory_data, "*.csv"))):
+        track_df, _, dt, num_segments = load_track_file(
+            path_file,
+            recording_dt,
+            x_offset_tracks,
+            y_offset_tracks,
+            scenario_time_steps,
+            downsample,
+            target_dt,
+            lanelet_grid,
+            min_on_map_ratio,
+            report,
+            derive_kinematics,
+        )
+        time_starts_scenario, segment_time_steps = get_segments(
+            track_df, num_segments, scenario_time_steps, event_margins, stride, lanelet_network, lanelet_grid
+        )
+
+        # overlapping segments slice the same tracks, which are normalized and indexed once per track file
+        track_index = TrackIndex(track_df, "track_id", "timestamp_ms")
+        work_unit = WorkUnit(
+            "INTERACTION",
+            interaction_track_table(track_index.tracks_df),
+            time_starts_scenario,
+            time_starts_scenario + segment_time_steps,
+            num_planning_problems,
+            keep_ego,
+            obstacle_start_at_zero,
+            min_obstacles=num_planning_problems,
+            all_cars_min_arc_length=100.0 if all_cars_to_planning_problems else None,
+            min_ego_arc_length=min_ego_arc_length,
+            critical_ego=critical_ego,
+            # the states of an obstacle are not cut at the end of its segment
+            cut_at_window_end=False,
+        )
+        too_few_obstacles, no_ego_candidate, colliding = work_unit.prescreen(collision_screen, report)
+        config_ids, id_config_scenario = number_segments(
+            id_config_scenario, too_few_obstacles, no_ego_candidate, colliding, "length" in track_df.columns
+        )
+        benchmark_ids = ["{0}_{1}_T-1".format(location, id_config) for id_config in config_ids]
+        yield path_file, dt, track_index, work_unit, benchmark_ids
+
+
+def iter_scenarios_for_map(
     location: str,
     map_dir: str,
     input_dir: str,
-    output_dir: str,
     interaction_config,
     scenario_time_steps=100,
     obstacle_start_at_zero: bool = True,
     num_planning_problems: int = 1,
     keep_ego: bool = False,
-):
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    report: Union[Counter, None] = None,
+    benchmark_ids: Union[Set[str], None] = None,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    lanelet_assignment: bool = False,
+    collision_screen: bool = False,
+    min_on_map_ratio: Union[float, None] = None,
+    derive_kinematics: bool = False,
+    crop_radius: Union[float, None] = None,
+    seed: Union[int, None] = None,
+    min_ego_arc_length: float = 0.0,
+    critical_ego: bool = False,
+) -> Iterator[Tuple[Scenario, PlanningProblemSet]]:
     """
-    Generate CommonRoad scenarios with given paths to INTERACTION for a folder of tracks for one map,
-    each map has several tracks, each track can be separated into multiple scenarios
+    Generate CommonRoad scenarios with given paths to INTERACTION for a folder of tracks for one map segment by
+    segment, each map has several tracks, each track can be separated into multiple scenarios
 
     :param location: location name
     :param map_dir: path the directory of pre-generated .xml map files
     :param input_dir: path to raw dataset directory
-    :param output_dir: path to output directory
     :param interaction_config: configuration dictionary
     :param scenario_time_steps: maximal number of time steps per CommonRoad scenario
     :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to have time step zero
     :param num_planning_problems: number of planning problems per CommonRoad scenario
     :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
-    :param dt:
-    :return:
+    :param downsample: resample states of trajectories of dynamic obstacles every downsample steps
+    :param target_dt: time step size of the generated scenarios, overrides downsample
+    :param report: counter of the generated scenarios and of the windows skipped by the pre-screening, per reason,
+    updated in place
+    :param benchmark_ids: benchmark IDs of the windows to convert, e.g., selected from a catalog, all if None
+    :param event_margins: time steps of a window before and after its event, consecutive windows if None
+    :param stride: time steps between the starts of consecutive windows, overlapping windows if smaller than
+    the window length, disjoint windows if None; ignored for event windows
+    :param lanelet_assignment: boolean indicating if the lanelets of the obstacles and of the goals of the
+    planning problems are assigned
+    :param collision_screen: whether windows with overlapping footprints at their first frame or along the
+    trajectories of their ego candidates are discarded before their obstacles are built
+    :param min_on_map_ratio: minimal fraction of the positions of a vehicle within the lanelets of the map, vehicles
+    mostly off the map are removed before obstacles are generated, all vehicles are kept if None
+    :param derive_kinematics: whether the accelerations and yaw rates of the states are derived from the tracks,
+    see kinematics_utils.track_kinematics
+    :param crop_radius: distance from the routes of the ego vehicles up to which lanelets and obstacles are kept,
+    see lanelet_utils.crop_scenario, the whole map is kept if None
+    :param seed: seed of the random number generators of the windows which choose the ego vehicles, see
+    planning_problem_utils.window_rng, every choice is seeded with zero if None
+    :param min_ego_arc_length: minimal length of the path driven by a car within a window to be selected as its ego
+    vehicle, see conversion_utils.WorkUnit
+    :param critical_ego: whether the most critical ego candidates of each window become its ego vehicles instead of
+    random ones, see conversion_utils.WorkUnit.ego_scores
+    :return: iterator over the scenarios with their planning problems
     """
+    if report is None:
+        report = Counter()
 
     prefix_name = (location + "_",)
     path_map = f"{os.path.join(os.getcwd(), map_dir, interaction_config['maps'][location])}.xml"
     directory_data = os.path.join(input_dir, interaction_config["directory_data"][location])
-    directory_output = os.path.join(os.getcwd(), output_dir, f"{location}/")
 
     if not os.path.exists(directory_data):
         warnings.warn(f"Directory {directory_data} does not exist, skipping this map.")
-        return 0
-    x_offset_tracks = interaction_config["offsets"][location]["x_offset_tracks"]
-    y_offset_tracks = interaction_config["offsets"][location]["y_offset_tracks"]
+        return
     tags = [Tag(tag) for tag in interaction_config["tags"][location].split(" ")]
-    dt = interaction_config["dt"]
 
     # check validity of map file
     assert os.path.isfile(path_map), f"Scenarios with prefix <{prefix_name}> not created. Map file not found."
@@ -166,57 +415,124 @@ def generate_scenarios_for_map(
     # open map and read in scenario and planning problems (empty at the moment)
     scenario_source, _ = CommonRoadFileReader(path_map).open()
 
-    # create output directory
-    os.makedirs(directory_output, exist_ok=True)
-
     # get list of directories in the data directory
     path_files = sorted(glob.glob(os.path.join(directory_data, "*.csv")))
     assert len(path_files), f"Scenarios with prefix <{prefix_name}> not created. Recorded track files not found."
 
-    # this specifies the configuration id of scenario
-    id_config_scenario = 1
-
     # prepare lanelet network for scenarios from the given source
     lanelet_network = copy.deepcopy(scenario_source.lanelet_network)
+    lanelet_grid = (
+        LaneletGrid(lanelet_network)
+        if lanelet_assignment or min_on_map_ratio is not None or crop_radius is not None or event_margins is not None
+        else None
+    )
+    region_index = LaneletRegionIndex(lanelet_network, lanelet_grid) if crop_radius is not None else None
 
     # iterate through record files
-    for path_file in path_files:
-        track_df = pd.read_csv(path_file, header=0)
-        track_df["timestamp_ms"] = (track_df["timestamp_ms"] / 1000.0 // dt).astype(int)
-        time_min = track_df.timestamp_ms.min()
-        time_max = track_df.timestamp_ms.max()
-        num_segments = int((time_max - time_min) / scenario_time_steps)
-
-        # translate all positions
-        track_df["x"] -= x_offset_tracks
-        track_df["y"] -= y_offset_tracks
-
-        for id_segment in range(num_segments):
-            benchmark_id = "{0}_{1}_T-1".format(location, id_config_scenario)
-            try:
-                generate_single_scenario(
-                    directory_output,
-                    id_segment,
-                    tags,
-                    interaction_config,
-                    dt,
-                    scenario_time_steps,
-                    track_df,
-                    lanelet_network,
-                    benchmark_id,
-                    obstacle_start_at_zero=obstacle_start_at_zero,
-                    keep_ego=keep_ego,
-                    num_planning_problems=num_planning_problems,
-                )
-                id_config_scenario += 1
-            except NoCarException as e:
-                print(f"No car in this scenario: {repr(e)}. Skipping this scenario.")
-            except NoLengthException as e:
-                print(f"No length information in this scenario: {repr(e)}. Skipping this scenario.")
-
-    id_config_scenario -= 1
-
-    return id_config_scenario
+    for path_file, dt, track_index, work_unit, window_benchmark_ids in iter_track_files(
+        location,
+        directory_data,
+        interaction_config,
+        scenario_time_steps,
+        obstacle_start_at_zero,
+        num_planning_problems,
+        keep_ego,
+        downsample,
+        target_dt,
+        event_margins,
+        stride,
+        collision_screen,
+        min_on_map_ratio,
+        derive_kinematics,
+        lanelet_network,
+        lanelet_grid,
+        report,
+        min_ego_arc_length=min_ego_arc_length,
+        critical_ego=critical_ego,
+    ):
+        if "length" not in track_index.tracks_df.columns:
+            print(f"No length information in {path_file}. Skipping this file.")
+            continue
+        # the scenarios share the lanelet network of the map
+        meta_scenario = Scenario(dt=dt)
+        meta_scenario.add_objects(lanelet_network)
+        yield from work_unit.iter_scenarios(
+            window_benchmark_ids,
+            meta_scenario,
+            interaction_config,
+            tags,
+            benchmark_ids,
+            report,
+            seed,
+            lanelet_grid=lanelet_grid if lanelet_assignment else None,
+            region_index=region_index,
+            crop_radius=crop_radius,
+            copy_lanelet_network=False,
+        )
+
+
+def generate_scenarios_for_map(
+    location: str,
+    map_dir: str,
+    input_dir: str,
+    output_dir: str,
+    interaction_config,
+    scenario_time_steps=100,
+    obstacle_start_at_zero: bool = True,
+    num_planning_problems: int = 1,
+    keep_ego: bool = False,
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    benchmark_ids: Union[Set[str], None] = None,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    lanelet_assignment: bool = False,
+    collision_screen: bool = False,
+    min_on_map_ratio: Union[float, None] = None,
+    derive_kinematics: bool = False,
+    crop_radius: Union[float, None] = None,
+    seed: Union[int, None] = None,
+    min_ego_arc_length: float = 0.0,
+    critical_ego: bool = False,
+) -> Counter:
+    """
+    Generate CommonRoad scenarios with given paths to INTERACTION for a folder of tracks for one map and write them
+    to <output_dir>/<location>/, see iter_scenarios_for_map
+
+    :param output_dir: path to output directory
+    :return: number of generated scenarios and of windows skipped by the pre-screening, per reason
+    """
+    directory_output = os.path.join(os.getcwd(), output_dir, f"{location}/")
+    report = Counter()
+    for scenario, planning_problem_set in iter_scenarios_for_map(
+        location,
+        map_dir,
+        input_dir,
+        interaction_config,
+        scenario_time_steps,
+        obstacle_start_at_zero,
+        num_planning_problems,
+        keep_ego,
+        downsample,
+        target_dt,
+        report,
+        benchmark_ids,
+        event_margins,
+        stride,
+        lanelet_assignment,
+        collision_screen,
+        min_on_map_ratio,
+        derive_kinematics,
+        crop_radius,
+        seed,
+        min_ego_arc_length,
+        critical_ego,
+    ):
+        # create output directory
+        os.makedirs(directory_output, exist_ok=True)
+        write_scenario(scenario, planning_problem_set, directory_output, check_validity=obstacle_start_at_zero)
+
+    return report
 
 
 def create_interaction_scenarios(
@@ -228,6 +544,20 @@ def create_interaction_scenarios(
     keep_ego: bool = False,
     num_time_steps_scenario: int = 150,
     num_processes: int = 1,
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    benchmark_ids: Union[Set[str], None] = None,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    lanelet_assignment: bool = False,
+    collision_screen: bool = False,
+    min_on_map_ratio: Union[float, None] = None,
+    derive_kinematics: bool = False,
+    crop_radius: Union[float, None] = None,
+    seed: Union[int, None] = None,
+    shard: Union[Tuple[int, int], None] = None,
+    min_ego_arc_length: float = 0.0,
+    critical_ego: bool = False,
 ):
     """
     Iterates over all dataset files and generates CommonRoad scenarios
@@ -240,6 +570,30 @@ def create_interaction_scenarios(
     :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
     :param num_time_steps_scenario: number of time steps per CommonRoad scenario
     :param num_processes: number of parallel processes to convert raw data (Optimal=12)
+    :param downsample: resample states of trajectories of dynamic obstacles every downsample steps
+    :param target_dt: time step size of the generated scenarios, overrides downsample
+    :param benchmark_ids: benchmark IDs of the windows to convert, e.g., selected from a catalog, all if None
+    :param event_margins: time steps of a window before and after its event, consecutive windows if None
+    :param stride: time steps between the starts of consecutive windows, overlapping windows if smaller than
+    the window length, disjoint windows if None; ignored for event windows
+    :param lanelet_assignment: boolean indicating if the lanelets of the obstacles and of the goals of the
+    planning problems are assigned
+    :param collision_screen: whether windows with overlapping footprints at their first frame or along the
+    trajectories of their ego candidates are discarded before their obstacles are built
+    :param min_on_map_ratio: minimal fraction of the positions of a vehicle within the lanelets of the map, vehicles
+    mostly off the map are removed before obstacles are generated, all vehicles are kept if None
+    :param derive_kinematics: whether the accelerations and yaw rates of the states are derived from the tracks,
+    see kinematics_utils.track_kinematics
+    :param crop_radius: distance from the routes of the ego vehicles up to which lanelets and obstacles are kept,
+    see lanelet_utils.crop_scenario, the whole map is kept if None
+    :param seed: seed of the random number generators of the windows which choose the ego vehicles, see
+    planning_problem_utils.window_rng, every choice is seeded with zero if None
+    :param shard: index and number of shards, only the maps of this shard are converted, see
+    shard_utils.shard_locations, all maps if None
+    :param min_ego_arc_length: minimal length of the path driven by a car within a window to be selected as its ego
+    vehicle, see conversion_utils.WorkUnit
+    :param critical_ego: whether the most critical ego candidates of each window become its ego vehicles instead of
+    random ones, see conversion_utils.WorkUnit.ego_scores
     """
     if map_dir is None:
         map_dir = os.path.dirname(os.path.abspath(__file__)) + "/repaired_maps"
@@ -249,15 +603,16 @@ def create_interaction_scenarios(
     assert os.path.exists(map_dir), f"{map_dir} folder not found!"
 
     interaction_config = load_yaml(os.path.dirname(os.path.abspath(__file__)) + "/config.yaml")
-    print(f"Number of maps to be processed: {len(interaction_config['locations'])}")
+    locations = get_locations(input_dir, interaction_config, shard)
+    print(f"Number of maps to be processed: {len(locations)}")
 
     # iterate through the config and process the scenarios
-    sum_scenarios = 0
+    report = Counter()
     if num_processes < 2:
-        for idx, location in enumerate(interaction_config["locations"].values()):
-            print(f"\nProcessing {idx + 1} / {len(interaction_config['locations'])}:")
+        for idx, location in enumerate(locations):
+            print(f"\nProcessing {idx + 1} / {len(locations)}:")
 
-            num_scenarios = generate_scenarios_for_map(
+            report += generate_scenarios_for_map(
                 location,
                 map_dir,
                 input_dir,
@@ -267,13 +622,23 @@ def create_interaction_scenarios(
                 obstacle_start_at_zero=obstacle_start_at_zero,
                 num_planning_problems=num_planning_problems,
                 keep_ego=keep_ego,
+                downsample=downsample,
+                target_dt=target_dt,
+                benchmark_ids=benchmark_ids,
+                event_margins=event_margins,
+                stride=stride,
+                lanelet_assignment=lanelet_assignment,
+                collision_screen=collision_screen,
+                min_on_map_ratio=min_on_map_ratio,
+                derive_kinematics=derive_kinematics,
+                crop_radius=crop_radius,
+                seed=seed,
+                min_ego_arc_length=min_ego_arc_length,
+                critical_ego=critical_ego,
             )
-        sum_scenarios += num_scenarios
-
-        print(f"""\nGenerated scenarios: {sum_scenarios}""")
     else:
         with multiprocessing.Pool(processes=num_processes) as pool:
-            pool.starmap(
+            map_reports = pool.starmap(
                 generate_scenarios_for_map,
                 [
                     (
@@ -286,7 +651,483 @@ def create_interaction_scenarios(
                         obstacle_start_at_zero,
                         num_planning_problems,
                         keep_ego,
+                        downsample,
+                        target_dt,
+                        benchmark_ids,
+                        event_margins,
+                        stride,
+                        lanelet_assignment,
+                        collision_screen,
+                        min_on_map_ratio,
+                        derive_kinematics,
+                        crop_radius,
+                        seed,
+                        min_ego_arc_length,
+                        critical_ego,
                     )
-                    for idx, location in enumerate(interaction_config["locations"].values())
+                    for location in locations
                 ],
             )
+            for map_report in map_reports:
+                report += map_report
+
+    print_conversion_report(report)
+
+
+def iter_interaction_scenarios(
+    input_dir: str,
+    map_dir: Union[str, None] = None,
+    obstacle_start_at_zero: bool = True,
+    num_planning_problems: int = 1,
+    keep_ego: bool = False,
+    num_time_steps_scenario: int = 150,
+    num_processes: int = 1,
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    prefetch: int = 4,
+    benchmark_ids: Union[Set[str], None] = None,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    lanelet_assignment: bool = False,
+    collision_screen: bool = False,
+    min_on_map_ratio: Union[float, None] = None,
+    derive_kinematics: bool = False,
+    crop_radius: Union[float, None] = None,
+    seed: Union[int, None] = None,
+    shard: Union[Tuple[int, int], None] = None,
+    min_ego_arc_length: float = 0.0,
+    critical_ego: bool = False,
+) -> Iterator[Tuple[Scenario, PlanningProblemSet]]:
+    """
+    Iterates over all dataset files and yields the CommonRoad scenarios without writing them to files.
+    Each map is a work unit; with multiple processes the scenarios are yielded in the order in which they are finished.
+
+    :param input_dir: path to dataset files
+    :param map_dir: path to folder with the preprocessed .xml files of the maps
+    :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to have time step zero
+    :param num_planning_problems: number of planning problems per CommonRoad scenario
+    :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
+    :param num_time_steps_scenario: number of time steps per CommonRoad scenario
+    :param num_processes: number of parallel processes producing scenarios
+    :param downsample: resample states of trajectories of dynamic obstacles every downsample steps
+    :param target_dt: time step size of the generated scenarios, overrides downsample
+    :param prefetch: maximal number of scenarios produced in advance by the processes
+    :param benchmark_ids: benchmark IDs of the windows to convert, e.g., selected from a catalog, all if None
+    :param event_margins: time steps of a window before and after its event, consecutive windows if None
+    :param stride: time steps between the starts of consecutive windows, overlapping windows if smaller than
+    the window length, disjoint windows if None; ignored for event windows
+    :param lanelet_assignment: boolean indicating if the lanelets of the obstacles and of the goals of the
+    planning problems are assigned
+    :param collision_screen: whether windows with overlapping footprints at their first frame or along the
+    trajectories of their ego candidates are discarded before their obstacles are built
+    :param min_on_map_ratio: minimal fraction of the positions of a vehicle within the lanelets of the map, vehicles
+    mostly off the map are removed before obstacles are generated, all vehicles are kept if None
+    :param derive_kinematics: whether the accelerations and yaw rates of the states are derived from the tracks,
+    see kinematics_utils.track_kinematics
+    :param crop_radius: distance from the routes of the ego vehicles up to which lanelets and obstacles are kept,
+    see lanelet_utils.crop_scenario, the whole map is kept if None
+    :param seed: seed of the random number generators of the windows which choose the ego vehicles, see
+    planning_problem_utils.window_rng, every choice is seeded with zero if None
+    :param shard: index and number of shards, only the maps of this shard are converted, see
+    shard_utils.shard_locations, all maps if None
+    :param min_ego_arc_length: minimal length of the path driven by a car within a window to be selected as its ego
+    vehicle, see conversion_utils.WorkUnit
+    :param critical_ego: whether the most critical ego candidates of each window become its ego vehicles instead of
+    random ones, see conversion_utils.WorkUnit.ego_scores
+    :return: iterator over the scenarios with their planning problems
+    """
+    if map_dir is None:
+        map_dir = os.path.dirname(os.path.abspath(__file__)) + "/repaired_maps"
+
+    assert os.path.exists(input_dir), f"{input_dir} folder not found!"
+    assert os.path.exists(map_dir), f"{map_dir} folder not found!"
+
+    interaction_config = load_yaml(os.path.dirname(os.path.abspath(__file__)) + "/config.yaml")
+    locations = get_locations(input_dir, interaction_config, shard)
+
+    work_units = [
+        (
+            location,
+            map_dir,
+            input_dir,
+            interaction_config,
+            num_time_steps_scenario,
+            obstacle_start_at_zero,
+            num_planning_problems,
+            keep_ego,
+            downsample,
+            target_dt,
+            None,
+            benchmark_ids,
+            event_margins,
+            stride,
+            lanelet_assignment,
+            collision_screen,
+            min_on_map_ratio,
+            derive_kinematics,
+            crop_radius,
+            seed,
+            min_ego_arc_length,
+            critical_ego,
+        )
+        for location in locations
+    ]
+    return prefetch_generators(iter_scenarios_for_map, work_units, num_processes, prefetch)
+
+
+def export_windows_for_map(
+    location: str,
+    input_dir: str,
+    output_dir: str,
+    interaction_config,
+    scenario_time_steps=100,
+    obstacle_start_at_zero: bool = True,
+    num_planning_problems: int = 1,
+    keep_ego: bool = False,
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    export_format: str = "npz",
+    benchmark_ids: Union[Set[str], None] = None,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    collision_screen: bool = False,
+    min_on_map_ratio: Union[float, None] = None,
+    map_dir: Union[str, None] = None,
+    seed: Union[int, None] = None,
+    min_ego_arc_length: float = 0.0,
+    critical_ego: bool = False,
+) -> Counter:
+    """
+    Exports the segments of the track files of one map as arrays instead of CommonRoad scenarios, one shard per track
+    file in <output_dir>/<location>/. The segments, their benchmark IDs, obstacles and ego vehicles are the same as
+    the ones of iter_scenarios_for_map; obstacles are cut at the end of their segment and the dataset provides no
+    accelerations, which are exported as NaN.
+
+    :param location: location name
+    :param input_dir: path to raw dataset directory
+    :param output_dir: path to store the shards
+    :param interaction_config: configuration dictionary
+    :param scenario_time_steps: maximal number of time steps per window
+    :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to have time step zero
+    :param num_planning_problems: number of ego vehicles per window
+    :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
+    :param downsample: resample states of trajectories of dynamic obstacles every downsample steps
+    :param target_dt: time step size of the generated scenarios, overrides downsample
+    :param export_format: npz or arrow, see write_window_arrays
+    :param benchmark_ids: benchmark IDs of the windows to convert, e.g., selected from a catalog, all if None
+    :param event_margins: time steps of a window before and after its event, consecutive windows if None
+    :param stride: time steps between the starts of consecutive windows, overlapping windows if smaller than
+    the window length, disjoint windows if None; ignored for event windows
+    :param collision_screen: whether windows with overlapping footprints at their first frame or along the
+    trajectories of their ego candidates are discarded before their obstacles are built
+    :param min_on_map_ratio: minimal fraction of the positions of a vehicle within the lanelets of the map, vehicles
+    mostly off the map are removed before obstacles are generated, all vehicles are kept if None
+    :param map_dir: path to folder with the preprocessed .xml files of the maps, only read for event_margins
+    and min_on_map_ratio
+    :param seed: seed of the random number generators of the windows which choose the ego vehicles, see
+    planning_problem_utils.window_rng, every choice is seeded with zero if None
+    :param min_ego_arc_length: minimal length of the path driven by a car within a window to be selected as its ego
+    vehicle, see conversion_utils.WorkUnit
+    :param critical_ego: whether the most critical ego candidates of each window become its ego vehicles instead of
+    random ones, see conversion_utils.WorkUnit.ego_scores
+    :return: number of windows skipped by the pre-screening, per reason
+    """
+    report = Counter()
+    directory_data = os.path.join(input_dir, interaction_config["directory_data"][location])
+    if not os.path.exists(directory_data):
+        warnings.warn(f"Directory {directory_data} does not exist, skipping this map.")
+        return report
+    directory_output = os.path.join(output_dir, location)
+
+    lanelet_network = None
+    if event_margins is not None or min_on_map_ratio is not None:
+        lanelet_network = load_lanelet_network(location, map_dir, interaction_config)
+    lanelet_grid = None if lanelet_network is None else LaneletGrid(lanelet_network)
+
+    # configuration ids continue over the track files of the map, like in iter_scenarios_for_map
+    for path_file, dt, track_index, work_unit, window_benchmark_ids in iter_track_files(
+        location,
+        directory_data,
+        interaction_config,
+        scenario_time_steps,
+        obstacle_start_at_zero,
+        num_planning_problems,
+        keep_ego,
+        downsample,
+        target_dt,
+        event_margins,
+        stride,
+        collision_screen,
+        min_on_map_ratio,
+        lanelet_network=lanelet_network,
+        lanelet_grid=lanelet_grid,
+        report=report,
+        min_ego_arc_length=min_ego_arc_length,
+        critical_ego=critical_ego,
+    ):
+        if "length" not in track_index.tracks_df.columns:
+            print(f"No length information in {path_file}. Skipping this file.")
+            continue
+        work_unit.export_windows(
+            window_benchmark_ids,
+            os.path.join(directory_output, os.path.splitext(os.path.basename(path_file))[0]),
+            dt,
+            export_format,
+            benchmark_ids,
+            report,
+            seed,
+        )
+
+    return report
+
+
+def export_interaction_windows(
+    input_dir: str,
+    output_dir: str,
+    obstacle_start_at_zero: bool = True,
+    num_planning_problems: int = 1,
+    keep_ego: bool = False,
+    num_time_steps_scenario: int = 150,
+    num_processes: int = 1,
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    export_format: str = "npz",
+    benchmark_ids: Union[Set[str], None] = None,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    collision_screen: bool = False,
+    min_on_map_ratio: Union[float, None] = None,
+    map_dir: Union[str, None] = None,
+    shard: Union[Tuple[int, int], None] = None,
+    seed: Union[int, None] = None,
+    min_ego_arc_length: float = 0.0,
+    critical_ego: bool = False,
+):
+    """
+    Iterates over all maps and exports the segments of their track files as arrays, see export_windows_for_map
+
+    :param input_dir: path to dataset files
+    :param output_dir: path to store the shards
+    :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to have time step zero
+    :param num_planning_problems: number of ego vehicles per window
+    :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
+    :param num_time_steps_scenario: number of time steps per window
+    :param num_processes: number of parallel processes, each process exports one map
+    :param downsample: resample states of trajectories of dynamic obstacles every downsample steps
+    :param target_dt: time step size of the generated scenarios, overrides downsample
+    :param export_format: npz or arrow, see write_window_arrays
+    :param benchmark_ids: benchmark IDs of the windows to convert, e.g., selected from a catalog, all if None
+    :param event_margins: time steps of a window before and after its event, consecutive windows if None
+    :param stride: time steps between the starts of consecutive windows, overlapping windows if smaller than
+    the window length, disjoint windows if None; ignored for event windows
+    :param collision_screen: whether windows with overlapping footprints at their first frame or along the
+    trajectories of their ego candidates are discarded before their obstacles are built
+    :param min_on_map_ratio: minimal fraction of the positions of a vehicle within the lanelets of the map, vehicles
+    mostly off the map are removed before obstacles are generated, all vehicles are kept if None
+    :param map_dir: path to folder with the preprocessed .xml files of the maps, only read for event_margins
+    and min_on_map_ratio
+    :param shard: index and number of shards, only the maps of this shard are converted, see
+    shard_utils.shard_locations, all maps if None
+    :param seed: seed of the random number generators of the windows which choose the ego vehicles, see
+    planning_problem_utils.window_rng, every choice is seeded with zero if None
+    :param min_ego_arc_length: minimal length of the path driven by a car within a window to be selected as its ego
+    vehicle, see conversion_utils.WorkUnit
+    :param critical_ego: whether the most critical ego candidates of each window become its ego vehicles instead of
+    random ones, see conversion_utils.WorkUnit.ego_scores
+    """
+    if map_dir is None:
+        map_dir = os.path.dirname(os.path.abspath(__file__)) + "/repaired_maps"
+    assert os.path.exists(input_dir), f"{input_dir} folder not found!"
+
+    interaction_config = load_yaml(os.path.dirname(os.path.abspath(__file__)) + "/config.yaml")
+    locations = get_locations(input_dir, interaction_config, shard)
+
+    work_units = [
+        (
+            location,
+            input_dir,
+            output_dir,
+            interaction_config,
+            num_time_steps_scenario,
+            obstacle_start_at_zero,
+            num_planning_problems,
+            keep_ego,
+            downsample,
+            target_dt,
+            export_format,
+            benchmark_ids,
+            event_margins,
+            stride,
+            collision_screen,
+            min_on_map_ratio,
+            map_dir,
+            seed,
+            min_ego_arc_length,
+            critical_ego,
+        )
+        for location in locations
+    ]
+    report = Counter()
+    if num_processes < 2:
+        for work_unit in work_units:
+            report += export_windows_for_map(*work_unit)
+    else:
+        with multiprocessing.Pool(processes=num_processes) as pool:
+            for map_report in pool.starmap(export_windows_for_map, work_units):
+                report += map_report
+
+    print_conversion_report(report)
+
+
+def catalog_for_map(
+    location: str,
+    input_dir: str,
+    interaction_config,
+    scenario_time_steps=100,
+    obstacle_start_at_zero: bool = True,
+    num_planning_problems: int = 1,
+    keep_ego: bool = False,
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    collision_screen: bool = False,
+    min_on_map_ratio: Union[float, None] = None,
+    map_dir: Union[str, None] = None,
+    min_ego_arc_length: float = 0.0,
+) -> pd.DataFrame:
+    """
+    Catalogs the segments of the track files of one map without generating them, see
+    catalog_utils.window_statistics. The benchmark IDs are numbered like in iter_scenarios_for_map.
+
+    :param location: location name
+    :param input_dir: path to raw dataset directory
+    :param interaction_config: configuration dictionary
+    :param scenario_time_steps: maximal number of time steps per CommonRoad scenario
+    :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to have time step zero
+    :param num_planning_problems: number of planning problems per CommonRoad scenario
+    :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
+    :param downsample: resample states of trajectories of dynamic obstacles every downsample steps
+    :param target_dt: time step size of the generated scenarios, overrides downsample
+    :param event_margins: time steps of a window before and after its event, consecutive windows if None
+    :param stride: time steps between the starts of consecutive windows, overlapping windows if smaller than
+    the window length, disjoint windows if None; ignored for event windows
+    :param collision_screen: whether windows with overlapping footprints at their first frame or along the
+    trajectories of their ego candidates are discarded before their obstacles are built
+    :param min_on_map_ratio: minimal fraction of the positions of a vehicle within the lanelets of the map, vehicles
+    mostly off the map are removed before obstacles are generated, all vehicles are kept if None
+    :param map_dir: path to folder with the preprocessed .xml files of the maps, only read for event_margins
+    and min_on_map_ratio
+    :param min_ego_arc_length: minimal length of the path driven by a car within a window to be selected as its ego
+    vehicle, see conversion_utils.WorkUnit
+    :return: one row per segment, segments skipped by the pre-screening have no benchmark ID
+    """
+    directory_data = os.path.join(input_dir, interaction_config["directory_data"][location])
+    if not os.path.exists(directory_data):
+        warnings.warn(f"Directory {directory_data} does not exist, skipping this map.")
+        return pd.DataFrame()
+
+    lanelet_network = None
+    if event_margins is not None or min_on_map_ratio is not None:
+        lanelet_network = load_lanelet_network(location, map_dir, interaction_config)
+    lanelet_grid = None if lanelet_network is None else LaneletGrid(lanelet_network)
+
+    catalogs = []
+    for path_file, _, track_index, work_unit, benchmark_ids in iter_track_files(
+        location,
+        directory_data,
+        interaction_config,
+        scenario_time_steps,
+        obstacle_start_at_zero,
+        num_planning_problems,
+        keep_ego,
+        downsample,
+        target_dt,
+        event_margins,
+        stride,
+        collision_screen,
+        min_on_map_ratio,
+        lanelet_network=lanelet_network,
+        lanelet_grid=lanelet_grid,
+        min_ego_arc_length=min_ego_arc_length,
+    ):
+        tracks_df = track_index.tracks_df
+        catalog = work_unit.catalog(
+            benchmark_ids,
+            os.path.join(location, os.path.basename(path_file)),
+            get_velocity(tracks_df).values,
+            tracks_df.vx.values,
+            tracks_df.vy.values,
+            tracks_df.groupby("track_id").agent_type.first(),
+            skip_reason=None if "length" in tracks_df.columns else "no_length_information",
+        )
+        catalogs.append(catalog)
+    return concat_catalogs(catalogs)
+
+
+def create_interaction_catalog(
+    input_dir: str,
+    obstacle_start_at_zero: bool = True,
+    num_planning_problems: int = 1,
+    keep_ego: bool = False,
+    num_time_steps_scenario: int = 150,
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    collision_screen: bool = False,
+    min_on_map_ratio: Union[float, None] = None,
+    map_dir: Union[str, None] = None,
+    min_ego_arc_length: float = 0.0,
+) -> pd.DataFrame:
+    """
+    Catalogs the segments of the track files of all maps, see catalog_for_map
+
+    :param input_dir: path to dataset files
+    :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to have time step zero
+    :param num_planning_problems: number of planning problems per CommonRoad scenario
+    :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
+    :param num_time_steps_scenario: number of time steps per CommonRoad scenario
+    :param downsample: resample states of trajectories of dynamic obstacles every downsample steps
+    :param target_dt: time step size of the generated scenarios, overrides downsample
+    :param event_margins: time steps of a window before and after its event, consecutive windows if None
+    :param stride: time steps between the starts of consecutive windows, overlapping windows if smaller than
+    the window length, disjoint windows if None; ignored for event windows
+    :param collision_screen: whether windows with overlapping footprints at their first frame or along the
+    trajectories of their ego candidates are discarded before their obstacles are built
+    :param min_on_map_ratio: minimal fraction of the positions of a vehicle within the lanelets of the map, vehicles
+    mostly off the map are removed before obstacles are generated, all vehicles are kept if None
+    :param map_dir: path to folder with the preprocessed .xml files of the maps, only read for event_margins
+    and min_on_map_ratio
+    :param min_ego_arc_length: minimal length of the path driven by a car within a window to be selected as its ego
+    vehicle, see conversion_utils.WorkUnit
+    :return: one row per segment
+    """
+    if map_dir is None:
+        map_dir = os.path.dirname(os.path.abspath(__file__)) + "/repaired_maps"
+    assert os.path.exists(input_dir), f"{input_dir} folder not found!"
+
+    interaction_config = load_yaml(os.path.dirname(os.path.abspath(__file__)) + "/config.yaml")
+
+    return concat_catalogs(
+        [
+            catalog_for_map(
+                location,
+                input_dir,
+                interaction_config,
+                num_time_steps_scenario,
+                obstacle_start_at_zero,
+                num_planning_problems,
+                keep_ego,
+                downsample,
+                target_dt,
+                event_margins,
+                stride,
+                collision_screen,
+                min_on_map_ratio,
+                map_dir,
+                min_ego_arc_length,
+            )
+            for location in interaction_config["locations"].values()
+        ]
+    )
@@ -1,16 +1,14 @@
 __desc__ = """
-Generates dynamic obstacles for the INTERACTION conversion
+Normalizes the tracks of the INTERACTION conversion, see schema_utils.TrackTable
 """
 
 import numpy as np
 import pandas as pd
 
-from commonroad.geometry.shape import Rectangle
-from commonroad.scenario.scenario import Scenario
-from commonroad.scenario.state import State, InitialState, PMState
-from commonroad.scenario.trajectory import Trajectory
-from commonroad.scenario.obstacle import DynamicObstacle, ObstacleType
-from commonroad.prediction.prediction import TrajectoryPrediction
+from commonroad.scenario.obstacle import ObstacleType
+
+from data_converters.src.helper import make_valid_orientations_pruned
+from data_converters.src.schema_utils import TrackTable
 
 
 def get_velocity(track_df: pd.DataFrame) -> np.array:
@@ -30,6 +28,7 @@ def get_type_obstacle_commonroad(type_agent):
         "bus": ObstacleType.BUS,
         "bicycle": ObstacleType.BICYCLE,
         "motorcycle": ObstacleType.MOTORCYCLE,
+        "pedestrian/bicycle": ObstacleType.PEDESTRIAN,
     }
 
     type_obstacle_CR = dict_conversion.get(type_agent, ObstacleType.UNKNOWN)
@@ -39,82 +38,32 @@ def get_type_obstacle_commonroad(type_agent):
     return type_obstacle_CR
 
 
-def generate_dynamic_obstacle(scenario: Scenario, track_df: pd.DataFrame, time_start_track: int) -> DynamicObstacle:
-    length = track_df.length.values[0]
-    width = track_df.width.values[0]
-
-    dynamic_obstacle_id = scenario.generate_object_id()
-    dynamic_obstacle_type = get_type_obstacle_commonroad(track_df.agent_type.values[0])
-    dynamic_obstacle_shape = Rectangle(width=width, length=length)
-
-    xs = np.array(track_df.x)
-    ys = np.array(track_df.y)
-    velocities = get_velocity(track_df)
-    orientations = np.array(track_df.psi_rad)
-
-    state_list = []
-    for i, (x, y, v, theta) in enumerate(zip(xs, ys, velocities, orientations)):
-        state_list.append(
-            InitialState(position=np.array([x, y]), velocity=v, orientation=theta, time_step=time_start_track + i)
-        )
-
-    dynamic_obstacle_initial_state = state_list[0]
-
-    dynamic_obstacle_trajectory = Trajectory(time_start_track + 1, state_list[1:])
-    dynamic_obstacle_prediction = TrajectoryPrediction(dynamic_obstacle_trajectory, dynamic_obstacle_shape)
+def interaction_track_table(track_df: pd.DataFrame) -> TrackTable:
+    """
+    Normalizes the tracks of an INTERACTION track file into a track table, the dataset provides no accelerations.
+    Track files of pedestrians and bicycles provide neither orientations nor extents, which are NaN.
 
-    return DynamicObstacle(
-        dynamic_obstacle_id,
-        dynamic_obstacle_type,
-        dynamic_obstacle_shape,
-        dynamic_obstacle_initial_state,
-        dynamic_obstacle_prediction,
+    :param track_df: data frame of the track file in the frame of the map, with integer time steps in timestamp_ms
+    :return: track table with the derived accelerations and yaw rates if present, see load_track_file
+    """
+    track_df = track_df.assign(
+        **{column: np.nan for column in ("psi_rad", "length", "width") if column not in track_df.columns}
+    )
+    agents_df = track_df.groupby("track_id").agg(
+        agent_type=("agent_type", "first"), length=("length", "first"), width=("width", "first")
+    )
+    agents_df["obstacle_type"] = [
+        get_type_obstacle_commonroad(agent_type).value for agent_type in agents_df.agent_type.values
+    ]
+    kinematics = "yaw_rate" in track_df.columns
+    return TrackTable(
+        track_df.track_id.values,
+        track_df.timestamp_ms.values,
+        track_df.x.values,
+        track_df.y.values,
+        get_velocity(track_df).values,
+        make_valid_orientations_pruned(track_df.psi_rad.values),
+        agents_df,
+        track_df.acceleration.values if kinematics else None,
+        track_df.yaw_rate.values if kinematics else None,
     )
-
-
-def generate_all_obstacles(
-    scenario: Scenario,
-    track_df: pd.DataFrame,
-    obstacle_start_at_zero: bool,
-    time_start_scenario: int,
-    time_end_scenario: int,
-):
-    # generate obstacles
-    vehicle_ids = track_df.track_id.unique()
-
-    for id_vehicle in vehicle_ids:
-        """
-        discard vehicles that (1) start after the scenario ends, or (2) end before the scenario starts.
-        for one-shot planning scenarios, we don't consider vehicles that (3) start after time step 0 as well.
-        """
-        track = track_df[(track_df.track_id == id_vehicle) & (track_df.timestamp_ms >= time_start_scenario)]
-        time_start_track = track.timestamp_ms.min()
-        time_end_track = track.timestamp_ms.max()
-
-        if len(track) == 0:
-            continue
-
-        def enough_time_steps():
-            if (
-                not obstacle_start_at_zero
-                and time_end_scenario - time_start_track < 2
-                or time_end_track - time_start_scenario < 2
-            ):
-                return False
-            elif (
-                obstacle_start_at_zero
-                and time_start_track > time_start_scenario
-                or time_end_scenario - time_start_scenario < 2
-            ):
-                return False
-            return True
-
-        if not enough_time_steps():
-            continue
-
-        time_start_track -= time_start_scenario
-        dynamic_obstacle = generate_dynamic_obstacle(scenario, track, int(time_start_track))
-
-        scenario.add_objects(dynamic_obstacle)
-
-    return scenario
@@ -0,0 +1,175 @@
+__desc__ = """
+Catalog of the windows of a dataset, computed from the track arrays before any CommonRoad object is built
+"""
+
+import os
+import re
+import numpy as np
+import pandas as pd
+from typing import List, Set, Union
+
+from data_converters.src.event_utils import transition_mask
+from data_converters.src.neighbor_utils import NeighborIndex
+from data_converters.src.track_utils import TrackIndex
+from data_converters.src.window_utils import eligibility_mask
+
+CATALOG_NAME = "catalog"
+
+
+def window_statistics(
+    track_index: TrackIndex,
+    speeds: np.ndarray,
+    vehicle_ids: np.ndarray,
+    vehicle_classes: np.ndarray,
+    initial_frames: np.ndarray,
+    final_frames: np.ndarray,
+    ego_mask: np.ndarray,
+    frame_starts: np.ndarray,
+    frame_ends: np.ndarray,
+    obstacle_start_at_zero: bool,
+    lane_ids: Union[np.ndarray, None] = None,
+    neighbor_index: Union[NeighborIndex, None] = None,
+) -> pd.DataFrame:
+    """
+    Summarizes the vehicles which would be converted to obstacles of each window.
+    All windows are summarized at once with cumulative sums over the rows of the track index, so overlapping windows
+    cost no more than back-to-back ones.
+
+    :param track_index: index of the tracks of the recording
+    :param speeds: speed of each row of the track index
+    :param vehicle_ids: ID of each vehicle
+    :param vehicle_classes: class of each vehicle
+    :param initial_frames: first frame of each vehicle
+    :param final_frames: last frame of each vehicle
+    :param ego_mask: boolean mask of shape vehicles x windows of the ego candidates, see
+    conversion_utils.WorkUnit.ego_mask
+    :param frame_starts: first frame of each window
+    :param frame_ends: last frame of each window
+    :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to start
+    at time step zero
+    :param lane_ids: lane of each row of the track index, no lane changes are counted if None
+    :param neighbor_index: neighbor index over the same track index, no density and criticality if None
+    :return: one row per window with the number of vehicles per class, their mean speed, their number of lane
+    changes, their mean number of neighbors, the number of vehicles eligible as ego vehicle and the minimal center
+    distance (min_center_distance) and time-to-collision (min_ttc) of these to their neighbors
+    """
+    frame_starts = np.asarray(frame_starts)
+    frame_ends = np.asarray(frame_ends)
+    initial_frames = np.asarray(initial_frames)
+    mask = eligibility_mask(initial_frames, final_frames, frame_starts, frame_ends, obstacle_start_at_zero)
+    vehicle_idx, window_idx = np.nonzero(mask)
+    num_windows = len(frame_starts)
+
+    # rows of each (vehicle, window) pair
+    lo, hi = track_index.rows_of_windows(
+        np.asarray(vehicle_ids)[vehicle_idx], frame_starts[window_idx], frame_ends[window_idx]
+    )
+
+    cumulative_speeds = np.concatenate(([0.0], np.cumsum(speeds)))
+    num_states = np.bincount(window_idx, weights=hi - lo, minlength=num_windows)
+    sum_speeds = np.bincount(window_idx, weights=cumulative_speeds[hi] - cumulative_speeds[lo], minlength=num_windows)
+
+    catalog = pd.DataFrame({"frame_start": frame_starts, "frame_end": frame_ends})
+    catalog["num_vehicles"] = mask.sum(axis=0)
+    for vehicle_class in np.unique(vehicle_classes):
+        is_class = (np.asarray(vehicle_classes) == vehicle_class)[:, np.newaxis]
+        catalog["num_{}".format(re.sub(r"\W+", "_", str(vehicle_class).lower()))] = (mask & is_class).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        catalog["mean_speed"] = sum_speeds / num_states
+    if lane_ids is not None:
+        # a lane change is a row whose lane differs from the previous row of the same track within the window
+        changes = transition_mask(track_index.tracks_df[track_index.id_column].values, lane_ids)
+        cumulative_changes = np.concatenate(([0.0], np.cumsum(changes)))
+        lane_changes = cumulative_changes[hi] - cumulative_changes[np.minimum(lo + 1, hi)]
+        catalog["num_lane_changes"] = np.bincount(window_idx, weights=lane_changes, minlength=num_windows).astype(int)
+    ego_mask = np.asarray(ego_mask, dtype=bool)
+    catalog["num_ego_candidates"] = ego_mask.sum(axis=0)
+    if neighbor_index is not None:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            catalog["density"] = (
+                np.bincount(window_idx, weights=neighbor_index.density(lo, hi), minlength=num_windows) / num_states
+            )
+        # the most critical ego candidate of each window
+        ego_vehicle_idx, ego_window_idx = np.nonzero(ego_mask)
+        min_center_distances, min_times_to_collision = neighbor_index.criticality(
+            np.asarray(vehicle_ids)[ego_vehicle_idx], frame_starts[ego_window_idx], frame_ends[ego_window_idx]
+        )
+        for column, values in (("min_center_distance", min_center_distances), ("min_ttc", min_times_to_collision)):
+            minimum = np.full(num_windows, np.inf)
+            np.minimum.at(minimum, ego_window_idx, values)
+            catalog[column] = np.where(catalog.num_ego_candidates > 0, minimum, np.nan)
+    return catalog
+
+
+def skip_reasons(
+    too_few_obstacles: np.ndarray, no_ego_candidate: np.ndarray, colliding: Union[np.ndarray, None] = None
+) -> np.ndarray:
+    """
+    Names the reason why the pre-screening skips a window
+
+    :param too_few_obstacles: boolean mask of the windows with too few obstacles
+    :param no_ego_candidate: boolean mask of the windows without ego vehicle candidates
+    :param colliding: boolean mask of the windows with overlapping footprints, none if None
+    :return: reason per window, empty for converted windows
+    """
+    reasons = np.where(colliding, "colliding_footprints", "") if colliding is not None else ""
+    return np.where(too_few_obstacles, "too_few_obstacles", np.where(no_ego_candidate, "no_ego_candidate", reasons))
+
+
+def concat_catalogs(catalogs: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenates the catalogs of several recordings, classes missing in a recording are counted as zero
+
+    :param catalogs: catalogs with one row per window
+    :return: catalog of all recordings
+    """
+    if len(catalogs) == 0:
+        return pd.DataFrame()
+    catalog = pd.concat(catalogs, ignore_index=True)
+    counts = [column for column in catalog.columns if column.startswith("num_")]
+    catalog[counts] = catalog[counts].fillna(0).astype(int)
+    return catalog
+
+
+def write_catalog(catalog: pd.DataFrame, output_dir: str) -> str:
+    """
+    Writes a catalog as Parquet file, or as CSV file if no Parquet engine is installed
+
+    :param catalog: catalog with one row per window
+    :param output_dir: directory of the catalog file
+    :return: path of the catalog file
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    try:
+        filename = os.path.join(output_dir, CATALOG_NAME + ".parquet")
+        catalog.to_parquet(filename, index=False)
+    except ImportError:
+        filename = os.path.join(output_dir, CATALOG_NAME + ".csv")
+        catalog.to_csv(filename, index=False)
+    return filename
+
+
+def read_catalog(filename: str) -> pd.DataFrame:
+    """
+    Reads a catalog written by write_catalog
+
+    :param filename: path of the Parquet or CSV file
+    :return: catalog with one row per window
+    """
+    if filename.endswith(".parquet"):
+        return pd.read_parquet(filename)
+    return pd.read_csv(filename, keep_default_na=False, na_values=[""])
+
+
+def select_benchmark_ids(filename: str, query: Union[str, None] = None) -> Set[str]:
+    """
+    Selects the windows to convert from a catalog
+
+    :param filename: path of the catalog, e.g., filtered by the user
+    :param query: pandas query on the columns of the catalog, e.g., "num_lane_changes > 0 and mean_speed < 20"
+    :return: benchmark IDs of the selected windows
+    """
+    catalog = read_catalog(filename)
+    if query is not None:
+        catalog = catalog.query(query)
+    return set(catalog.benchmark_id.dropna().astype(str)) - {""}
@@ -0,0 +1,151 @@
+__desc__ = """
+Broad-phase collision screening of the footprints of the tracks of a whole recording
+"""
+
+import numpy as np
+from typing import Tuple
+
+from data_converters.src.window_utils import eligibility_mask
+
+# offsets of the neighboring cells which are searched for each cell, each pair of cells is visited once
+_NEIGHBOR_CELLS = ((0, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
+
+
+def overlapping_pairs(
+    frames: np.ndarray,
+    xs: np.ndarray,
+    ys: np.ndarray,
+    orientations: np.ndarray,
+    lengths: np.ndarray,
+    widths: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Finds all pairs of rectangular footprints of the same frame which overlap. The footprints are bucketed into a
+    uniform grid whose cells are as large as the largest footprint, so that only footprints of the same or of
+    adjacent cells are candidates, and the candidates are tested at once with the separating axis theorem.
+    Footprints with unknown extent never overlap.
+
+    :param frames: frame of each footprint
+    :param xs: x-position of the center of each footprint
+    :param ys: y-position of the center of each footprint
+    :param orientations: orientation of each footprint
+    :param lengths: length of each footprint
+    :param widths: width of each footprint
+    :return: indices of the first and of the second footprint of each overlapping pair
+    """
+    frames = np.asarray(frames, dtype=np.int64)
+    centers = np.column_stack((xs, ys)).astype(float)
+    half_extents = 0.5 * np.column_stack((lengths, widths)).astype(float)
+    known = np.all(np.isfinite(centers), axis=1) & np.all(np.isfinite(half_extents), axis=1)
+    rows = np.flatnonzero(known)
+    if len(rows) < 2:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int)
+
+    # two footprints can only overlap if their centers are closer than the sum of their half diagonals
+    cell_size = max(2.0 * float(np.hypot(half_extents[rows, 0], half_extents[rows, 1]).max()), 1e-6)
+    cells = np.floor((centers[rows] - centers[rows].min(axis=0)) / cell_size).astype(np.int64)
+    num_cells = cells.max(axis=0) + 1
+    frame_offsets = frames[rows] - frames[rows].min()
+    keys = (frame_offsets * num_cells[1] + cells[:, 1]) * num_cells[0] + cells[:, 0]
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    sorted_cells = cells[order]
+
+    first, second = [], []
+    for dx, dy in _NEIGHBOR_CELLS:
+        valid = (sorted_cells[:, 0] + dx >= 0) & (sorted_cells[:, 0] + dx < num_cells[0])
+        valid &= sorted_cells[:, 1] + dy < num_cells[1]
+        positions = np.flatnonzero(valid)
+        neighbor_keys = sorted_keys[positions] + dy * num_cells[0] + dx
+        starts = np.searchsorted(sorted_keys, neighbor_keys, side="left")
+        ends = np.searchsorted(sorted_keys, neighbor_keys, side="right")
+        if (dx, dy) == (0, 0):
+            # pairs within the same cell are visited once
+            starts = np.maximum(starts, positions + 1)
+        counts = np.maximum(ends - starts, 0)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        first.append(np.repeat(positions, counts))
+        second.append(np.repeat(starts, counts) + offsets)
+    first = rows[order[np.concatenate(first)]]
+    second = rows[order[np.concatenate(second)]]
+
+    # separating axis theorem: the footprints overlap if their projections overlap on all four edge normals
+    directions = np.column_stack((np.cos(orientations), np.sin(orientations))).astype(float)
+    normals = np.column_stack((-directions[:, 1], directions[:, 0]))
+    offsets = centers[second] - centers[first]
+    overlap = np.ones(len(first), dtype=bool)
+    for axes in (directions[first], normals[first], directions[second], normals[second]):
+        radius_first = half_extents[first, 0] * np.abs(np.einsum("ij,ij->i", directions[first], axes))
+        radius_first += half_extents[first, 1] * np.abs(np.einsum("ij,ij->i", normals[first], axes))
+        radius_second = half_extents[second, 0] * np.abs(np.einsum("ij,ij->i", directions[second], axes))
+        radius_second += half_extents[second, 1] * np.abs(np.einsum("ij,ij->i", normals[second], axes))
+        overlap &= np.abs(np.einsum("ij,ij->i", offsets, axes)) < radius_first + radius_second
+    return first[overlap], second[overlap]
+
+
+def colliding_windows(
+    track_ids: np.ndarray,
+    frames: np.ndarray,
+    xs: np.ndarray,
+    ys: np.ndarray,
+    orientations: np.ndarray,
+    lengths: np.ndarray,
+    widths: np.ndarray,
+    vehicle_ids: np.ndarray,
+    initial_frames: np.ndarray,
+    final_frames: np.ndarray,
+    ego_mask: np.ndarray,
+    frame_starts: np.ndarray,
+    frame_ends: np.ndarray,
+    obstacle_start_at_zero: bool,
+) -> np.ndarray:
+    """
+    Screens windows for overlapping footprints before their obstacles are built. A window collides if the footprints
+    of two of its obstacles overlap at its first frame or if the footprint of one of its ego candidates overlaps the
+    footprint of another obstacle at any frame of the window, so that each selected ego vehicle is collision-free.
+    The overlaps of the whole recording are found once, see overlapping_pairs.
+
+    :param track_ids: track ID of each row of the tracks
+    :param frames: frame of each row
+    :param xs: x-position of the center of each row
+    :param ys: y-position of the center of each row
+    :param orientations: orientation of each row
+    :param lengths: length of the footprint of each row
+    :param widths: width of the footprint of each row
+    :param vehicle_ids: ID of each vehicle
+    :param initial_frames: first frame of each vehicle
+    :param final_frames: last frame of each vehicle
+    :param ego_mask: boolean mask of shape vehicles x windows of the ego candidates, see
+    conversion_utils.WorkUnit.ego_mask
+    :param frame_starts: first frame of each window
+    :param frame_ends: last frame of each window
+    :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to start
+    at time step zero
+    :return: boolean mask of the colliding windows
+    """
+    frame_starts = np.atleast_1d(frame_starts)
+    frame_ends = np.atleast_1d(frame_ends)
+    frames = np.asarray(frames)
+    mask = eligibility_mask(initial_frames, final_frames, frame_starts, frame_ends, obstacle_start_at_zero)
+    ego_mask = np.asarray(ego_mask, dtype=bool)
+
+    first, second = overlapping_pairs(frames, xs, ys, orientations, lengths, widths)
+    order = np.argsort(frames[first], kind="stable")
+    first, second = first[order], second[order]
+    pair_frames = frames[first]
+    # vehicles of the pairs as indices into the vehicle arrays
+    vehicle_order = np.argsort(vehicle_ids)
+    track_ids = np.asarray(track_ids)
+    first_vehicles = vehicle_order[np.searchsorted(np.asarray(vehicle_ids)[vehicle_order], track_ids[first])]
+    second_vehicles = vehicle_order[np.searchsorted(np.asarray(vehicle_ids)[vehicle_order], track_ids[second])]
+
+    colliding = np.zeros(len(frame_starts), dtype=bool)
+    lo = np.searchsorted(pair_frames, frame_starts, side="left")
+    hi = np.searchsorted(pair_frames, frame_ends, side="right")
+    for w in np.flatnonzero(hi > lo):
+        a, b = first_vehicles[lo[w] : hi[w]], second_vehicles[lo[w] : hi[w]]
+        obstacles = mask[a, w] & mask[b, w]
+        initial = obstacles & (pair_frames[lo[w] : hi[w]] == frame_starts[w])
+        ego = (ego_mask[a, w] & mask[b, w]) | (ego_mask[b, w] & mask[a, w])
+        colliding[w] = np.any(initial | ego)
+    return colliding
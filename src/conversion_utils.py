@@ -0,0 +1,513 @@
+__desc__ = """
+Conversion of the windows of a work unit, e.g., a recording or one direction of it, into CommonRoad scenarios,
+exported arrays or catalog rows, shared by all converters. The datasets only load, normalize and window their tracks.
+"""
+
+import os
+import copy
+import random
+import numpy as np
+import pandas as pd
+from collections import Counter
+from typing import Dict, Iterator, List, Sequence, Set, Tuple, Union
+
+from commonroad.planning.planning_problem import PlanningProblemSet
+from commonroad.scenario.obstacle import ObstacleType
+from commonroad.scenario.scenario import Scenario, ScenarioID, Tag
+
+from data_converters.src.catalog_utils import skip_reasons, window_statistics
+from data_converters.src.collision_utils import colliding_windows
+from data_converters.src.export_utils import build_window_arrays, Window, write_window_arrays
+from data_converters.src.helper import annotate_scenario
+from data_converters.src.lanelet_utils import assign_scenario_lanelets, crop_scenario, LaneletGrid, LaneletRegionIndex
+from data_converters.src.motion_utils import window_arc_lengths
+from data_converters.src.neighbor_utils import NeighborIndex
+from data_converters.src.planning_problem_utils import (
+    generate_planning_problem,
+    NoCarException,
+    obstacle_to_planning_problem,
+    select_ego_vehicles,
+    window_rng,
+)
+from data_converters.src.schema_utils import TrackTable
+from data_converters.src.window_utils import eligibility_mask, required_ego_candidates
+
+
+def window_scenario(meta_scenario: Scenario, benchmark_id: str, copy_lanelet_network: bool = True) -> Scenario:
+    """
+    Creates the empty scenario of a window from the scenario with the lanelet network of its map
+
+    :param meta_scenario: CommonRoad scenario with the lanelet network and the time step size
+    :param benchmark_id: CommonRoad benchmark ID of the window
+    :param copy_lanelet_network: whether each scenario gets its own copy of the meta scenario, otherwise the scenarios
+    share the lanelet network
+    :return: scenario without obstacles
+    """
+    scenario_id = ScenarioID.from_benchmark_id(benchmark_id, "2020a")
+    if str(scenario_id) != benchmark_id:
+        # the benchmark IDs of inD name the map of the recording and do not follow the CommonRoad format
+        scenario_id = benchmark_id
+    if copy_lanelet_network:
+        scenario = copy.deepcopy(meta_scenario)
+        scenario.scenario_id = scenario_id
+        return scenario
+    scenario = Scenario(dt=meta_scenario.dt, scenario_id=scenario_id)
+    scenario.add_objects(meta_scenario.lanelet_network)
+    return scenario
+
+
+class WorkUnit:
+    """
+    Windows of one track table with the settings of the conversion. The obstacles of a window are the tracks eligible
+    by their first and last frame, its ego candidates are the cars among them with a recorded state at its first
+    frame, i.e., at time step zero of the scenario, and a long enough path; the pre-screening, the scenarios, the
+    exported arrays and the catalog rows of the windows all follow from the same masks.
+    """
+
+    def __init__(
+        self,
+        dataset: str,
+        track_table: TrackTable,
+        frame_starts: np.ndarray,
+        frame_ends: np.ndarray,
+        num_planning_problems: int,
+        keep_ego: bool,
+        obstacle_start_at_zero: bool,
+        min_obstacles: int = 1,
+        ego_vehicle_ids: Union[Sequence, None] = None,
+        all_cars_min_arc_length: Union[float, None] = None,
+        cut_at_window_end: bool = True,
+        min_ego_arc_length: float = 0.0,
+        critical_ego: bool = False,
+    ):
+        """
+        :param dataset: name of the dataset, see planning_problem_utils.window_rng
+        :param track_table: tracks of the work unit
+        :param frame_starts: first frame of each window
+        :param frame_ends: last frame of each window
+        :param num_planning_problems: number of planning problems per CommonRoad scenario
+        :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
+        :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to start
+        at time step zero
+        :param min_obstacles: minimal number of dynamic obstacles of a scenario, windows with fewer are discarded
+        :param ego_vehicle_ids: ego vehicle of each window, e.g., one window per moving car; the ego vehicles are
+        selected randomly from the cars of the windows if None
+        :param all_cars_min_arc_length: all ego candidates of a window which drive a longer path become ego vehicles
+        instead of num_planning_problems random ones, e.g., CHN Merging of INTERACTION
+        :param cut_at_window_end: whether the obstacles of a scenario end at the last frame of its window
+        :param min_ego_arc_length: minimal length of the path driven by a car within a window to be selected as its
+        ego vehicle, the given ego vehicles are kept
+        :param critical_ego: whether the most critical ego candidates of a window become its ego vehicles instead of
+        random ones, see ego_scores
+        """
+        self.dataset = dataset
+        self.track_table = track_table
+        self.frame_starts = np.asarray(frame_starts)
+        self.frame_ends = np.asarray(frame_ends)
+        self.num_planning_problems = num_planning_problems
+        self.keep_ego = keep_ego
+        self.obstacle_start_at_zero = obstacle_start_at_zero
+        self.min_obstacles = min_obstacles
+        self.ego_vehicle_ids = ego_vehicle_ids
+        self.all_cars_min_arc_length = all_cars_min_arc_length
+        self.cut_at_window_end = cut_at_window_end
+        self.min_ego_arc_length = min_ego_arc_length
+        self.critical_ego = critical_ego
+        self._neighbor_index = None
+
+        # obstacles are ordered by their track ID
+        self.vehicle_ids = track_table.track_index.track_ids
+        self.initial_frames, self.final_frames = track_table.track_index.frame_ranges()
+        obstacle_types = track_table.agents_df.obstacle_type.loc[self.vehicle_ids].values
+        self.is_car = obstacle_types == ObstacleType.CAR.value
+        self.is_parked = obstacle_types == ObstacleType.PARKED_VEHICLE.value
+        self.obstacle_mask = eligibility_mask(
+            self.initial_frames, self.final_frames, self.frame_starts, self.frame_ends, obstacle_start_at_zero
+        )
+        if ego_vehicle_ids is not None:
+            # the given ego vehicle always belongs to its window
+            self.obstacle_mask |= self.vehicle_ids[:, np.newaxis] == np.asarray(ego_vehicle_ids)[np.newaxis, :]
+
+        # ego candidates of each window, a car needs a state at the first frame as the initial state of its planning
+        # problem; the duplicate rows of a frame are dropped by the track index
+        self.ego_mask = np.zeros_like(self.obstacle_mask)
+        vehicle_idx, window_idx = np.nonzero(self.obstacle_mask & self.is_car[:, np.newaxis])
+        lo, hi = track_table.track_index.rows_of_windows(
+            self.vehicle_ids[vehicle_idx], self.frame_starts[window_idx], self.frame_starts[window_idx]
+        )
+        self.ego_mask[vehicle_idx[hi > lo], window_idx[hi > lo]] = True
+        if min_ego_arc_length > 0.0:
+            vehicle_idx, window_idx = np.nonzero(self.ego_mask)
+            frame_ends = self.frame_ends[window_idx] if cut_at_window_end else self.final_frames[vehicle_idx]
+            lo, hi = track_table.track_index.rows_of_windows(
+                self.vehicle_ids[vehicle_idx], self.frame_starts[window_idx], frame_ends
+            )
+            arc_lengths = window_arc_lengths(
+                track_table.column("track_id"), track_table.column("x"), track_table.column("y"), lo, hi
+            )
+            too_short = arc_lengths < min_ego_arc_length
+            self.ego_mask[vehicle_idx[too_short], window_idx[too_short]] = False
+
+        num_windows = len(self.frame_starts)
+        self.too_few_obstacles = np.zeros(num_windows, dtype=bool)
+        self.no_ego_candidate = np.zeros(num_windows, dtype=bool)
+        self.colliding = np.zeros(num_windows, dtype=bool)
+
+    def prescreen(
+        self, collision_screen: bool = False, report: Union[Counter, None] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Predicts from the obstacle and ego candidate masks which windows would be discarded, windows with given ego
+        vehicles are not pre-screened
+
+        :param collision_screen: whether windows with overlapping footprints are discarded, see
+        collision_utils.colliding_windows
+        :param report: counter of the windows skipped by the pre-screening, per reason, updated in place
+        :return: boolean masks of the windows with too few obstacles, without ego vehicle candidates and with
+        overlapping footprints
+        """
+        if self.ego_vehicle_ids is not None:
+            return self.too_few_obstacles, self.no_ego_candidate, self.colliding
+
+        self.too_few_obstacles = self.obstacle_mask.sum(axis=0) < self.min_obstacles
+        self.no_ego_candidate = ~self.too_few_obstacles & (
+            self.ego_mask.sum(axis=0) < required_ego_candidates(self.num_planning_problems, self.keep_ego)
+        )
+        if self.all_cars_min_arc_length is not None:
+            # windows without a long enough car are generated without planning problems
+            self.no_ego_candidate[:] = False
+        if collision_screen:
+            track_ids = self.track_table.column("track_id")
+            agents_df = self.track_table.agents_df
+            self.colliding = ~(self.too_few_obstacles | self.no_ego_candidate) & colliding_windows(
+                track_ids,
+                self.track_table.column("frame"),
+                self.track_table.column("x"),
+                self.track_table.column("y"),
+                self.track_table.column("orientation"),
+                agents_df.length.loc[track_ids].values,
+                agents_df.width.loc[track_ids].values,
+                self.vehicle_ids,
+                self.initial_frames,
+                self.final_frames,
+                self.ego_mask,
+                self.frame_starts,
+                self.frame_ends,
+                self.obstacle_start_at_zero,
+            )
+        if report is not None:
+            report["skipped_too_few_obstacles"] += int(np.sum(self.too_few_obstacles))
+            report["skipped_no_ego_candidate"] += int(np.sum(self.no_ego_candidate))
+            if collision_screen:
+                report["skipped_colliding_footprints"] += int(np.sum(self.colliding))
+        return self.too_few_obstacles, self.no_ego_candidate, self.colliding
+
+    def selected_windows(
+        self,
+        benchmark_ids: Sequence[str],
+        selection: Union[Set[str], None] = None,
+        report: Union[Counter, None] = None,
+    ) -> Iterator[int]:
+        """
+        Iterates over the windows which pass the pre-screening and the catalog filter
+
+        :param benchmark_ids: benchmark ID of each window
+        :param selection: benchmark IDs of the windows to convert, e.g., selected from a catalog, all if None
+        :param report: counter of the windows skipped by the catalog filter, updated in place
+        :return: iterator over the indices of the windows
+        """
+        for window in np.flatnonzero(~(self.too_few_obstacles | self.no_ego_candidate | self.colliding)):
+            if selection is not None and benchmark_ids[window] not in selection:
+                if report is not None:
+                    report["skipped_by_catalog_filter"] += 1
+                continue
+            yield window
+
+    def generate_scenario(
+        self, window: int, scenario: Scenario, rng: Union[random.Random, None] = None
+    ) -> Union[Tuple[Scenario, PlanningProblemSet], None]:
+        """
+        Adds the obstacles of a window to a scenario and generates the planning problems of the ego vehicles of
+        select_ego_vehicles
+
+        :param window: index of the window
+        :param scenario: CommonRoad scenario with the lanelet network and the benchmark ID of the window
+        :param rng: random number generator of the window which chooses the ego vehicles, see
+        planning_problem_utils.window_rng
+        :return: scenario and planning problems, None if the scenario contains too few dynamic obstacles
+        """
+        frame_start = int(self.frame_starts[window])
+        frame_end = int(self.frame_ends[window]) if self.cut_at_window_end else None
+        planning_problem_set = PlanningProblemSet()
+        obstacles = {}
+
+        ego_vehicle_id = None
+        if self.ego_vehicle_ids is not None:
+            # create obstacle and planning problem from the track of the given ego vehicle
+            ego_vehicle_id = self.ego_vehicle_ids[window]
+            ego_obstacle = self.track_table.generate_obstacle(
+                ego_vehicle_id, scenario.generate_object_id(), frame_start, frame_end
+            )
+            if self.keep_ego:
+                scenario.add_objects(ego_obstacle)
+                obstacles[ego_vehicle_id] = ego_obstacle
+                planning_problem_id = scenario.generate_object_id()
+            else:
+                planning_problem_id = ego_obstacle.obstacle_id
+            planning_problem_set.add_planning_problem(
+                obstacle_to_planning_problem(obstacle=ego_obstacle, planning_problem_id=planning_problem_id)
+            )
+
+        # generate CR obstacles from the tracks appearing between [frame_start, frame_end]
+        for vehicle_id in self.vehicle_ids[self.obstacle_mask[:, window]]:
+            if ego_vehicle_id is not None and vehicle_id == ego_vehicle_id:
+                continue
+            print("Generating scenario {}, vehicle id {}".format(scenario.scenario_id, vehicle_id), end="\r")
+            obstacles[vehicle_id] = self.track_table.generate_obstacle(
+                vehicle_id, scenario.generate_object_id(), frame_start, frame_end
+            )
+            scenario.add_objects(obstacles[vehicle_id])
+
+        if len(scenario.dynamic_obstacles) < self.min_obstacles:
+            return None
+
+        ego_vehicle_ids = self.select_ego_vehicles(window, rng)
+        if ego_vehicle_id is not None:
+            ego_vehicle_ids = ego_vehicle_ids[1:]
+        for vehicle_id in ego_vehicle_ids:
+            planning_problem_set.add_planning_problem(
+                generate_planning_problem(
+                    scenario, keep_ego=self.keep_ego, dynamic_obstacle_selected=obstacles[vehicle_id], rng=rng
+                )
+            )
+        return scenario, planning_problem_set
+
+    def iter_scenarios(
+        self,
+        benchmark_ids: Sequence[str],
+        meta_scenario: Scenario,
+        config: Dict,
+        tags: Set[Tag],
+        selection: Union[Set[str], None] = None,
+        report: Union[Counter, None] = None,
+        seed: Union[int, None] = None,
+        lanelet_grid: Union[LaneletGrid, None] = None,
+        region_index: Union[LaneletRegionIndex, None] = None,
+        crop_radius: Union[float, None] = None,
+        copy_lanelet_network: bool = True,
+    ) -> Iterator[Tuple[Scenario, PlanningProblemSet]]:
+        """
+        Generates the CommonRoad scenarios of the windows which pass the pre-screening, window by window
+
+        :param benchmark_ids: benchmark ID of each window
+        :param meta_scenario: CommonRoad scenario with the lanelet network of the windows, see window_scenario
+        :param config: dictionary with the configuration parameters of the dataset, see helper.annotate_scenario
+        :param tags: tags of the scenarios
+        :param selection: benchmark IDs of the windows to convert, e.g., selected from a catalog, all if None
+        :param report: counter of the generated scenarios and of the skipped windows, per reason, updated in place
+        :param seed: seed of the random number generators of the windows which choose the ego vehicles, see
+        planning_problem_utils.window_rng, every choice is seeded with zero if None
+        :param lanelet_grid: lanelet grid of the map, the lanelets of the obstacles and of the goals of the planning
+        problems are assigned if given
+        :param region_index: region index of the map, only required for crop_radius
+        :param crop_radius: distance from the routes of the ego vehicles up to which lanelets and obstacles are kept,
+        see lanelet_utils.crop_scenario, the whole map is kept if None
+        :param copy_lanelet_network: whether each scenario gets its own copy of the meta scenario, see window_scenario
+        :return: iterator over the scenarios with their planning problems
+        """
+        for window in self.selected_windows(benchmark_ids, selection, report):
+            benchmark_id = benchmark_ids[window]
+            try:
+                result = self.generate_scenario(
+                    window,
+                    window_scenario(meta_scenario, benchmark_id, copy_lanelet_network),
+                    window_rng(seed, self.dataset, benchmark_id),
+                )
+            except NoCarException as e:
+                print(f"No car in this scenario: {repr(e)}. Skipping this scenario.")
+                continue
+            if result is None:
+                continue
+            if report is not None:
+                report["generated_scenarios"] += 1
+            scenario, planning_problem_set = result
+            if crop_radius is not None:
+                scenario = crop_scenario(scenario, planning_problem_set, region_index, crop_radius, report)
+            if lanelet_grid is not None:
+                assign_scenario_lanelets(scenario, planning_problem_set, lanelet_grid)
+            yield annotate_scenario(scenario, config, tags), planning_problem_set
+
+    def select_ego_vehicles(self, window: int, rng: Union[random.Random, None] = None) -> List:
+        """
+        Selects the ego vehicles of a window among its ego candidates, without building its obstacles
+
+        :param window: index of the window
+        :param rng: random number generator of the window, see planning_problem_utils.window_rng
+        :return: track IDs of the ego vehicles, the given ego vehicle of the window first
+        """
+        candidates = self.ego_mask[:, window]
+        if self.all_cars_min_arc_length is not None:
+            frame_start = int(self.frame_starts[window])
+            frame_end = int(self.frame_ends[window]) if self.cut_at_window_end else None
+            return [
+                vehicle_id
+                for vehicle_id in self.vehicle_ids[candidates]
+                if self.track_table.trajectory(vehicle_id, frame_start, frame_end).motion_summary().arc_length
+                > self.all_cars_min_arc_length
+            ]
+        if self.ego_vehicle_ids is None:
+            candidate_ids = self.vehicle_ids[candidates]
+            scores = self.ego_scores(window, candidate_ids) if self.critical_ego else None
+            return select_ego_vehicles(candidate_ids, self.num_planning_problems, self.keep_ego, rng, scores)
+
+        # the given ego vehicle is the first obstacle of its scenario
+        ego_vehicle_id = self.ego_vehicle_ids[window]
+        candidate_ids = ([ego_vehicle_id] if self.keep_ego else []) + list(
+            self.vehicle_ids[candidates & (self.vehicle_ids != ego_vehicle_id)]
+        )
+        scores = self.ego_scores(window, candidate_ids) if self.critical_ego else None
+        return [ego_vehicle_id] + select_ego_vehicles(
+            candidate_ids, self.num_planning_problems - 1, self.keep_ego, rng, scores
+        )
+
+    def ego_scores(self, window: int, candidate_ids: Sequence) -> Dict:
+        """
+        Scores ego candidates of a window by their criticality, see neighbor_utils.NeighborIndex.criticality: the
+        smaller their minimal time-to-collision to any road user within the window the higher their score, ties are
+        broken by the minimal center distance. The neighbor index is built once per work unit from the speeds and
+        orientations of the track table.
+
+        :param window: index of the window
+        :param candidate_ids: track IDs of the ego candidates
+        :return: score per track ID, see planning_problem_utils.choose_ego_vehicle
+        """
+        if self._neighbor_index is None:
+            speeds = self.track_table.column("velocity")
+            orientations = self.track_table.column("orientation")
+            self._neighbor_index = NeighborIndex(
+                self.track_table.track_index,
+                self.track_table.column("x"),
+                self.track_table.column("y"),
+                speeds * np.cos(orientations),
+                speeds * np.sin(orientations),
+            )
+        candidate_ids = np.asarray(candidate_ids)
+        min_center_distances, min_times_to_collision = self._neighbor_index.criticality(
+            candidate_ids,
+            np.full(len(candidate_ids), self.frame_starts[window]),
+            np.full(len(candidate_ids), self.frame_ends[window]),
+        )
+        return {
+            track_id: (-min_time_to_collision, -min_center_distance)
+            for track_id, min_time_to_collision, min_center_distance in zip(
+                candidate_ids.tolist(), min_times_to_collision, min_center_distances
+            )
+        }
+
+    def export_windows(
+        self,
+        benchmark_ids: Sequence[str],
+        path: str,
+        dt: float,
+        export_format: str = "npz",
+        selection: Union[Set[str], None] = None,
+        report: Union[Counter, None] = None,
+        seed: Union[int, None] = None,
+    ):
+        """
+        Exports the windows which pass the pre-screening as arrays instead of CommonRoad scenarios, into one shard.
+        The obstacles and ego vehicles are the ones of generate_scenario; parked vehicles keep their recorded states.
+
+        :param benchmark_ids: benchmark ID of each window
+        :param path: path of the shard without extension, see export_utils.write_window_arrays
+        :param dt: time step size
+        :param export_format: npz or arrow, see write_window_arrays
+        :param selection: benchmark IDs of the windows to convert, e.g., selected from a catalog, all if None
+        :param report: counter of the skipped windows, per reason, updated in place
+        :param seed: seed of the random number generators of the windows which choose the ego vehicles, see
+        planning_problem_utils.window_rng, every choice is seeded with zero if None
+        """
+        windows = []
+        for window in self.selected_windows(benchmark_ids, selection, report):
+            benchmark_id = benchmark_ids[window]
+            agents = self.obstacle_mask[:, window]
+            # scenarios with too few dynamic obstacles are discarded, see generate_scenario
+            obstacles = agents & ~self.is_parked
+            if self.ego_vehicle_ids is not None and not self.keep_ego:
+                obstacles &= self.vehicle_ids != self.ego_vehicle_ids[window]
+            if np.sum(obstacles) < self.min_obstacles:
+                continue
+            try:
+                ego_ids = self.select_ego_vehicles(window, window_rng(seed, self.dataset, benchmark_id))
+            except NoCarException as e:
+                print(f"No car in this scenario: {repr(e)}. Skipping this scenario.")
+                continue
+            windows.append(
+                Window(
+                    benchmark_id,
+                    int(self.frame_starts[window]),
+                    int(self.frame_ends[window]),
+                    self.vehicle_ids[agents],
+                    ego_ids,
+                )
+            )
+        if len(windows) == 0:
+            return
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        arrays = build_window_arrays(self.track_table, windows, dt)
+        filename = write_window_arrays(arrays, path, export_format)
+        print("{} windows exported to {}".format(len(windows), filename))
+
+    def catalog(
+        self,
+        benchmark_ids: Sequence[str],
+        recording: str,
+        speeds: np.ndarray,
+        x_velocities: np.ndarray,
+        y_velocities: np.ndarray,
+        vehicle_classes: pd.Series,
+        lane_ids: Union[np.ndarray, None] = None,
+        skip_reason: Union[str, None] = None,
+    ) -> pd.DataFrame:
+        """
+        Catalogs the windows without generating them, see catalog_utils.window_statistics
+
+        :param benchmark_ids: benchmark ID of each window
+        :param recording: name of the recording of the windows
+        :param speeds: speed of each row of the track table
+        :param x_velocities: x-velocity of each row of the track table
+        :param y_velocities: y-velocity of each row of the track table
+        :param vehicle_classes: class of each vehicle in the dataset, indexed by track ID
+        :param lane_ids: lane of each row of the track table, no lane changes are counted if None
+        :param skip_reason: reason why all windows which pass the pre-screening are skipped, e.g., missing extents
+        :return: one row per window, windows skipped by the pre-screening have no benchmark ID
+        """
+        track_index = self.track_table.track_index
+        catalog = window_statistics(
+            track_index,
+            speeds,
+            self.vehicle_ids,
+            vehicle_classes.loc[self.vehicle_ids].values,
+            self.initial_frames,
+            self.final_frames,
+            self.ego_mask,
+            self.frame_starts,
+            self.frame_ends,
+            self.obstacle_start_at_zero,
+            lane_ids=lane_ids,
+            neighbor_index=NeighborIndex(
+                track_index, self.track_table.column("x"), self.track_table.column("y"), x_velocities, y_velocities
+            ),
+        )
+        reasons = skip_reasons(self.too_few_obstacles, self.no_ego_candidate, self.colliding).astype(object)
+        if skip_reason is not None:
+            reasons[reasons == ""] = skip_reason
+        catalog.insert(0, "skip_reason", reasons)
+        catalog.insert(0, "recording", recording)
+        catalog.insert(
+            0,
+            "benchmark_id",
+            [benchmark_id if reason == "" else "" for benchmark_id, reason in zip(benchmark_ids, reasons)],
+        )
+        return catalog
@@ -0,0 +1,122 @@
+__desc__ = """
+Detection of traffic events over the tracks of a whole recording, used to place windows around them
+"""
+
+import numpy as np
+from typing import Union
+from scipy.spatial import cKDTree
+
+from commonroad.scenario.lanelet import LaneletNetwork
+
+# distance between the centers of two road users below which they interact closely [m]
+INTERACTION_DISTANCE = 3.0
+
+
+def transition_mask(track_ids: np.ndarray, labels: np.ndarray) -> np.ndarray:
+    """
+    Marks the rows whose label differs from the one of the previous row of the same track
+
+    :param track_ids: track ID of each row, the rows of a track have to be contiguous and ordered by time
+    :param labels: label of each row, e.g., a lane ID
+    :return: boolean mask over the rows
+    """
+    track_ids = np.asarray(track_ids)
+    labels = np.asarray(labels)
+    mask = np.zeros(len(labels), dtype=bool)
+    mask[1:] = (labels[1:] != labels[:-1]) & (track_ids[1:] == track_ids[:-1])
+    return mask
+
+
+def lane_change_frames(track_ids: np.ndarray, frames: np.ndarray, lane_ids: np.ndarray) -> np.ndarray:
+    """
+    Detects lane changes as transitions of the lane ID of a track
+
+    :param track_ids: track ID of each row, the rows of a track have to be contiguous and ordered by time
+    :param frames: frame of each row
+    :param lane_ids: lane ID of each row
+    :return: frame of each lane change
+    """
+    return np.asarray(frames)[transition_mask(track_ids, lane_ids)]
+
+
+def merge_frames(
+    track_ids: np.ndarray, frames: np.ndarray, lanelet_ids: np.ndarray, lanelet_network: LaneletNetwork
+) -> np.ndarray:
+    """
+    Detects merges as transitions of a track into a lanelet which joins several predecessors or into a lanelet which
+    is no successor of the previous one, i.e., a lateral change
+
+    :param track_ids: track ID of each row, the rows of a track have to be contiguous and ordered by time
+    :param frames: frame of each row
+    :param lanelet_ids: lanelet ID of each row, -1 outside of the lanelets, see lanelet_utils.assign_lanelets
+    :param lanelet_network: lanelet network of the map
+    :return: frame of each merge
+    """
+    # positions outside of the lanelets are no transitions
+    on_map = np.asarray(lanelet_ids) >= 0
+    track_ids = np.asarray(track_ids)[on_map]
+    frames = np.asarray(frames)[on_map]
+    lanelet_ids = np.asarray(lanelet_ids)[on_map]
+    rows = np.flatnonzero(transition_mask(track_ids, lanelet_ids))
+
+    merging_lanelets = {lanelet.lanelet_id for lanelet in lanelet_network.lanelets if len(set(lanelet.predecessor)) > 1}
+    successors = {
+        (lanelet.lanelet_id, successor) for lanelet in lanelet_network.lanelets for successor in lanelet.successor
+    }
+    is_merge = [
+        lanelet_id in merging_lanelets or (previous_id, lanelet_id) not in successors
+        for previous_id, lanelet_id in zip(lanelet_ids[rows - 1], lanelet_ids[rows])
+    ]
+    return frames[rows[np.asarray(is_merge, dtype=bool)]]
+
+
+def close_interaction_frames(
+    track_ids: np.ndarray,
+    frames: np.ndarray,
+    xs: np.ndarray,
+    ys: np.ndarray,
+    participants: np.ndarray,
+    distance: float = INTERACTION_DISTANCE,
+    movers: Union[np.ndarray, None] = None,
+) -> np.ndarray:
+    """
+    Detects the onsets of close interactions, i.e., the frames at which two road users, at least one of them a
+    participant, come closer than distance. All frames are queried at once with a single KD-tree whose third
+    dimension separates the frames.
+
+    :param track_ids: track ID of each row, the rows of a track have to be contiguous and ordered by time
+    :param frames: frame of each row
+    :param xs: x-position of each row
+    :param ys: y-position of each row
+    :param participants: boolean indicating for each row if it belongs to a road user whose interactions are events,
+    e.g., a car
+    :param distance: distance between the centers below which two road users interact
+    :param movers: boolean indicating for each row if the road user moves, interactions between two road users which
+    both stand still are no events; all rows move if None
+    :return: frame of each onset of a close interaction
+    """
+    track_ids = np.asarray(track_ids)
+    frames = np.asarray(frames)
+    if len(frames) < 2:
+        return np.empty(0, dtype=frames.dtype)
+    separation = 2.0 * distance + 1.0
+    tree = cKDTree(np.column_stack((xs, ys, (frames - frames.min()) * separation)))
+    pairs = tree.query_pairs(distance, output_type="ndarray")
+    participants = np.asarray(participants, dtype=bool)
+    relevant = participants[pairs[:, 0]] | participants[pairs[:, 1]]
+    if movers is not None:
+        movers = np.asarray(movers, dtype=bool)
+        relevant &= movers[pairs[:, 0]] | movers[pairs[:, 1]]
+    pairs = pairs[relevant]
+    if len(pairs) == 0:
+        return np.empty(0, dtype=frames.dtype)
+
+    # an interaction starts at a frame at which the pair of tracks was not close in the previous frame
+    first = np.minimum(track_ids[pairs[:, 0]], track_ids[pairs[:, 1]])
+    second = np.maximum(track_ids[pairs[:, 0]], track_ids[pairs[:, 1]])
+    pair_frames = frames[pairs[:, 0]]
+    order = np.lexsort((pair_frames, second, first))
+    first, second, pair_frames = first[order], second[order], pair_frames[order]
+    onsets = np.ones(len(pair_frames), dtype=bool)
+    onsets[1:] = (first[1:] != first[:-1]) | (second[1:] != second[:-1]) | (pair_frames[1:] != pair_frames[:-1] + 1)
+    return pair_frames[onsets]
@@ -0,0 +1,161 @@
+__desc__ = """
+Exports windows of recordings as fixed-size arrays for machine learning, without building CommonRoad objects
+"""
+
+import numpy as np
+from typing import Dict, List, NamedTuple
+
+from commonroad.common.file_reader import CommonRoadFileReader
+
+from data_converters.src.schema_utils import TrackTable
+
+# state attributes of the exported arrays, in the order of their last axis
+STATE_FIELDS = ("x", "y", "velocity", "orientation", "acceleration")
+
+EXPORT_FORMATS = ("npz", "arrow")
+
+
+class Window(NamedTuple):
+    """
+    Window of a recording selected for the export
+    """
+
+    benchmark_id: str
+    frame_start: int
+    frame_end: int
+    agent_ids: np.ndarray
+    ego_ids: List
+
+
+def build_window_arrays(track_table: TrackTable, windows: List[Window], dt: float) -> Dict[str, np.ndarray]:
+    """
+    Builds agents x time arrays of all windows, padded to the largest number of agents and time steps
+
+    :param track_table: tracks of the recording, accelerations which are not part of the table are exported as NaN
+    :param windows: windows to export
+    :param dt: time step size
+    :return: arrays by name
+    """
+    num_windows = len(windows)
+    num_agents = max([len(window.agent_ids) for window in windows], default=0)
+    num_time_steps = max([window.frame_end - window.frame_start + 1 for window in windows], default=0)
+
+    window_states = np.full((num_windows, num_agents, num_time_steps, len(STATE_FIELDS)), np.nan, dtype=np.float32)
+    valid = np.zeros((num_windows, num_agents, num_time_steps), dtype=bool)
+    track_ids = np.full((num_windows, num_agents), -1, dtype=np.int64)
+    agent_types = np.full((num_windows, num_agents), "", dtype="<U16")
+    shapes = np.full((num_windows, num_agents, 2), np.nan, dtype=np.float32)
+    ego_mask = np.zeros((num_windows, num_agents), dtype=bool)
+
+    track_index = track_table.track_index
+    agents_df = track_table.agents_df
+    states = track_table.state_array(STATE_FIELDS)
+    frames = track_table.column("frame")
+    for w, window in enumerate(windows):
+        agent_ids = np.asarray(window.agent_ids)
+        count = len(agent_ids)
+        track_ids[w, :count] = agent_ids
+        agent_types[w, :count] = agents_df.obstacle_type.loc[agent_ids].values
+        shapes[w, :count, 0] = agents_df.length.loc[agent_ids].values
+        shapes[w, :count, 1] = agents_df.width.loc[agent_ids].values
+        ego_mask[w, :count] = np.isin(agent_ids, window.ego_ids)
+        for a, agent_id in enumerate(agent_ids):
+            start, end = track_index.rows(agent_id, window.frame_start, window.frame_end)
+            time_steps = frames[start:end] - window.frame_start
+            window_states[w, a, time_steps] = states[start:end]
+            valid[w, a, time_steps] = True
+
+    return {
+        "benchmark_id": np.array([window.benchmark_id for window in windows], dtype=str),
+        "frame_start": np.array([window.frame_start for window in windows], dtype=np.int64),
+        "dt": np.array(dt),
+        "state_fields": np.array(STATE_FIELDS),
+        "states": window_states,
+        "valid": valid,
+        "track_id": track_ids,
+        "agent_type": agent_types,
+        "shape": shapes,
+        "ego_mask": ego_mask,
+    }
+
+
+def write_window_arrays(arrays: Dict[str, np.ndarray], path: str, export_format: str = "npz") -> str:
+    """
+    Writes the arrays of build_window_arrays to a shard.
+    NPZ shards are stored uncompressed, so that their members can be memory-mapped; Arrow shards are IPC files with
+    one row per valid state, which can be memory-mapped with pyarrow.memory_map.
+
+    :param arrays: arrays by name
+    :param path: path of the shard without extension
+    :param export_format: npz or arrow
+    :return: path of the written shard
+    """
+    if export_format == "npz":
+        filename = path + ".npz"
+        np.savez(filename, **arrays)
+        return filename
+    if export_format != "arrow":
+        raise ValueError("Unknown export format {}, expected one of {}".format(export_format, EXPORT_FORMATS))
+
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise ImportError("The arrow export requires pyarrow, install it or use the npz export") from e
+
+    window_idx, agent_idx, time_steps = np.nonzero(arrays["valid"])
+    states = arrays["states"][window_idx, agent_idx, time_steps]
+    columns = {
+        "benchmark_id": arrays["benchmark_id"][window_idx],
+        "track_id": arrays["track_id"][window_idx, agent_idx],
+        "time_step": time_steps,
+        "agent_type": arrays["agent_type"][window_idx, agent_idx],
+        "length": arrays["shape"][window_idx, agent_idx, 0],
+        "width": arrays["shape"][window_idx, agent_idx, 1],
+        "is_ego": arrays["ego_mask"][window_idx, agent_idx],
+    }
+    for i, field in enumerate(STATE_FIELDS):
+        columns[field] = states[:, i]
+    table = pa.table(columns, metadata={"dt": str(float(arrays["dt"]))})
+
+    filename = path + ".arrow"
+    with pa.OSFile(filename, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return filename
+
+
+def check_window_arrays(
+    arrays: Dict[str, np.ndarray], scenario_files: Dict[str, str], keep_ego: bool = False
+) -> List[str]:
+    """
+    Compares exported windows with the CommonRoad scenarios converted from the same windows with the same options:
+    the initial states of the ego vehicles have to be the initial states of the planning problems, and the agents
+    have to be the obstacles of the scenario and the removed ego vehicles
+
+    :param arrays: arrays of an NPZ shard, see build_window_arrays
+    :param scenario_files: path of the converted scenario per benchmark ID, see helper.write_scenario
+    :param keep_ego: boolean indicating if vehicles selected for planning problem are kept in the scenarios
+    :return: benchmark IDs of the windows which differ from their scenarios or have no scenario
+    """
+    mismatches = []
+    for w, benchmark_id in enumerate(arrays["benchmark_id"]):
+        if benchmark_id not in scenario_files:
+            mismatches.append(str(benchmark_id))
+            continue
+        scenario, planning_problem_set = CommonRoadFileReader(scenario_files[benchmark_id]).open()
+        ego_idx = np.flatnonzero(arrays["ego_mask"][w])
+        ego_positions = np.unique(np.round(arrays["states"][w, ego_idx, 0, :2].astype(float), 2), axis=0)
+        initial_positions = [
+            planning_problem.initial_state.position
+            for planning_problem in planning_problem_set.planning_problem_dict.values()
+        ]
+        initial_positions = np.unique(np.round(np.reshape(initial_positions, (-1, 2)), 2), axis=0)
+        num_obstacles = len(scenario.dynamic_obstacles) + len(scenario.static_obstacles)
+        num_agents = int(np.sum(arrays["track_id"][w] >= 0))
+        if (
+            not np.all(arrays["valid"][w, ego_idx, 0])
+            or ego_positions.shape != initial_positions.shape
+            or not np.allclose(ego_positions, initial_positions, atol=0.02)
+            or num_agents != num_obstacles + (0 if keep_ego else len(ego_idx))
+        ):
+            mismatches.append(str(benchmark_id))
+    return mismatches
@@ -0,0 +1,86 @@
+__desc__ = """
+Streams the scenarios of several work units, optionally produced by worker processes with bounded prefetching
+"""
+
+import traceback
+import multiprocessing
+from typing import Callable, Iterator, List, Sequence, Tuple
+
+# kinds of the messages sent from the workers to the consumer
+_ITEM = 0
+_DONE = 1
+_ERROR = 2
+
+
+def _produce(generator_function: Callable, task_queue, result_queue):
+    """
+    Worker loop: runs the generator function for each work unit of the task queue and forwards its items
+
+    :param generator_function: function returning an iterator over the items of a work unit
+    :param task_queue: queue with argument tuples of the work units, terminated by None
+    :param result_queue: bounded queue receiving the items
+    """
+    try:
+        for arguments in iter(task_queue.get, None):
+            for item in generator_function(*arguments):
+                result_queue.put((_ITEM, item))
+    except Exception:
+        result_queue.put((_ERROR, traceback.format_exc()))
+        return
+    result_queue.put((_DONE, None))
+
+
+def prefetch_generators(
+    generator_function: Callable,
+    work_units: Sequence[Tuple],
+    num_processes: int = 1,
+    prefetch: int = 4,
+) -> Iterator:
+    """
+    Yields the items of generator_function(*arguments) for all work units.
+    With a single process the work units are processed lazily in order. Otherwise, num_processes workers process the
+    work units concurrently and the items are yielded in the order in which they are finished; at most prefetch
+    items are waiting for the consumer, so that the memory stays bounded.
+
+    :param generator_function: module-level function returning an iterator over the items of a work unit
+    :param work_units: argument tuples of the work units
+    :param num_processes: number of worker processes
+    :param prefetch: maximal number of finished items waiting for the consumer
+    :return: iterator over the items of all work units
+    """
+    if num_processes < 2:
+        for arguments in work_units:
+            yield from generator_function(*arguments)
+        return
+
+    task_queue = multiprocessing.Queue()
+    result_queue = multiprocessing.Queue(maxsize=max(prefetch, 1))
+    for arguments in work_units:
+        task_queue.put(arguments)
+    num_workers = min(num_processes, len(work_units))
+    for _ in range(num_workers):
+        task_queue.put(None)
+
+    workers: List[multiprocessing.Process] = [
+        multiprocessing.Process(target=_produce, args=(generator_function, task_queue, result_queue), daemon=True)
+        for _ in range(num_workers)
+    ]
+    for worker in workers:
+        worker.start()
+
+    try:
+        num_finished = 0
+        while num_finished < num_workers:
+            kind, payload = result_queue.get()
+            if kind == _ITEM:
+                yield payload
+            elif kind == _DONE:
+                num_finished += 1
+            else:
+                raise RuntimeError("Worker process failed:\n{}".format(payload))
+    finally:
+        # stop the workers if the consumer stops early or a worker failed
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
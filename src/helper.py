@@ -1,7 +1,18 @@
+import os
 import ruamel.yaml
-from typing import Dict, Union
+import numpy as np
+from typing import Dict, Iterable, Tuple, Union
+from collections import Counter
 
 from commonroad.common.util import make_valid_orientation, make_valid_orientation_interval
+from commonroad.common.file_writer import CommonRoadFileWriter, OverwriteExistingFile
+from commonroad.planning.planning_problem import PlanningProblemSet
+from commonroad.scenario.scenario import Scenario, Tag
+
+TWO_PI = 2.0 * np.pi
+
+# largest orientation which is still valid after writing it to XML with 6 significant digits
+MAX_ORIENTATION = 6.283185
 
 
 def load_yaml(file_name: str) -> Union[Dict, None]:
@@ -24,7 +35,7 @@ def make_valid_orientation_pruned(orientation: float):
     Make orientation valid and prune to correct representation for XML with 6 significant digits
     """
     orientation = make_valid_orientation(orientation)
-    return max(min(orientation, 6.283185), -6.283185)
+    return max(min(orientation, MAX_ORIENTATION), -MAX_ORIENTATION)
 
 
 def make_valid_orientation_interval_pruned(o1: float, o2: float):
@@ -33,3 +44,114 @@ def make_valid_orientation_interval_pruned(o1: float, o2: float):
     """
     o1, o2 = make_valid_orientation_interval(o1, o2)
     return make_valid_orientation_pruned(o1), make_valid_orientation_pruned(o2)
+
+
+def make_valid_orientations_pruned(orientations: np.ndarray) -> np.ndarray:
+    """
+    Array version of make_valid_orientation_pruned: shifts all orientations into [-2pi, 2pi] and prunes them to
+    the correct representation for XML with 6 significant digits
+
+    :param orientations: orientations in radian
+    :return: valid orientations
+    """
+    orientations = np.asarray(orientations, dtype=float)
+    num_periods = np.maximum(np.ceil((np.abs(orientations) - TWO_PI) / TWO_PI), 0.0)
+    orientations = orientations - np.sign(orientations) * num_periods * TWO_PI
+    return np.clip(orientations, -MAX_ORIENTATION, MAX_ORIENTATION)
+
+
+def make_valid_orientation_intervals_pruned(starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Array version of make_valid_orientation_interval_pruned: shifts both ends of all intervals by the same multiple
+    of 2pi into [-2pi, 2pi] and prunes them to the correct representation for XML with 6 significant digits
+
+    :param starts: start orientations of the intervals in radian
+    :param ends: end orientations of the intervals in radian
+    :return: valid start and end orientations
+    """
+    starts = np.asarray(starts, dtype=float)
+    ends = np.asarray(ends, dtype=float)
+    num_periods = np.maximum(np.ceil((np.maximum(starts, ends) - TWO_PI) / TWO_PI), 0.0)
+    num_periods -= np.maximum(np.ceil((-TWO_PI - starts) / TWO_PI), 0.0)
+    starts = starts - num_periods * TWO_PI
+    ends = ends - num_periods * TWO_PI
+    return np.clip(starts, -MAX_ORIENTATION, MAX_ORIENTATION), np.clip(ends, -MAX_ORIENTATION, MAX_ORIENTATION)
+
+
+def headings_to_orientations(headings: np.ndarray) -> np.ndarray:
+    """
+    Converts headings in degree to valid orientations in radian, see make_valid_orientations_pruned
+
+    :param headings: headings in degree
+    :return: valid orientations in radian
+    """
+    return make_valid_orientations_pruned(np.radians(np.asarray(headings, dtype=float)))
+
+
+def annotate_scenario(scenario: Scenario, config: Dict, tags: Iterable[Tag]) -> Scenario:
+    """
+    Stores author, affiliation, source and tags of the dataset at the scenario, so that they are available without
+    writing the scenario to a file
+
+    :param scenario: CommonRoad scenario
+    :param config: configuration of the converter with author, affiliation and source
+    :param tags: tags of the scenario
+    :return: annotated scenario
+    """
+    scenario.author = config.get("author")
+    scenario.affiliation = config.get("affiliation")
+    scenario.source = config.get("source")
+    scenario.tags = set(tags)
+    return scenario
+
+
+class ValueOrderedSet(set):
+    """
+    Set of enum members which iterates over them ordered by their value. The writer iterates over the sets of tags and
+    road users, whose order otherwise depends on the hash randomization of strings and differs between runs.
+    """
+
+    def __iter__(self):
+        return iter(sorted(super().__iter__(), key=lambda member: member.value))
+
+
+def write_scenario(
+    scenario: Scenario, planning_problem_set: PlanningProblemSet, output_dir: str, check_validity: bool
+) -> str:
+    """
+    Writes an annotated scenario with its planning problems to <output_dir>/<scenario ID>.xml, the file is the same
+    in every run
+
+    :param scenario: CommonRoad scenario, see annotate_scenario
+    :param planning_problem_set: planning problems of the scenario
+    :param output_dir: path to store the file
+    :param check_validity: whether to validate the file against the XML schema
+    :return: path of the written file
+    """
+    for lanelet in scenario.lanelet_network.lanelets:
+        lanelet.lanelet_type = ValueOrderedSet(lanelet.lanelet_type)
+        lanelet.user_one_way = ValueOrderedSet(lanelet.user_one_way)
+        lanelet.user_bidirectional = ValueOrderedSet(lanelet.user_bidirectional)
+    fw = CommonRoadFileWriter(
+        scenario,
+        planning_problem_set,
+        scenario.author,
+        scenario.affiliation,
+        scenario.source,
+        ValueOrderedSet(scenario.tags),
+    )
+    filename = os.path.join(output_dir, "{}.xml".format(scenario.scenario_id))
+    fw.write_to_file(filename, OverwriteExistingFile.ALWAYS, check_validity=check_validity)
+    return filename
+
+
+def print_conversion_report(report: Counter):
+    """
+    Prints the counters collected during a conversion run
+
+    :param report: counters, e.g., of windows skipped by the pre-screening
+    """
+    print("=" * 80)
+    print("Conversion report:")
+    for key in sorted(report.keys()):
+        print("\t{}: {}".format(key.replace("_", " "), report[key]))
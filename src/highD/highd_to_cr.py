@@ -1,15 +1,13 @@
 import os
 import glob
-import copy
-import math
 import numpy as np
 import pandas as pd
 import multiprocessing
-from typing import Dict
+from typing import Dict, Iterator, List, Set, Tuple, Union
+from collections import Counter
 
 from commonroad.planning.planning_problem import PlanningProblemSet
-from commonroad.common.file_writer import CommonRoadFileWriter, OverwriteExistingFile
-from commonroad.scenario.scenario import Scenario, Tag, ScenarioID
+from commonroad.scenario.scenario import Scenario, Tag
 
 from data_converters.src.highD.map_utils import (
     get_meta_scenario,
@@ -18,29 +16,198 @@ from data_converters.src.highD.map_utils import (
     get_dt,
     Direction,
 )
-from data_converters.src.highD.obstacle_utils import generate_dynamic_obstacle
-from data_converters.src.planning_problem_utils import (
-    generate_planning_problem,
-    NoCarException,
+from data_converters.src.highD.obstacle_utils import (
+    get_velocity,
+    highd_track_table,
+    to_cr_coordinates,
 )
-from data_converters.src.helper import load_yaml
+from data_converters.src.catalog_utils import concat_catalogs
+from data_converters.src.conversion_utils import WorkUnit
+from data_converters.src.event_utils import lane_change_frames
+from data_converters.src.generator_utils import prefetch_generators
+from data_converters.src.helper import load_yaml, print_conversion_report, write_scenario
+from data_converters.src.kinematics_utils import track_kinematics
+from data_converters.src.lanelet_utils import get_lanelet_grid
+from data_converters.src.shard_utils import shard_recordings
+from data_converters.src.track_utils import resample_tracks, update_tracks_meta, TrackIndex
+from data_converters.src.window_utils import event_windows, get_windows
 
 
-def generate_scenarios_for_record(
+def load_recording(
+    recording_meta_fn: str,
+    tracks_meta_fn: str,
+    tracks_fn: str,
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    derive_kinematics: bool = False,
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, float]:
+    """
+    Reads a highD recording and resamples its tracks to the time step size of the scenarios
+
+    :param recording_meta_fn: path to *_recordingMeta.csv
+    :param tracks_meta_fn: path to *_tracksMeta.csv
+    :param tracks_fn: path to *_tracks.csv
+    :param downsample: resample states of trajectories of dynamic obstacles every downsample steps
+    :param target_dt: time step size of the generated scenarios, overrides downsample
+    :param derive_kinematics: whether the acceleration, yaw rate and jerk of all tracks are derived, see
+    kinematics_utils.track_kinematics
+    :return: recording meta information, track meta information, tracks in the CommonRoad frame and time step size
+    """
+    # read data frames from the three files
+    recording_meta_df = pd.read_csv(recording_meta_fn, header=0)
+    tracks_meta_df = pd.read_csv(tracks_meta_fn, header=0)
+    tracks_df = pd.read_csv(tracks_fn, header=0)
+
+    # resample tracks to the time step size of the scenarios
+    recording_dt = get_dt(recording_meta_df)
+    tracks_df, dt = resample_tracks(tracks_df, "id", "frame", recording_dt, downsample, target_dt)
+    if dt != recording_dt:
+        tracks_meta_df = update_tracks_meta(tracks_meta_df, tracks_df, "id")
+    tracks_df = to_cr_coordinates(tracks_df, tracks_meta_df)
+    if derive_kinematics:
+        tracks_df = tracks_df.sort_values(["id", "frame"], kind="stable").reset_index(drop=True)
+        kinematics = track_kinematics(
+            tracks_df.id.values, get_velocity(tracks_df).values, tracks_df.orientation.values, dt
+        )
+        tracks_df[kinematics.columns] = kinematics.values
+    return recording_meta_df, tracks_meta_df, tracks_df, dt
+
+
+def get_direction_windows(
+    tracks_meta_df: pd.DataFrame,
+    direction_index: TrackIndex,
+    num_time_steps_scenario: int,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Separates one direction of a recording into windows, either consecutive windows shared by both directions of the
+    interstate or windows placed around the lane changes of the direction
+
+    :param tracks_meta_df: track meta information of the recording
+    :param direction_index: index of the tracks of the direction
+    :param num_time_steps_scenario: maximal number of time steps per CommonRoad scenario
+    :param event_margins: time steps of a window before and after its event, consecutive windows if None
+    :param stride: time steps between the starts of consecutive windows, overlapping windows if smaller than
+    the window length, disjoint windows if None; ignored for event windows
+    :return: first and last frame of each window
+    """
+    if event_margins is None:
+        return get_windows(tracks_meta_df, num_time_steps_scenario, stride)
+    tracks_df = direction_index.tracks_df
+    lane_changes = lane_change_frames(tracks_df.id.values, tracks_df.frame.values, tracks_df.laneId.values)
+    return event_windows(
+        lane_changes, *event_margins, int(tracks_meta_df.initialFrame.min()), int(tracks_meta_df.finalFrame.max())
+    )
+
+
+def construct_benchmark_id(benchmark_prefix: str, idx_1: int, num_planning_problems: int) -> str:
+    # benchmark id format: COUNTRY_SCENE_CONFIG_PRED
+    benchmark_id = "{0}_{1}_T-1".format(benchmark_prefix, idx_1 + 1)
+    if num_planning_problems > 1:
+        benchmark_id = "C-" + benchmark_id
+    return benchmark_id
+
+
+def get_benchmark_prefix(highd_config: Dict, recording_meta_df: pd.DataFrame, direction: Direction) -> str:
+    # country, location with direction and recording ID
+    location = highd_config.get("locations")[recording_meta_df.locationId.values[0]]
+    return "DEU_{0}-{1}".format(location + direction.name.capitalize(), int(recording_meta_df.id))
+
+
+def direction_work_unit(
+    direction: Direction,
+    recording_meta_df: pd.DataFrame,
+    tracks_meta_df: pd.DataFrame,
+    tracks_df: pd.DataFrame,
+    highd_config: Dict,
+    num_time_steps_scenario: int,
+    num_planning_problems: int,
+    keep_ego: bool,
+    obstacle_start_at_zero: bool,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    report: Union[Counter, None] = None,
+    recorded_accelerations: bool = False,
+    min_ego_arc_length: float = 0.0,
+    critical_ego: bool = False,
+) -> Tuple[TrackIndex, WorkUnit, List[str]]:
+    """
+    Separates one direction of a high-D recording into pre-screened windows
+
+    :param direction: driving direction
+    :param recording_meta_df: recording meta information, see load_recording
+    :param tracks_meta_df: track meta information of the recording
+    :param tracks_df: tracks of the recording in the CommonRoad frame
+    :param highd_config: dictionary with configuration parameters for highD scenario generation
+    :param num_time_steps_scenario: maximal number of time steps per CommonRoad scenario
+    :param num_planning_problems: number of planning problems per CommonRoad scenario
+    :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
+    :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to have time step zero
+    :param event_margins: time steps of a window before and after its event, consecutive windows if None
+    :param stride: time steps between the starts of consecutive windows, overlapping windows if smaller than
+    the window length, disjoint windows if None; ignored for event windows
+    :param report: counter of the windows skipped by the pre-screening, per reason, updated in place
+    :param recorded_accelerations: whether the accelerations of the dataset are part of the states, see
+    highd_track_table
+    :param min_ego_arc_length: minimal length of the path driven by a car within a window to be selected as its ego
+    vehicle
+    :param critical_ego: whether the most critical ego candidates of each window become its ego vehicles instead of
+    random ones, see conversion_utils.WorkUnit.ego_scores
+    :return: index of the tracks of the direction in the order of the rows of the track table, work unit and
+    benchmark ID of each window
+    """
+    direction_meta_df = tracks_meta_df[tracks_meta_df.drivingDirection == direction.value]
+    direction_index = TrackIndex(tracks_df[np.isin(tracks_df.id.values, direction_meta_df.id.values)], "id")
+    frame_starts, frame_ends = get_direction_windows(
+        tracks_meta_df, direction_index, num_time_steps_scenario, event_margins, stride
+    )
+    work_unit = WorkUnit(
+        "highD",
+        highd_track_table(direction_index.tracks_df, direction_meta_df, recorded_accelerations),
+        frame_starts,
+        frame_ends,
+        num_planning_problems,
+        keep_ego,
+        obstacle_start_at_zero,
+        # the ego vehicle is removed from its scenario unless it is kept
+        min_obstacles=1 if keep_ego else 2,
+        min_ego_arc_length=min_ego_arc_length,
+        critical_ego=critical_ego,
+    )
+    work_unit.prescreen(report=report)
+    benchmark_prefix = get_benchmark_prefix(highd_config, recording_meta_df, direction)
+    benchmark_ids = [
+        construct_benchmark_id(benchmark_prefix, idx_1, num_planning_problems) for idx_1 in range(len(frame_starts))
+    ]
+    return direction_index, work_unit, benchmark_ids
+
+
+def iter_scenarios_for_record(
     recording_meta_fn: str,
     tracks_meta_fn: str,
     tracks_fn: str,
     num_time_steps_scenario: int,
     num_planning_problems: int,
     keep_ego: bool,
-    output_dir: str,
     highd_config: Dict,
     obstacle_start_at_zero: bool,
-    downsample: int,
-    num_vertices: int,
-):
+    downsample: int = 1,
+    num_vertices: int = 10,
+    target_dt: Union[float, None] = None,
+    directions: Tuple[Direction, ...] = tuple(Direction),
+    report: Union[Counter, None] = None,
+    benchmark_ids: Union[Set[str], None] = None,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    lanelet_assignment: bool = False,
+    derive_kinematics: bool = False,
+    seed: Union[int, None] = None,
+    min_ego_arc_length: float = 0.0,
+    critical_ego: bool = False,
+) -> Iterator[Tuple[Scenario, PlanningProblemSet]]:
     """
-    Generate CommonRoad scenarios with given paths to highD for a high-D recording
+    Generate CommonRoad scenarios with given paths to highD for a high-D recording window by window
 
     :param recording_meta_fn: path to *_recordingMeta.csv
     :param tracks_meta_fn: path to *_tracksMeta.csv
@@ -48,214 +215,137 @@ def generate_scenarios_for_record(
     :param num_time_steps_scenario: maximal number of time steps per CommonRoad scenario
     :param num_planning_problems: number of planning problems per CommonRoad scenario
     :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
-    :param output_dir: path to store generated CommonRoad scenario files
     :param highd_config: dictionary with configuration parameters for highD scenario generation
     :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to have time step zero
     :param downsample: resample states of trajectories of dynamic obstacles every downsample steps
     :param num_vertices: number of waypoints of lanes
+    :param target_dt: time step size of the generated scenarios, overrides downsample
+    :param directions: interstate directions for which scenarios are generated
+    :param report: counter of the generated scenarios and of the windows skipped by the pre-screening, per reason,
+    updated in place
+    :param benchmark_ids: benchmark IDs of the windows to convert, e.g., selected from a catalog, all if None
+    :param event_margins: time steps of a window before and after its event, consecutive windows if None
+    :param stride: time steps between the starts of consecutive windows, overlapping windows if smaller than
+    the window length, disjoint windows if None; ignored for event windows
+    :param lanelet_assignment: boolean indicating if the lanelets of the obstacles and of the goals of the
+    planning problems are assigned
+    :param derive_kinematics: whether the accelerations and yaw rates of the states are derived from the tracks,
+    see kinematics_utils.track_kinematics
+    :param seed: seed of the random number generators of the windows which choose the ego vehicles, see
+    planning_problem_utils.window_rng, every choice is seeded with zero if None
+    :param min_ego_arc_length: minimal length of the path driven by a car within a window to be selected as its ego
+    vehicle, see conversion_utils.WorkUnit
+    :param critical_ego: whether the most critical ego candidates of each window become its ego vehicles instead of
+    random ones, see conversion_utils.WorkUnit.ego_scores
+    :return: iterator over the scenarios with their planning problems
     """
-    # read data frames from the three files
-    recording_meta_df = pd.read_csv(recording_meta_fn, header=0)
-    tracks_meta_df = pd.read_csv(tracks_meta_fn, header=0)
-    tracks_df = pd.read_csv(tracks_fn, header=0)
+    recording_meta_df, tracks_meta_df, tracks_df, dt = load_recording(
+        recording_meta_fn, tracks_meta_fn, tracks_fn, downsample, target_dt, derive_kinematics
+    )
 
-    # generate meta scenario with lanelet network
-    dt = get_dt(recording_meta_df) * downsample
     speed_limit = get_speed_limit(recording_meta_df)
     upper_lane_markings, lower_lane_markings = get_lane_markings(recording_meta_df)
-    meta_scenario_upper = get_meta_scenario(
-        dt,
-        "DEU_MetaScenarioUpper-0_0_T-1",
-        upper_lane_markings,
-        speed_limit,
-        highd_config.get("road_length"),
-        Direction.UPPER,
-        highd_config.get("road_offset"),
-        num_vertices=num_vertices,
-    )
-    meta_scenario_lower = get_meta_scenario(
-        dt,
-        "DEU_MetaScenarioLower-0_0_T-1",
-        lower_lane_markings,
-        speed_limit,
-        highd_config.get("road_length"),
-        Direction.LOWER,
-        highd_config.get("road_offset"),
-        num_vertices=num_vertices,
-    )
+    lane_markings = {Direction.UPPER: upper_lane_markings, Direction.LOWER: lower_lane_markings}
+    tags = {Tag(tag) for tag in highd_config.get("tags")}
 
-    # separate record and generate scenario for each separated part for each direction
-    # (upper interstate direction / lower interstate direction)
-    num_time_steps_scenario_original_dt = num_time_steps_scenario * downsample
-    num_scenarios = math.ceil(max(tracks_meta_df.finalFrame) / num_time_steps_scenario_original_dt)
-    for idx_1 in range(num_scenarios):
-        # benchmark id format: COUNTRY_SCENE_CONFIG_PRED
-        frame_start = idx_1 * num_time_steps_scenario_original_dt + (idx_1 + 1)
-        frame_end = frame_start + num_time_steps_scenario_original_dt
-        benchmark_id = "DEU_{0}-{1}_{2}_T-1".format(
-            highd_config.get("locations")[recording_meta_df.locationId.values[0]] + "Upper",
-            int(recording_meta_df.id),
-            idx_1 + 1,
+    # partition the recording by driving direction and process each direction independently
+    for direction in directions:
+        meta_scenario = get_meta_scenario(
+            dt,
+            "DEU_MetaScenario{}-0_0_T-1".format(direction.name.capitalize()),
+            lane_markings[direction],
+            speed_limit,
+            highd_config.get("road_length"),
+            direction,
+            highd_config.get("road_offset"),
+            num_vertices=num_vertices,
         )
-        if num_planning_problems > 1:
-            benchmark_id = "C-" + benchmark_id
-        try:
-            generate_single_scenario(
-                highd_config,
-                num_planning_problems,
-                keep_ego,
-                output_dir,
-                tracks_df,
-                tracks_meta_df,
-                meta_scenario_upper,
-                benchmark_id,
-                Direction.UPPER,
-                frame_start,
-                frame_end,
-                obstacle_start_at_zero,
-                downsample,
-            )
-        except NoCarException as e:
-            print(f"No car in this scenario: {repr(e)}. Skipping this scenario.")
-
-        benchmark_id = "DEU_{0}-{1}_{2}_T-1".format(
-            highd_config.get("locations")[recording_meta_df.locationId.values[0]] + "Lower",
-            int(recording_meta_df.id),
-            idx_1 + 1,
+        _, work_unit, window_benchmark_ids = direction_work_unit(
+            direction,
+            recording_meta_df,
+            tracks_meta_df,
+            tracks_df,
+            highd_config,
+            num_time_steps_scenario,
+            num_planning_problems,
+            keep_ego,
+            obstacle_start_at_zero,
+            event_margins,
+            stride,
+            report,
+            min_ego_arc_length=min_ego_arc_length,
+            critical_ego=critical_ego,
+        )
+        yield from work_unit.iter_scenarios(
+            window_benchmark_ids,
+            meta_scenario,
+            highd_config,
+            tags,
+            benchmark_ids,
+            report,
+            seed,
+            lanelet_grid=get_lanelet_grid(meta_scenario.lanelet_network) if lanelet_assignment else None,
         )
-        if num_planning_problems > 1:
-            benchmark_id = "C-" + benchmark_id
-        try:
-            generate_single_scenario(
-                highd_config,
-                num_planning_problems,
-                keep_ego,
-                output_dir,
-                tracks_df,
-                tracks_meta_df,
-                meta_scenario_lower,
-                benchmark_id,
-                Direction.LOWER,
-                frame_start,
-                frame_end,
-                obstacle_start_at_zero,
-                downsample,
-            )
-        except NoCarException as e:
-            print(f"No car in this scenario: {repr(e)}. Skipping this scenario.")
 
 
-def generate_single_scenario(
-    highd_config: Dict,
+def generate_scenarios_for_record(
+    recording_meta_fn: str,
+    tracks_meta_fn: str,
+    tracks_fn: str,
+    num_time_steps_scenario: int,
     num_planning_problems: int,
     keep_ego: bool,
     output_dir: str,
-    tracks_df: pd.DataFrame,
-    tracks_meta_df: pd.DataFrame,
-    meta_scenario: Scenario,
-    benchmark_id: str,
-    direction: Direction,
-    frame_start: int,
-    frame_end: int,
+    highd_config: Dict,
     obstacle_start_at_zero: bool,
     downsample: int,
-):
+    num_vertices: int,
+    target_dt: Union[float, None] = None,
+    directions: Tuple[Direction, ...] = tuple(Direction),
+    benchmark_ids: Union[Set[str], None] = None,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    lanelet_assignment: bool = False,
+    derive_kinematics: bool = False,
+    seed: Union[int, None] = None,
+    min_ego_arc_length: float = 0.0,
+    critical_ego: bool = False,
+) -> Counter:
     """
-    Generate a single CommonRoad scenario based on hihg-D record snippet
+    Generate CommonRoad scenarios with given paths to highD for a high-D recording and write them to files,
+    see iter_scenarios_for_record
 
-    :param highd_config: dictionary with configuration parameters for highD scenario generation
-    :param num_planning_problems: number of planning problems per CommonRoad scenario
     :param output_dir: path to store generated CommonRoad scenario files
-    :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
-    :param tracks_df: single track
-    :param tracks_meta_df: single meta information track
-    :param meta_scenario: CommonRoad scenario with lanelet network
-    :param benchmark_id: CommonRoad benchmark ID for scenario
-    :param direction: indicator for upper or lower road of interstate
-    :param frame_start: start of frame in time steps of record
-    :param frame_end: end of frame in time steps of record
-    :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to start
-    at time step zero
-    :param downsample: resample states of trajectories of dynamic obstacles every downsample steps
-    :return: None
+    :return: number of windows skipped by the pre-screening, per reason
     """
+    report = Counter()
+    for scenario, planning_problem_set in iter_scenarios_for_record(
+        recording_meta_fn,
+        tracks_meta_fn,
+        tracks_fn,
+        num_time_steps_scenario,
+        num_planning_problems,
+        keep_ego,
+        highd_config,
+        obstacle_start_at_zero,
+        downsample,
+        num_vertices,
+        target_dt,
+        directions,
+        report,
+        benchmark_ids,
+        event_margins,
+        stride,
+        lanelet_assignment,
+        derive_kinematics,
+        seed,
+        min_ego_arc_length,
+        critical_ego,
+    ):
+        filename = write_scenario(scenario, planning_problem_set, output_dir, check_validity=obstacle_start_at_zero)
+        print("Scenario file stored in {}".format(filename))
 
-    def enough_time_steps(veh_id):
-        vehicle_meta = tracks_meta_df[tracks_meta_df.id == veh_id]
-        if (
-            not obstacle_start_at_zero
-            and frame_end - int(vehicle_meta.initialFrame) < 2 * downsample
-            or int(vehicle_meta.finalFrame) - frame_start < 2 * downsample
-        ):
-            return False
-        elif (
-            obstacle_start_at_zero
-            and int(vehicle_meta.initialFrame) > frame_start
-            or int(vehicle_meta.finalFrame) - frame_start < 2 * downsample
-        ):
-            return False
-        return True
-
-    # copy meta_scenario with lanelet networks
-    scenario = copy.deepcopy(meta_scenario)
-    scenario.scenario_id = ScenarioID.from_benchmark_id(benchmark_id, "2020a")
-
-    # read tracks appear between [frame_start, frame_end]
-    scenario_tracks_df = tracks_df[(tracks_df.frame >= frame_start) & (tracks_df.frame <= frame_end)]
-
-    # generate CR obstacles
-    for vehicle_id in [
-        vehicle_id
-        for vehicle_id in scenario_tracks_df.id.unique()
-        if vehicle_id in tracks_meta_df[tracks_meta_df.drivingDirection == direction.value].id.unique()
-    ]:
-        # if appearing time steps < min_time_steps, skip vehicle
-        if not enough_time_steps(vehicle_id):
-            continue
-        print(
-            "Generating scenario {}, vehicle id {}".format(benchmark_id, vehicle_id),
-            end="\r",
-        )
-        do = generate_dynamic_obstacle(
-            scenario,
-            vehicle_id,
-            tracks_meta_df,
-            scenario_tracks_df,
-            frame_start,
-            downsample,
-        )
-        scenario.add_objects(do)
-
-    # return if scenario contains no dynamic obstacle
-    if len(scenario.dynamic_obstacles) == 0 or len(scenario.dynamic_obstacles) == 1 and not keep_ego:
-        return
-
-    # generate planning problems
-    planning_problem_set = PlanningProblemSet()
-    for idx_2 in range(num_planning_problems):
-        planning_problem = generate_planning_problem(scenario, keep_ego=keep_ego)
-        planning_problem_set.add_planning_problem(planning_problem)
-
-    # rotate scenario if it is upper scenario
-    if direction == Direction.UPPER:
-        translation = np.array([0.0, 0.0])
-        angle = np.pi
-        scenario.translate_rotate(translation, angle)
-        planning_problem_set.translate_rotate(translation, angle)
-
-    # write new scenario
-    tags = {Tag(tag) for tag in highd_config.get("tags")}
-    fw = CommonRoadFileWriter(
-        scenario,
-        planning_problem_set,
-        highd_config.get("author"),
-        highd_config.get("affiliation"),
-        highd_config.get("source"),
-        tags,
-    )
-    filename = os.path.join(output_dir, "{}.xml".format(scenario.scenario_id))
-    fw.write_to_file(filename, OverwriteExistingFile.ALWAYS, check_validity=obstacle_start_at_zero)
-    print("Scenario file stored in {}".format(filename))
+    return report
 
 
 def create_highd_scenarios(
@@ -268,6 +358,16 @@ def create_highd_scenarios(
     num_processes: int = 1,
     downsample: int = 1,
     num_vertices: int = 10,
+    target_dt: Union[float, None] = None,
+    benchmark_ids: Union[Set[str], None] = None,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    lanelet_assignment: bool = False,
+    derive_kinematics: bool = False,
+    shard: Union[Tuple[int, int], None] = None,
+    seed: Union[int, None] = None,
+    min_ego_arc_length: float = 0.0,
+    critical_ego: bool = False,
 ):
     """
     Iterates over all dataset files and generates CommonRoad scenarios
@@ -278,9 +378,27 @@ def create_highd_scenarios(
     :param num_planning_problems: number of planning problems per CommonRoad scenario
     :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
     :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to have time step zero
-    :param num_processes: number of parallel processes to convert raw data (Optimal=60)
+    :param num_processes: number of parallel processes to convert raw data (Optimal=60), each process converts one
+    recording at a time, loading it once for both directions
     :param downsample: resample states of trajectories of dynamic obstacles every downsample steps
     :param num_vertices: number of waypoints of lanes
+    :param target_dt: time step size of the generated scenarios, overrides downsample
+    :param benchmark_ids: benchmark IDs of the windows to convert, e.g., selected from a catalog, all if None
+    :param event_margins: time steps of a window before and after its event, consecutive windows if None
+    :param stride: time steps between the starts of consecutive windows, overlapping windows if smaller than
+    the window length, disjoint windows if None; ignored for event windows
+    :param lanelet_assignment: boolean indicating if the lanelets of the obstacles and of the goals of the
+    planning problems are assigned
+    :param derive_kinematics: whether the accelerations and yaw rates of the states are derived from the tracks,
+    see kinematics_utils.track_kinematics
+    :param shard: index and number of shards, only the recordings of this shard are converted, see
+    shard_utils.shard_recordings, all recordings if None
+    :param seed: seed of the random number generators of the windows which choose the ego vehicles, see
+    planning_problem_utils.window_rng, every choice is seeded with zero if None
+    :param min_ego_arc_length: minimal length of the path driven by a car within a window to be selected as its ego
+    vehicle, see conversion_utils.WorkUnit
+    :param critical_ego: whether the most critical ego candidates of each window become its ego vehicles instead of
+    random ones, see conversion_utils.WorkUnit.ego_scores
     """
     # generate path to highd data files
     path_tracks = os.path.join(input_dir, "data/*_tracks.csv")
@@ -291,16 +409,20 @@ def create_highd_scenarios(
     listing_tracks = sorted(glob.glob(path_tracks))
     listing_metas = sorted(glob.glob(path_metas))
     listing_recording = sorted(glob.glob(path_recording))
+    listing_recording, listing_metas, listing_tracks = shard_recordings(
+        shard, listing_recording, listing_metas, listing_tracks
+    )
 
     highd_config = load_yaml(os.path.dirname(os.path.abspath(__file__)) + "/config.yaml")
 
+    report = Counter()
     if num_processes < 2:
         for index, (recording_meta_fn, tracks_meta_fn, tracks_fn) in enumerate(
             zip(listing_recording, listing_metas, listing_tracks)
         ):
             print("=" * 80)
             print("Processing file {}...".format(tracks_fn), end="\n")
-            generate_scenarios_for_record(
+            report += generate_scenarios_for_record(
                 recording_meta_fn,
                 tracks_meta_fn,
                 tracks_fn,
@@ -312,10 +434,20 @@ def create_highd_scenarios(
                 obstacle_start_at_zero,
                 downsample,
                 num_vertices,
+                target_dt,
+                tuple(Direction),
+                benchmark_ids,
+                event_margins,
+                stride,
+                lanelet_assignment,
+                derive_kinematics,
+                seed,
+                min_ego_arc_length,
+                critical_ego,
             )
     else:
         with multiprocessing.Pool(processes=num_processes) as pool:
-            pool.starmap(
+            record_reports = pool.starmap(
                 generate_scenarios_for_record,
                 [
                     (
@@ -330,9 +462,420 @@ def create_highd_scenarios(
                         obstacle_start_at_zero,
                         downsample,
                         num_vertices,
+                        target_dt,
+                        tuple(Direction),
+                        benchmark_ids,
+                        event_margins,
+                        stride,
+                        lanelet_assignment,
+                        derive_kinematics,
+                        seed,
+                        min_ego_arc_length,
+                        critical_ego,
                     )
                     for recording_meta_fn, tracks_meta_fn, tracks_fn in zip(
                         listing_recording, listing_metas, listing_tracks
                     )
                 ],
             )
+            for record_report in record_reports:
+                report += record_report
+
+    print_conversion_report(report)
+
+
+def iter_highd_scenarios(
+    input_dir: str,
+    num_time_steps_scenario: int,
+    num_planning_problems: int,
+    keep_ego: bool,
+    obstacle_start_at_zero: bool,
+    num_processes: int = 1,
+    downsample: int = 1,
+    num_vertices: int = 10,
+    target_dt: Union[float, None] = None,
+    prefetch: int = 4,
+    benchmark_ids: Union[Set[str], None] = None,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    lanelet_assignment: bool = False,
+    derive_kinematics: bool = False,
+    shard: Union[Tuple[int, int], None] = None,
+    seed: Union[int, None] = None,
+    min_ego_arc_length: float = 0.0,
+    critical_ego: bool = False,
+) -> Iterator[Tuple[Scenario, PlanningProblemSet]]:
+    """
+    Iterates over all dataset files and yields the CommonRoad scenarios without writing them to files.
+    Each recording is a work unit which is loaded once and partitioned by driving direction; with multiple processes
+    the scenarios are yielded in the order in which they are finished.
+
+    :param input_dir: path to dataset files
+    :param num_time_steps_scenario: number of time steps per CommonRoad scenario
+    :param num_planning_problems: number of planning problems per CommonRoad scenario
+    :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
+    :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to have time step zero
+    :param num_processes: number of parallel processes producing scenarios
+    :param downsample: resample states of trajectories of dynamic obstacles every downsample steps
+    :param num_vertices: number of waypoints of lanes
+    :param target_dt: time step size of the generated scenarios, overrides downsample
+    :param prefetch: maximal number of scenarios produced in advance by the processes
+    :param benchmark_ids: benchmark IDs of the windows to convert, e.g., selected from a catalog, all if None
+    :param event_margins: time steps of a window before and after its event, consecutive windows if None
+    :param stride: time steps between the starts of consecutive windows, overlapping windows if smaller than
+    the window length, disjoint windows if None; ignored for event windows
+    :param lanelet_assignment: boolean indicating if the lanelets of the obstacles and of the goals of the
+    planning problems are assigned
+    :param derive_kinematics: whether the accelerations and yaw rates of the states are derived from the tracks,
+    see kinematics_utils.track_kinematics
+    :param shard: index and number of shards, only the recordings of this shard are converted, see
+    shard_utils.shard_recordings, all recordings if None
+    :param seed: seed of the random number generators of the windows which choose the ego vehicles, see
+    planning_problem_utils.window_rng, every choice is seeded with zero if None
+    :param min_ego_arc_length: minimal length of the path driven by a car within a window to be selected as its ego
+    vehicle, see conversion_utils.WorkUnit
+    :param critical_ego: whether the most critical ego candidates of each window become its ego vehicles instead of
+    random ones, see conversion_utils.WorkUnit.ego_scores
+    :return: iterator over the scenarios with their planning problems
+    """
+    listing_tracks = sorted(glob.glob(os.path.join(input_dir, "data/*_tracks.csv")))
+    listing_metas = sorted(glob.glob(os.path.join(input_dir, "data/*_tracksMeta.csv")))
+    listing_recording = sorted(glob.glob(os.path.join(input_dir, "data/*_recordingMeta.csv")))
+    listing_recording, listing_metas, listing_tracks = shard_recordings(
+        shard, listing_recording, listing_metas, listing_tracks
+    )
+
+    highd_config = load_yaml(os.path.dirname(os.path.abspath(__file__)) + "/config.yaml")
+
+    work_units = [
+        (
+            recording_meta_fn,
+            tracks_meta_fn,
+            tracks_fn,
+            num_time_steps_scenario,
+            num_planning_problems,
+            keep_ego,
+            highd_config,
+            obstacle_start_at_zero,
+            downsample,
+            num_vertices,
+            target_dt,
+            tuple(Direction),
+            None,
+            benchmark_ids,
+            event_margins,
+            stride,
+            lanelet_assignment,
+            derive_kinematics,
+            seed,
+            min_ego_arc_length,
+            critical_ego,
+        )
+        for recording_meta_fn, tracks_meta_fn, tracks_fn in zip(listing_recording, listing_metas, listing_tracks)
+    ]
+    return prefetch_generators(iter_scenarios_for_record, work_units, num_processes, prefetch)
+
+
+def export_windows_for_record(
+    recording_meta_fn: str,
+    tracks_meta_fn: str,
+    tracks_fn: str,
+    num_time_steps_scenario: int,
+    num_planning_problems: int,
+    keep_ego: bool,
+    output_dir: str,
+    highd_config: Dict,
+    obstacle_start_at_zero: bool,
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    directions: Tuple[Direction, ...] = tuple(Direction),
+    export_format: str = "npz",
+    benchmark_ids: Union[Set[str], None] = None,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    seed: Union[int, None] = None,
+    min_ego_arc_length: float = 0.0,
+    critical_ego: bool = False,
+) -> Counter:
+    """
+    Exports the windows of a high-D recording as arrays instead of CommonRoad scenarios, one shard per direction.
+    The windows, obstacles and ego vehicles are the same as the ones of iter_scenarios_for_record.
+
+    :param recording_meta_fn: path to *_recordingMeta.csv
+    :param tracks_meta_fn: path to *_tracksMeta.csv
+    :param tracks_fn: path to *_tracks.csv
+    :param num_time_steps_scenario: maximal number of time steps per window
+    :param num_planning_problems: number of ego vehicles per window
+    :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
+    :param output_dir: path to store the shards
+    :param highd_config: dictionary with configuration parameters for highD scenario generation
+    :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to have time step zero
+    :param downsample: resample states of trajectories of dynamic obstacles every downsample steps
+    :param target_dt: time step size of the generated scenarios, overrides downsample
+    :param directions: interstate directions for which windows are exported
+    :param export_format: npz or arrow, see write_window_arrays
+    :param benchmark_ids: benchmark IDs of the windows to convert, e.g., selected from a catalog, all if None
+    :param event_margins: time steps of a window before and after its event, consecutive windows if None
+    :param stride: time steps between the starts of consecutive windows, overlapping windows if smaller than
+    the window length, disjoint windows if None; ignored for event windows
+    :param seed: seed of the random number generators of the windows which choose the ego vehicles, see
+    planning_problem_utils.window_rng, every choice is seeded with zero if None
+    :param min_ego_arc_length: minimal length of the path driven by a car within a window to be selected as its ego
+    vehicle, see conversion_utils.WorkUnit
+    :param critical_ego: whether the most critical ego candidates of each window become its ego vehicles instead of
+    random ones, see conversion_utils.WorkUnit.ego_scores
+    :return: number of windows skipped by the pre-screening, per reason
+    """
+    report = Counter()
+    recording_meta_df, tracks_meta_df, tracks_df, dt = load_recording(
+        recording_meta_fn, tracks_meta_fn, tracks_fn, downsample, target_dt
+    )
+
+    for direction in directions:
+        _, work_unit, window_benchmark_ids = direction_work_unit(
+            direction,
+            recording_meta_df,
+            tracks_meta_df,
+            tracks_df,
+            highd_config,
+            num_time_steps_scenario,
+            num_planning_problems,
+            keep_ego,
+            obstacle_start_at_zero,
+            event_margins,
+            stride,
+            report,
+            recorded_accelerations=True,
+            min_ego_arc_length=min_ego_arc_length,
+            critical_ego=critical_ego,
+        )
+        work_unit.export_windows(
+            window_benchmark_ids,
+            os.path.join(output_dir, get_benchmark_prefix(highd_config, recording_meta_df, direction)),
+            dt,
+            export_format,
+            benchmark_ids,
+            report,
+            seed,
+        )
+
+    return report
+
+
+def export_highd_windows(
+    input_dir: str,
+    output_dir: str,
+    num_time_steps_scenario: int,
+    num_planning_problems: int,
+    keep_ego: bool,
+    obstacle_start_at_zero: bool,
+    num_processes: int = 1,
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    export_format: str = "npz",
+    benchmark_ids: Union[Set[str], None] = None,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    shard: Union[Tuple[int, int], None] = None,
+    seed: Union[int, None] = None,
+    min_ego_arc_length: float = 0.0,
+    critical_ego: bool = False,
+):
+    """
+    Iterates over all dataset files and exports their windows as arrays, see export_windows_for_record
+
+    :param input_dir: path to dataset files
+    :param output_dir: path to store the shards
+    :param num_time_steps_scenario: number of time steps per window
+    :param num_planning_problems: number of ego vehicles per window
+    :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
+    :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to have time step zero
+    :param num_processes: number of parallel processes, each process exports both directions of a recording
+    :param downsample: resample states of trajectories of dynamic obstacles every downsample steps
+    :param target_dt: time step size of the generated scenarios, overrides downsample
+    :param export_format: npz or arrow, see write_window_arrays
+    :param benchmark_ids: benchmark IDs of the windows to convert, e.g., selected from a catalog, all if None
+    :param event_margins: time steps of a window before and after its event, consecutive windows if None
+    :param stride: time steps between the starts of consecutive windows, overlapping windows if smaller than
+    the window length, disjoint windows if None; ignored for event windows
+    :param shard: index and number of shards, only the recordings of this shard are converted, see
+    shard_utils.shard_recordings, all recordings if None
+    :param seed: seed of the random number generators of the windows which choose the ego vehicles, see
+    planning_problem_utils.window_rng, every choice is seeded with zero if None
+    :param min_ego_arc_length: minimal length of the path driven by a car within a window to be selected as its ego
+    vehicle, see conversion_utils.WorkUnit
+    :param critical_ego: whether the most critical ego candidates of each window become its ego vehicles instead of
+    random ones, see conversion_utils.WorkUnit.ego_scores
+    """
+    listing_tracks = sorted(glob.glob(os.path.join(input_dir, "data/*_tracks.csv")))
+    listing_metas = sorted(glob.glob(os.path.join(input_dir, "data/*_tracksMeta.csv")))
+    listing_recording = sorted(glob.glob(os.path.join(input_dir, "data/*_recordingMeta.csv")))
+    listing_recording, listing_metas, listing_tracks = shard_recordings(
+        shard, listing_recording, listing_metas, listing_tracks
+    )
+
+    highd_config = load_yaml(os.path.dirname(os.path.abspath(__file__)) + "/config.yaml")
+
+    work_units = [
+        (
+            recording_meta_fn,
+            tracks_meta_fn,
+            tracks_fn,
+            num_time_steps_scenario,
+            num_planning_problems,
+            keep_ego,
+            output_dir,
+            highd_config,
+            obstacle_start_at_zero,
+            downsample,
+            target_dt,
+            tuple(Direction),
+            export_format,
+            benchmark_ids,
+            event_margins,
+            stride,
+            seed,
+            min_ego_arc_length,
+            critical_ego,
+        )
+        for recording_meta_fn, tracks_meta_fn, tracks_fn in zip(listing_recording, listing_metas, listing_tracks)
+    ]
+    report = Counter()
+    if num_processes < 2:
+        for work_unit in work_units:
+            report += export_windows_for_record(*work_unit)
+    else:
+        with multiprocessing.Pool(processes=num_processes) as pool:
+            for record_report in pool.starmap(export_windows_for_record, work_units):
+                report += record_report
+
+    print_conversion_report(report)
+
+
+def catalog_for_record(
+    recording_meta_fn: str,
+    tracks_meta_fn: str,
+    tracks_fn: str,
+    num_time_steps_scenario: int,
+    num_planning_problems: int,
+    keep_ego: bool,
+    highd_config: Dict,
+    obstacle_start_at_zero: bool,
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    min_ego_arc_length: float = 0.0,
+) -> pd.DataFrame:
+    """
+    Catalogs the windows of a high-D recording without generating them, see catalog_utils.window_statistics
+
+    :param recording_meta_fn: path to *_recordingMeta.csv
+    :param tracks_meta_fn: path to *_tracksMeta.csv
+    :param tracks_fn: path to *_tracks.csv
+    :param num_time_steps_scenario: maximal number of time steps per CommonRoad scenario
+    :param num_planning_problems: number of planning problems per CommonRoad scenario
+    :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
+    :param highd_config: dictionary with configuration parameters for highD scenario generation
+    :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to have time step zero
+    :param downsample: resample states of trajectories of dynamic obstacles every downsample steps
+    :param target_dt: time step size of the generated scenarios, overrides downsample
+    :param event_margins: time steps of a window before and after its event, consecutive windows if None
+    :param stride: time steps between the starts of consecutive windows, overlapping windows if smaller than
+    the window length, disjoint windows if None; ignored for event windows
+    :param min_ego_arc_length: minimal length of the path driven by a car within a window to be selected as its ego
+    vehicle, see conversion_utils.WorkUnit
+    :return: one row per window and direction, windows skipped by the pre-screening have no benchmark ID
+    """
+    recording_meta_df, tracks_meta_df, tracks_df, _ = load_recording(
+        recording_meta_fn, tracks_meta_fn, tracks_fn, downsample, target_dt
+    )
+    vehicle_classes = tracks_meta_df.set_index("id")["class"]
+
+    catalogs = []
+    for direction in Direction:
+        direction_index, work_unit, window_benchmark_ids = direction_work_unit(
+            direction,
+            recording_meta_df,
+            tracks_meta_df,
+            tracks_df,
+            highd_config,
+            num_time_steps_scenario,
+            num_planning_problems,
+            keep_ego,
+            obstacle_start_at_zero,
+            event_margins,
+            stride,
+            min_ego_arc_length=min_ego_arc_length,
+        )
+        direction_df = direction_index.tracks_df
+        speeds = get_velocity(direction_df).values
+        catalogs.append(
+            work_unit.catalog(
+                window_benchmark_ids,
+                os.path.basename(tracks_fn),
+                speeds,
+                speeds * np.cos(direction_df.orientation.values),
+                speeds * np.sin(direction_df.orientation.values),
+                vehicle_classes,
+                lane_ids=direction_df.laneId.values,
+            )
+        )
+    return concat_catalogs(catalogs)
+
+
+def create_highd_catalog(
+    input_dir: str,
+    num_time_steps_scenario: int,
+    num_planning_problems: int,
+    keep_ego: bool,
+    obstacle_start_at_zero: bool,
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    min_ego_arc_length: float = 0.0,
+) -> pd.DataFrame:
+    """
+    Catalogs the windows of all dataset files, see catalog_for_record
+
+    :param input_dir: path to dataset files
+    :param num_time_steps_scenario: number of time steps per CommonRoad scenario
+    :param num_planning_problems: number of planning problems per CommonRoad scenario
+    :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
+    :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to have time step zero
+    :param downsample: resample states of trajectories of dynamic obstacles every downsample steps
+    :param target_dt: time step size of the generated scenarios, overrides downsample
+    :param event_margins: time steps of a window before and after its event, consecutive windows if None
+    :param stride: time steps between the starts of consecutive windows, overlapping windows if smaller than
+    the window length, disjoint windows if None; ignored for event windows
+    :param min_ego_arc_length: minimal length of the path driven by a car within a window to be selected as its ego
+    vehicle, see conversion_utils.WorkUnit
+    :return: one row per window
+    """
+    listing_tracks = sorted(glob.glob(os.path.join(input_dir, "data/*_tracks.csv")))
+    listing_metas = sorted(glob.glob(os.path.join(input_dir, "data/*_tracksMeta.csv")))
+    listing_recording = sorted(glob.glob(os.path.join(input_dir, "data/*_recordingMeta.csv")))
+
+    highd_config = load_yaml(os.path.dirname(os.path.abspath(__file__)) + "/config.yaml")
+
+    return concat_catalogs(
+        [
+            catalog_for_record(
+                recording_meta_fn,
+                tracks_meta_fn,
+                tracks_fn,
+                num_time_steps_scenario,
+                num_planning_problems,
+                keep_ego,
+                highd_config,
+                obstacle_start_at_zero,
+                downsample,
+                target_dt,
+                event_margins,
+                stride,
+                min_ego_arc_length,
+            )
+            for recording_meta_fn, tracks_meta_fn, tracks_fn in zip(listing_recording, listing_metas, listing_tracks)
+        ]
+    )
@@ -1,5 +1,5 @@
 import numpy as np
-from typing import Union, List
+from typing import Union, List, Dict, Tuple
 from pandas import DataFrame
 from enum import Enum
 
@@ -9,22 +9,22 @@ from commonroad.scenario.traffic_sign import TrafficSignIDGermany, TrafficSignEl
 
 
 def resample_polyline(polyline, step=2.0):
-    new_polyline = [polyline[0]]
-    current_position = 0 + step
-    current_length = np.linalg.norm(polyline[0] - polyline[1])
-    current_idx = 0
-    while current_idx < len(polyline) - 1:
-        if current_position >= current_length:
-            current_position = current_position - current_length
-            current_idx += 1
-            if current_idx > len(polyline) - 2:
-                break
-            current_length = np.linalg.norm(polyline[current_idx + 1] - polyline[current_idx])
-        else:
-            rel = current_position / current_length
-            new_polyline.append((1 - rel) * polyline[current_idx] + rel * polyline[current_idx + 1])
-            current_position += step
-    return np.array(new_polyline)
+    """
+    Resamples a polyline with equidistant vertices by interpolating along its arc length
+
+    :param polyline: vertices of the polyline
+    :param step: distance between two resampled vertices
+    :return: resampled vertices, starting at the first vertex of the polyline
+    """
+    polyline = np.asarray(polyline, dtype=float)
+    arc_length = np.concatenate(([0.0], np.cumsum(np.linalg.norm(np.diff(polyline, axis=0), axis=1))))
+    # the positions are accumulated step by step, so that the end of the polyline is kept exactly when the sum of the
+    # steps falls short of it in floating point, e.g., 151 vertices per highD lane with num_vertices=36
+    samples = np.concatenate(([0.0], np.cumsum(np.full(int(arc_length[-1] / step) + 1, step))))
+    samples = samples[samples < arc_length[-1]]
+    return np.column_stack(
+        (np.interp(samples, arc_length, polyline[:, 0]), np.interp(samples, arc_length, polyline[:, 1]))
+    )
 
 
 class Direction(Enum):
@@ -83,6 +83,10 @@ def get_speed_limit(recording_df: DataFrame) -> Union[float, None]:
         return speed_limit
 
 
+# cache of meta scenarios of recordings with the same road geometry, see get_meta_scenario
+_meta_scenario_cache: Dict[Tuple, Scenario] = {}
+
+
 def get_meta_scenario(
     dt: float,
     benchmark_id: str,
@@ -103,8 +107,28 @@ def get_meta_scenario(
     :param road_length: length of road
     :param direction: indicator for upper or lower interstate road
     :param road_offset: length added on both sides of road
-    :return: CommonRoad scenario
+    :param num_vertices: number of waypoints of lanes
+    :return: CommonRoad scenario, shared between all calls with the same arguments and therefore not to be modified;
+    the lanelet network of the upper direction is rotated by pi
     """
+    key = (benchmark_id, tuple(lane_markings), speed_limit, num_vertices, road_length, road_offset, direction, dt)
+    if key not in _meta_scenario_cache:
+        _meta_scenario_cache[key] = _create_meta_scenario(
+            dt, benchmark_id, lane_markings, speed_limit, road_length, direction, road_offset, num_vertices
+        )
+    return _meta_scenario_cache[key]
+
+
+def _create_meta_scenario(
+    dt: float,
+    benchmark_id: str,
+    lane_markings: List[float],
+    speed_limit: float,
+    road_length: int,
+    direction: Direction,
+    road_offset: int,
+    num_vertices: int,
+) -> Scenario:
     scenario = Scenario(dt, ScenarioID.from_benchmark_id(benchmark_id, "2020a"))
     resample_step = (road_offset + 2 * road_offset) / num_vertices
     if direction is Direction.UPPER:
@@ -219,4 +243,8 @@ def get_meta_scenario(
 
         scenario.add_objects(traffic_sign, lanelets)
 
+    # rotate the upper road once, so that its scenarios share the frame of the lower road
+    if direction is Direction.UPPER:
+        scenario.translate_rotate(np.array([0.0, 0.0]), np.pi)
+
     return scenario
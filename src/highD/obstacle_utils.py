@@ -1,13 +1,12 @@
-import math
 import numpy as np
 from typing import Union
 from pandas import DataFrame, Series
 
-from commonroad.geometry.shape import Rectangle
-from commonroad.scenario.obstacle import DynamicObstacle, ObstacleType
-from commonroad.scenario.trajectory import State, Trajectory
-from commonroad.prediction.prediction import TrajectoryPrediction
-from commonroad.scenario.scenario import Scenario
+from commonroad.scenario.obstacle import ObstacleType
+
+from data_converters.src.highD.map_utils import Direction
+from data_converters.src.helper import make_valid_orientations_pruned
+from data_converters.src.schema_utils import TrackTable
 
 obstacle_class_dict = {"Truck": ObstacleType.TRUCK, "Car": ObstacleType.CAR}
 
@@ -32,6 +31,27 @@ def get_orientation(track_df: DataFrame) -> np.array:
     return np.arctan2(-track_df.yVelocity, track_df.xVelocity)
 
 
+def to_cr_coordinates(tracks_df: DataFrame, tracks_meta_df: DataFrame) -> DataFrame:
+    """
+    Transforms positions and orientations of all tracks of a recording into the CommonRoad frame of their scenarios.
+    Tracks of the upper direction are rotated by pi, so that all vehicles drive along the positive x-axis and the
+    scenarios of the upper direction do not have to be rotated after their generation.
+
+    :param tracks_df: track data frame of a recording
+    :param tracks_meta_df: track meta information data frame of the recording
+    :return: track data frame with x, y and orientation in the CommonRoad frame
+    """
+    upper_ids = tracks_meta_df.id.values[tracks_meta_df.drivingDirection.values == Direction.UPPER.value]
+    upper = np.isin(tracks_df.id.values, upper_ids)
+    orientations = get_orientation(tracks_df).values
+
+    tracks_df = tracks_df.copy()
+    tracks_df["x"] = np.where(upper, -tracks_df.x.values, tracks_df.x.values)
+    tracks_df["y"] = np.where(upper, tracks_df.y.values, -tracks_df.y.values)
+    tracks_df["orientation"] = make_valid_orientations_pruned(np.where(upper, orientations + np.pi, orientations))
+    return tracks_df
+
+
 def get_acceleration(track_df: DataFrame) -> np.array:
     """
     Calculates acceleration given x-acceleration and y-acceleration
@@ -42,64 +62,40 @@ def get_acceleration(track_df: DataFrame) -> np.array:
     return np.sqrt(track_df.xAcceleration**2 + track_df.yAcceleration**2)
 
 
-def generate_dynamic_obstacle(
-    scenario: Scenario,
-    vehicle_id: int,
-    tracks_meta_df: DataFrame,
-    tracks_df: DataFrame,
-    time_step_correction: int,
-    downsample: int,
-) -> DynamicObstacle:
+def highd_track_table(
+    tracks_df: DataFrame, tracks_meta_df: DataFrame, recorded_accelerations: bool = False
+) -> TrackTable:
     """
+    Normalizes the tracks of a highD recording into a track table
 
-    :param scenario: CommonRoad scenario
-    :param vehicle_id: ID of obstacle to generate
-    :param tracks_meta_df: track meta information data frames
-    :param tracks_df: track data frames
-    :return: CommonRoad dynamic obstacle
+    :param tracks_df: track data frame in the CommonRoad frame, see to_cr_coordinates
+    :param tracks_meta_df: track meta information data frame, the extent of a vehicle is given by width and height
+    :param recorded_accelerations: whether the accelerations of the dataset are part of the states; derived
+    accelerations and yaw rates are always part of them, see load_recording
+    :return: track table
     """
-
-    vehicle_meta = tracks_meta_df[tracks_meta_df.id == vehicle_id]
-    vehicle_tracks = tracks_df[tracks_df.id == vehicle_id]
-
-    length = vehicle_meta.width.values[0]
-    width = vehicle_meta.height.values[0]
-
-    initial_time_step_cr = math.ceil((int(vehicle_tracks.frame.values[0]) - time_step_correction) / downsample)
-    initial_time_step_cr = int(initial_time_step_cr)
-    initial_frame = initial_time_step_cr * downsample
-    dynamic_obstacle_id = scenario.generate_object_id()
-    dynamic_obstacle_type = obstacle_class_dict[vehicle_meta["class"].values[0]]
-    dynamic_obstacle_shape = Rectangle(width=width, length=length)
-
-    xs = np.array(vehicle_tracks.x)
-    ys = np.array(-vehicle_tracks.y)
-    velocities = get_velocity(vehicle_tracks)
-    orientations = get_orientation(vehicle_tracks)
-    accelerations = get_acceleration(vehicle_tracks)
-
-    state_list = []
-    for cr_timestep, frame_idx in enumerate(range(0, xs.shape[0], downsample)):
-        x = xs[frame_idx]
-        y = ys[frame_idx]
-        v = velocities.values[frame_idx]
-        theta = orientations.values[frame_idx]
-        a = accelerations.values[frame_idx]
-        state_list.append(
-            State(
-                position=np.array([x, y]), velocity=v, orientation=theta, time_step=cr_timestep + initial_time_step_cr
-            )
-        )
-
-    dynamic_obstacle_initial_state = state_list[0]
-
-    dynamic_obstacle_trajectory = Trajectory(initial_time_step_cr + 1, state_list[1:])
-    dynamic_obstacle_prediction = TrajectoryPrediction(dynamic_obstacle_trajectory, dynamic_obstacle_shape)
-
-    return DynamicObstacle(
-        dynamic_obstacle_id,
-        dynamic_obstacle_type,
-        dynamic_obstacle_shape,
-        dynamic_obstacle_initial_state,
-        dynamic_obstacle_prediction,
+    agents_df = DataFrame(
+        {
+            "obstacle_type": [obstacle_class_dict[vehicle_class].value for vehicle_class in tracks_meta_df["class"]],
+            "length": tracks_meta_df.width.values,
+            "width": tracks_meta_df.height.values,
+        },
+        index=tracks_meta_df.id.values,
+    )
+    accelerations = yaw_rates = None
+    if "yaw_rate" in tracks_df.columns:
+        accelerations = tracks_df.acceleration.values
+        yaw_rates = tracks_df.yaw_rate.values
+    elif recorded_accelerations:
+        accelerations = get_acceleration(tracks_df).values
+    return TrackTable(
+        tracks_df.id.values,
+        tracks_df.frame.values,
+        tracks_df.x.values,
+        tracks_df.y.values,
+        get_velocity(tracks_df).values,
+        tracks_df.orientation.values,
+        agents_df,
+        accelerations,
+        yaw_rates,
     )
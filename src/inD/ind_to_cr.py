@@ -12,180 +12,177 @@ Converts inD files to Commonroad Format, creating smaller Planning Problems if r
 
 import os
 import glob
-import copy
-import math
-import random
 import logging
+import numpy as np
 import pandas as pd
 import multiprocessing
-from typing import Dict, Union
+from typing import Dict, Iterator, List, Set, Tuple, Union
+from collections import Counter
 
-from commonroad.scenario.scenario import Scenario
+from commonroad.scenario.lanelet import LaneletNetwork
+from commonroad.scenario.scenario import Scenario, Tag
 from commonroad.planning.planning_problem import PlanningProblemSet
-from commonroad.common.file_writer import (
-    CommonRoadFileWriter,
-    Tag,
-    OverwriteExistingFile,
-)
 
-from data_converters.src.helper import load_yaml
+from data_converters.src.catalog_utils import concat_catalogs
+from data_converters.src.conversion_utils import WorkUnit
+from data_converters.src.event_utils import close_interaction_frames
+from data_converters.src.generator_utils import prefetch_generators
+from data_converters.src.helper import load_yaml, print_conversion_report, write_scenario
 from data_converters.src.inD.map_utils import (
     load_lanelet_networks,
+    locationId_to_lanelet_network,
     meta_scenario_from_recording,
 )
-from data_converters.src.inD.obstacle_utils import generate_obstacle
-from data_converters.src.planning_problem_utils import (
-    generate_planning_problem,
-    NoCarException,
-    obstacle_to_planning_problem,
-)
+from data_converters.src.inD.obstacle_utils import ind_track_table
+from data_converters.src.motion_utils import compute_motion_summaries, STOP_VELOCITY
+from data_converters.src.lanelet_utils import get_lanelet_grid, on_map_ratios
+from data_converters.src.schema_utils import TrackTable
+from data_converters.src.shard_utils import shard_recordings
+from data_converters.src.track_utils import resample_tracks, update_tracks_meta, TrackIndex
+from data_converters.src.window_utils import event_windows, get_windows
 
 LOGGER = logging.getLogger(__name__)
 
+# number of frames a scenario of --inD_all continues after its ego vehicle disappears
+TIME_STEP_HALF_RANGE = 25
 
-def generate_single_scenario(
-    ind_config: Dict,
-    num_planning_problems: int,
-    keep_ego: bool,
-    output_dir: str,
-    tracks_df: pd.DataFrame,
-    tracks_meta_df: pd.DataFrame,
-    meta_scenario: Scenario,
-    benchmark_id: str,
-    frame_start: int,
-    frame_end: int,
-    obstacle_start_at_zero: bool,
-    ego_vehicle_id=None,
+
+def write_scenarios(
+    scenarios: Iterator[Tuple[Scenario, PlanningProblemSet]], output_dir: str, obstacle_start_at_zero: bool
 ):
     """
-    Generate a single CommonRoad scenario based on inD record snippet
-    :param ind_config: dictionary with configuration parameters for highD scenario generation
-    :param num_planning_problems: number of planning problems per CommonRoad scenario
+    Writes scenarios with their planning problems to files
+
+    :param scenarios: iterator over the scenarios with their planning problems
     :param output_dir: path to store generated CommonRoad scenario files
-    :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
-    :param tracks_df: single track
-    :param tracks_meta_df: single meta information track
-    :param meta_scenario: CommonRoad scenario with lanelet network
-    :param benchmark_id: CommonRoad benchmark ID for scenario
-    :param frame_start: start of frame in time steps of record
-    :param frame_end: end of frame in time steps of record
     :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to start
     at time step zero
-    :param ego_vehicle_id: None if random select ego vehicle from all converted cars
     """
+    for scenario, planning_problem_set in scenarios:
+        # Do not check validity if obstacles do not start at zero because validity will not pass
+        filename = write_scenario(scenario, planning_problem_set, output_dir, check_validity=obstacle_start_at_zero)
+        print("Scenario file stored in {}".format(filename))
 
-    def enough_time_steps(veh_id: int):
-        vehicle_meta = tracks_meta_df[tracks_meta_df.trackId == veh_id]
-        if (
-            not obstacle_start_at_zero
-            and frame_end - int(vehicle_meta.initialFrame) < 2
-            or int(vehicle_meta.finalFrame) - frame_start < 2
-        ):
-            return False
-        elif (
-            obstacle_start_at_zero
-            and int(vehicle_meta.initialFrame) > frame_start
-            or int(vehicle_meta.finalFrame) - frame_start < 2
-        ):
-            return False
-        return True
 
-    # copy meta_scenario with lanelet networks
-    scenario = copy.deepcopy(meta_scenario)
-    scenario.scenario_id = benchmark_id
+def load_recording(
+    recording_meta_fn: str,
+    tracks_meta_fn: str,
+    tracks_fn: str,
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, float]:
+    """
+    Reads the files of an inD recording and resamples its tracks to the time step size of the scenarios
 
-    # read tracks appear between [frame_start, frame_end]
-    scenario_tracks_df = tracks_df[(tracks_df.frame >= frame_start) & (tracks_df.frame <= frame_end)]
-    planning_problem_set = PlanningProblemSet()
+    :param recording_meta_fn: path to *_recordingMeta.csv
+    :param tracks_meta_fn: path to *_tracksMeta.csv
+    :param tracks_fn: path to *_tracks.csv
+    :param downsample: resample states of trajectories of dynamic obstacles every downsample steps
+    :param target_dt: time step size of the generated scenarios, overrides downsample
+    :return: recording meta information, track meta information, tracks and time step size
+    """
+    # read data frames from the three files
+    recording_meta_df = pd.read_csv(recording_meta_fn, header=0)
+    tracks_meta_df = pd.read_csv(tracks_meta_fn, header=0)
+    tracks_df = pd.read_csv(tracks_fn, header=0)
 
-    if ego_vehicle_id is not None:
-        # create obstacle and planning problem from this track of ego car
-        ego_obstacle = generate_obstacle(
-            scenario_tracks_df,
-            tracks_meta_df,
-            vehicle_id=ego_vehicle_id,
-            obstacle_id=scenario.generate_object_id(),
-            frame_start=frame_start,
-            class_to_type=ind_config.get("class_to_obstacleType"),
-            detect_static_vehicles=False,
-        )
-        if keep_ego:
-            scenario.add_objects(ego_obstacle)
-            planning_problem_id = scenario.generate_object_id()
-        else:
-            planning_problem_id = ego_obstacle.obstacle_id
-
-        planning_problem = obstacle_to_planning_problem(obstacle=ego_obstacle, planning_problem_id=planning_problem_id)
-        planning_problem_set.add_planning_problem(planning_problem)
-        num_planning_problems -= 1
-
-    # generate CR obstacles
-    for vehicle_id in [
-        vehicle_id
-        for vehicle_id in scenario_tracks_df.trackId.unique()
-        if vehicle_id in tracks_meta_df.trackId.unique()
-    ]:
-        # if appearing time steps < min_time_steps, skip vehicle
-        if not enough_time_steps(vehicle_id):
-            continue
-        if ego_vehicle_id is not None and vehicle_id == ego_vehicle_id:
-            continue
-        print(
-            "Generating scenario {}, vehicle id {}".format(benchmark_id, vehicle_id),
-            end="\r",
-        )
-        obstacle = generate_obstacle(
-            scenario_tracks_df,
-            tracks_meta_df,
-            vehicle_id=vehicle_id,
-            obstacle_id=scenario.generate_object_id(),
-            frame_start=frame_start,
-            class_to_type=ind_config.get("class_to_obstacleType"),
-            detect_static_vehicles=False,
-        )
-        scenario.add_objects(obstacle)
-
-    # return if scenario contains no dynamic obstacle
-    if len(scenario.dynamic_obstacles) == 0:
-        return
-
-    # generate planning problems
-    for _ in range(num_planning_problems):
-        planning_problem = generate_planning_problem(scenario, keep_ego=keep_ego)
-        planning_problem_set.add_planning_problem(planning_problem)
-
-    # write new scenario
-    tags = {Tag(tag) for tag in ind_config.get("tags")}
-    fw = CommonRoadFileWriter(
-        scenario,
-        planning_problem_set,
-        ind_config.get("author"),
-        ind_config.get("affiliation"),
-        ind_config.get("source"),
-        tags,
+    # resample tracks to the time step size of the scenarios
+    recording_dt = 1.0 / recording_meta_df.frameRate.values[0]
+    tracks_df, dt = resample_tracks(
+        tracks_df, "trackId", "frame", recording_dt, downsample, target_dt, angle_columns={"heading": 360.0}
     )
-    filename = os.path.join(output_dir, "{}.xml".format(scenario.scenario_id))
+    if dt != recording_dt:
+        tracks_meta_df = update_tracks_meta(tracks_meta_df, tracks_df, "trackId")
+    return recording_meta_df, tracks_meta_df, tracks_df, dt
 
-    # Do not check validity if obstacles do not start at zero because validity will not pass
-    fw.write_to_file(filename, OverwriteExistingFile.ALWAYS, check_validity=obstacle_start_at_zero)
-    print("Scenario file stored in {}".format(filename))
 
+def remove_off_map_tracks(
+    tracks_meta_df: pd.DataFrame,
+    tracks_df: pd.DataFrame,
+    lanelet_network: LaneletNetwork,
+    min_on_map_ratio: float,
+    report: Union[Counter, None] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Removes the tracks of cars, trucks and buses which are mostly off the lanelets of the map, e.g., in parking lots,
+    before any obstacle is generated; pedestrians and bicycles use sidewalks and are kept
 
-def load_data(recording_meta_fn: str, tracks_meta_fn: str, tracks_fn: str, ind_config: Dict):
-    # read data frames from the three files
-    recording_meta_df = pd.read_csv(recording_meta_fn, header=0)
-    tracks_meta_df = pd.read_csv(tracks_meta_fn, header=0)
-    tracks_df = pd.read_csv(tracks_fn, header=0)
+    :param tracks_meta_df: track meta information of the recording
+    :param tracks_df: tracks of the recording
+    :param lanelet_network: lanelet network of the location of the recording
+    :param min_on_map_ratio: minimal fraction of the positions of a vehicle within the lanelets
+    :param report: counter of the removed tracks, updated in place
+    :return: track meta information and tracks without the removed tracks
+    """
+    ratios = on_map_ratios(
+        get_lanelet_grid(lanelet_network), tracks_df.trackId.values, tracks_df.xCenter.values, tracks_df.yCenter.values
+    )
+    track_ids = tracks_meta_df.trackId.values
+    off_map = tracks_meta_df["class"].isin(["car", "truck_bus"]).values & (
+        ratios.reindex(track_ids, fill_value=0.0).values < min_on_map_ratio
+    )
+    if report is not None:
+        report["removed_off_map_tracks"] += int(np.sum(off_map))
+    return tracks_meta_df[~off_map], tracks_df[~tracks_df.trackId.isin(track_ids[off_map])]
+
+
+def load_data(
+    recording_meta_fn: str,
+    tracks_meta_fn: str,
+    tracks_fn: str,
+    ind_config: Dict,
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    detect_static_vehicles: bool = False,
+    min_on_map_ratio: Union[float, None] = None,
+    report: Union[Counter, None] = None,
+    derive_kinematics: bool = False,
+) -> Tuple[pd.DataFrame, pd.DataFrame, TrackIndex, TrackTable, Scenario]:
+    """
+    Reads an inD recording, removes the vehicles off the map and normalizes its tracks once for all windows
+
+    :param recording_meta_fn: path to *_recordingMeta.csv
+    :param tracks_meta_fn: path to *_tracksMeta.csv
+    :param tracks_fn: path to *_tracks.csv
+    :param ind_config: dictionary with configuration parameters for inD scenario generation
+    :param downsample: resample states of trajectories of dynamic obstacles every downsample steps
+    :param target_dt: time step size of the generated scenarios, overrides downsample
+    :param detect_static_vehicles: whether to convert vehicles which do not move during the recording to
+    static obstacles
+    :param min_on_map_ratio: minimal fraction of the positions of a vehicle within the lanelets of the map, vehicles
+    mostly off the map are removed before obstacles are generated, all vehicles are kept if None
+    :param report: counter of the removed tracks, updated in place
+    :param derive_kinematics: whether the yaw rates of the states are derived from the tracks, see
+    kinematics_utils.track_kinematics
+    :return: recording meta information, track meta information, index of the raw tracks in the order of the rows of
+    the track table, track table and meta scenario with the lanelet network
+    """
+    recording_meta_df, tracks_meta_df, tracks_df, dt = load_recording(
+        recording_meta_fn, tracks_meta_fn, tracks_fn, downsample, target_dt
+    )
 
     # generate meta scenario with lanelet network
     meta_scenario = meta_scenario_from_recording(
         ind_config,
         recording_meta_df.locationId.values[0],
         recording_meta_df.recordingId.values[0],
-        recording_meta_df.frameRate.values[0],
+        1.0 / dt,
     )
+    if min_on_map_ratio is not None:
+        tracks_meta_df, tracks_df = remove_off_map_tracks(
+            tracks_meta_df, tracks_df, meta_scenario.lanelet_network, min_on_map_ratio, report
+        )
 
-    return recording_meta_df, tracks_meta_df, tracks_df, meta_scenario
+    # convert the tracks of the whole recording once for all scenarios
+    track_index = TrackIndex(tracks_df, "trackId")
+    track_table = ind_track_table(
+        track_index,
+        tracks_meta_df,
+        ind_config.get("class_to_obstacleType"),
+        detect_static_vehicles,
+        dt if derive_kinematics else None,
+    )
+    return recording_meta_df, tracks_meta_df, track_index, track_table, meta_scenario
 
 
 def construct_benchmark_id(ind_config, recording_meta_df, idx_1):
@@ -196,19 +193,169 @@ def construct_benchmark_id(ind_config, recording_meta_df, idx_1):
     )
 
 
-def generate_scenarios_for_record(
+def get_record_windows(
+    tracks_meta_df: pd.DataFrame,
+    track_index: TrackIndex,
+    num_time_steps_scenario: int,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Separates a recording into consecutive windows or places windows around the close interactions of moving road
+    users with cars, trucks and buses
+
+    :param tracks_meta_df: track meta information of the recording
+    :param track_index: index of the tracks of the recording
+    :param num_time_steps_scenario: maximal number of time steps per CommonRoad scenario
+    :param event_margins: time steps of a window before and after its event, consecutive windows if None
+    :param stride: time steps between the starts of consecutive windows, overlapping windows if smaller than
+    the window length, disjoint windows if None; ignored for event windows
+    :return: first and last frame of each window
+    """
+    if event_margins is None:
+        return get_windows(tracks_meta_df, num_time_steps_scenario, stride)
+    tracks_df = track_index.tracks_df
+    classes = tracks_meta_df.set_index("trackId")["class"].reindex(tracks_df.trackId.values).values
+    interactions = close_interaction_frames(
+        tracks_df.trackId.values,
+        tracks_df.frame.values,
+        tracks_df.xCenter.values,
+        tracks_df.yCenter.values,
+        np.isin(classes, ["car", "truck_bus"]),
+        movers=np.hypot(tracks_df.xVelocity.values, tracks_df.yVelocity.values) > STOP_VELOCITY,
+    )
+    return event_windows(
+        interactions, *event_margins, int(tracks_meta_df.initialFrame.min()), int(tracks_meta_df.finalFrame.max())
+    )
+
+
+def moving_car_mask(tracks_meta_df: pd.DataFrame, track_index: TrackIndex, num_time_steps_scenario: int) -> np.ndarray:
+    """
+    Selects all moving cars which are long enough to be the ego vehicle of their own scenario
+
+    :param tracks_meta_df: track meta information of the recording
+    :param track_index: index of the tracks of the recording
+    :param num_time_steps_scenario: minimal number of time steps of a scenario
+    :return: boolean mask over the tracks of the meta information
+    """
+    # summarize the motion of all tracks at once to select moving vehicles
+    tracks_df = track_index.tracks_df
+    motion_summaries = compute_motion_summaries(
+        tracks_df.trackId.values,
+        tracks_df.xCenter.values,
+        tracks_df.yCenter.values,
+        np.hypot(tracks_df.xVelocity.values, tracks_df.yVelocity.values),
+        np.radians(tracks_df.heading.values),
+    )
+    max_velocities = motion_summaries.max_velocity.reindex(tracks_meta_df.trackId.values, fill_value=0.0).values
+    return (
+        (tracks_meta_df["class"].values == "car")
+        & (tracks_meta_df.numFrames.values >= num_time_steps_scenario)
+        & (max_velocities**2 > 10.0)
+    )
+
+
+def record_work_unit(
+    recording_meta_df: pd.DataFrame,
+    tracks_meta_df: pd.DataFrame,
+    track_index: TrackIndex,
+    track_table: TrackTable,
+    ind_config: Dict,
+    num_time_steps_scenario: int,
+    num_planning_problems: int,
+    keep_ego: bool,
+    obstacle_start_at_zero: bool,
+    inD_all: bool = False,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    collision_screen: bool = False,
+    report: Union[Counter, None] = None,
+    min_ego_arc_length: float = 0.0,
+    critical_ego: bool = False,
+) -> Tuple[WorkUnit, List[str]]:
+    """
+    Separates an inD recording into pre-screened windows, or into one window for each moving car which follows it
+
+    :param recording_meta_df: recording meta information
+    :param tracks_meta_df: track meta information of the recording
+    :param track_index: index of the tracks of the recording, see load_data
+    :param track_table: tracks of the recording, see ind_track_table
+    :param ind_config: dictionary with configuration parameters for inD scenario generation
+    :param num_time_steps_scenario: maximal number of time steps per CommonRoad scenario
+    :param num_planning_problems: number of planning problems per CommonRoad scenario
+    :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
+    :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to start
+    at time step zero
+    :param inD_all: whether to generate one window for each moving car instead of fixed windows
+    :param event_margins: time steps of a window before and after its event, consecutive windows if None
+    :param stride: time steps between the starts of consecutive windows, overlapping windows if smaller than
+    the window length, disjoint windows if None; ignored for event windows
+    :param collision_screen: whether windows with overlapping footprints at their first frame or along the
+    trajectories of their ego candidates are discarded before their obstacles are built
+    :param report: counter of the windows skipped by the pre-screening, per reason, updated in place
+    :param min_ego_arc_length: minimal length of the path driven by a car within a window to be selected as its ego
+    vehicle, the given ego vehicles of inD_all are kept
+    :param critical_ego: whether the most critical ego candidates of each window become its ego vehicles instead of
+    random ones, see conversion_utils.WorkUnit.ego_scores
+    :return: work unit of the recording and benchmark ID of each window
+    """
+    ego_vehicle_ids = None
+    if inD_all:
+        # select all moving cars which are long enough as ego vehicles and create one window for each car
+        tracks_meta_df = tracks_meta_df.sort_values("trackId")
+        ego_mask = moving_car_mask(tracks_meta_df, track_index, num_time_steps_scenario)
+        window_ids = ego_vehicle_ids = tracks_meta_df.trackId.values[ego_mask]
+        frame_starts = tracks_meta_df.initialFrame.values[ego_mask]
+        frame_ends = tracks_meta_df.finalFrame.values[ego_mask] + TIME_STEP_HALF_RANGE
+    else:
+        frame_starts, frame_ends = get_record_windows(
+            tracks_meta_df, track_index, num_time_steps_scenario, event_margins, stride
+        )
+        window_ids = np.arange(len(frame_starts))
+
+    work_unit = WorkUnit(
+        "inD",
+        track_table,
+        frame_starts,
+        frame_ends,
+        num_planning_problems,
+        keep_ego,
+        obstacle_start_at_zero,
+        ego_vehicle_ids=ego_vehicle_ids,
+        min_ego_arc_length=min_ego_arc_length,
+        critical_ego=critical_ego,
+    )
+    work_unit.prescreen(collision_screen, report)
+    return work_unit, [construct_benchmark_id(ind_config, recording_meta_df, window_id) for window_id in window_ids]
+
+
+def iter_scenarios_for_record(
     recording_meta_fn: str,
     tracks_meta_fn: str,
     tracks_fn: str,
     num_time_steps_scenario: int,
     num_planning_problems: int,
     keep_ego: bool,
-    output_dir: str,
     ind_config: Dict,
     obstacle_start_at_zero: bool,
-):
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    detect_static_vehicles: bool = False,
+    report: Union[Counter, None] = None,
+    benchmark_ids: Union[Set[str], None] = None,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    lanelet_assignment: bool = False,
+    collision_screen: bool = False,
+    min_on_map_ratio: Union[float, None] = None,
+    derive_kinematics: bool = False,
+    seed: Union[int, None] = None,
+    min_ego_arc_length: float = 0.0,
+    critical_ego: bool = False,
+    inD_all: bool = False,
+) -> Iterator[Tuple[Scenario, PlanningProblemSet]]:
     """
-    Generate CommonRoad scenarios with given paths to highD for a high-D recording
+    Generate CommonRoad scenarios with given paths to inD for an inD recording window by window
 
     :param recording_meta_fn: path to *_recordingMeta.csv
     :param tracks_meta_fn: path to *_tracksMeta.csv
@@ -216,42 +363,135 @@ def generate_scenarios_for_record(
     :param num_time_steps_scenario: maximal number of time steps per CommonRoad scenario
     :param num_planning_problems: number of planning problems per CommonRoad scenario
     :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
-    :param output_dir: path to store generated CommonRoad scenario files
     :param ind_config: dictionary with configuration parameters for inD scenario generation
     :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to start
     at time step zero
+    :param downsample: resample states of trajectories of dynamic obstacles every downsample steps
+    :param target_dt: time step size of the generated scenarios, overrides downsample
+    :param detect_static_vehicles: whether to convert vehicles which do not move during the recording to
+    static obstacles
+    :param report: counter of the generated scenarios and of the windows skipped by the pre-screening, per reason,
+    updated in place
+    :param benchmark_ids: benchmark IDs of the windows to convert, e.g., selected from a catalog, all if None
+    :param event_margins: time steps of a window before and after its event, consecutive windows if None
+    :param stride: time steps between the starts of consecutive windows, overlapping windows if smaller than
+    the window length, disjoint windows if None; ignored for event windows
+    :param lanelet_assignment: boolean indicating if the lanelets of the obstacles and of the goals of the
+    planning problems are assigned
+    :param collision_screen: whether windows with overlapping footprints at their first frame or along the
+    trajectories of their ego candidates are discarded before their obstacles are built
+    :param min_on_map_ratio: minimal fraction of the positions of a vehicle within the lanelets of the map, vehicles
+    mostly off the map are removed before obstacles are generated, all vehicles are kept if None
+    :param derive_kinematics: whether the yaw rates of the states are derived from the tracks, see
+    kinematics_utils.track_kinematics
+    :param seed: seed of the random number generators of the windows which choose the ego vehicles, see
+    planning_problem_utils.window_rng, every choice is seeded with zero if None
+    :param min_ego_arc_length: minimal length of the path driven by a car within a window to be selected as its ego
+    vehicle, see conversion_utils.WorkUnit
+    :param critical_ego: whether the most critical ego candidates of each window become its ego vehicles instead of
+    random ones, see conversion_utils.WorkUnit.ego_scores
+    :param inD_all: whether to generate one scenario for each moving car instead of fixed windows, see
+    record_work_unit; event_margins, stride and collision_screen are ignored
+    :return: iterator over the scenarios with their planning problems
     """
-    recording_meta_df, tracks_meta_df, tracks_df, meta_scenario = load_data(
-        recording_meta_fn, tracks_meta_fn, tracks_fn, ind_config
+    recording_meta_df, tracks_meta_df, track_index, track_table, meta_scenario = load_data(
+        recording_meta_fn,
+        tracks_meta_fn,
+        tracks_fn,
+        ind_config,
+        downsample,
+        target_dt,
+        detect_static_vehicles,
+        min_on_map_ratio,
+        report,
+        derive_kinematics,
+    )
+    work_unit, window_benchmark_ids = record_work_unit(
+        recording_meta_df,
+        tracks_meta_df,
+        track_index,
+        track_table,
+        ind_config,
+        num_time_steps_scenario,
+        num_planning_problems,
+        keep_ego,
+        obstacle_start_at_zero,
+        inD_all,
+        event_margins,
+        stride,
+        collision_screen,
+        report,
+        min_ego_arc_length=min_ego_arc_length,
+        critical_ego=critical_ego,
+    )
+    yield from work_unit.iter_scenarios(
+        window_benchmark_ids,
+        meta_scenario,
+        ind_config,
+        {Tag(tag) for tag in ind_config.get("tags")},
+        benchmark_ids,
+        report,
+        seed,
+        lanelet_grid=get_lanelet_grid(meta_scenario.lanelet_network) if lanelet_assignment else None,
     )
 
-    # separate record and generate scenario for each separated part for each direction
-    # (upper interstate direction / lower interstate direction)
-    num_scenarios = math.ceil(max(tracks_meta_df.finalFrame) / num_time_steps_scenario)
-    for idx_1 in range(num_scenarios):
-        # benchmark id format: COUNTRY_SCENE_CONFIG_PRED
-        frame_start = idx_1 * num_time_steps_scenario + (idx_1 + 1)
-        frame_end = (idx_1 + 1) * num_time_steps_scenario + (idx_1 + 1)
-        benchmark_id = construct_benchmark_id(ind_config, recording_meta_df, idx_1)
-        try:
-            generate_single_scenario(
-                ind_config,
-                num_planning_problems,
-                keep_ego,
-                output_dir,
-                tracks_df,
-                tracks_meta_df,
-                meta_scenario,
-                benchmark_id,
-                frame_start,
-                frame_end,
-                obstacle_start_at_zero,
-            )
-        except NoCarException as e:
-            print(f"No car in this scenario: {repr(e)}. Skipping this scenario.")
+
+def iter_scenarios_for_record_vehicle(
+    recording_meta_fn: str,
+    tracks_meta_fn: str,
+    tracks_fn: str,
+    num_time_steps_scenario: int,
+    num_planning_problems: int,
+    keep_ego: bool,
+    ind_config: Dict,
+    obstacle_start_at_zero: bool,
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    detect_static_vehicles: bool = False,
+    report: Union[Counter, None] = None,
+    benchmark_ids: Union[Set[str], None] = None,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    lanelet_assignment: bool = False,
+    collision_screen: bool = False,
+    min_on_map_ratio: Union[float, None] = None,
+    derive_kinematics: bool = False,
+    seed: Union[int, None] = None,
+    min_ego_arc_length: float = 0.0,
+    critical_ego: bool = False,
+) -> Iterator[Tuple[Scenario, PlanningProblemSet]]:
+    """
+    Generate one CommonRoad scenario for each moving car of an inD recording, see iter_scenarios_for_record with
+    inD_all
+    """
+    return iter_scenarios_for_record(
+        recording_meta_fn,
+        tracks_meta_fn,
+        tracks_fn,
+        num_time_steps_scenario,
+        num_planning_problems,
+        keep_ego,
+        ind_config,
+        obstacle_start_at_zero,
+        downsample,
+        target_dt,
+        detect_static_vehicles,
+        report,
+        benchmark_ids,
+        event_margins,
+        stride,
+        lanelet_assignment,
+        collision_screen,
+        min_on_map_ratio,
+        derive_kinematics,
+        seed,
+        inD_all=True,
+        min_ego_arc_length=min_ego_arc_length,
+        critical_ego=critical_ego,
+    )
 
 
-def generate_scenarios_for_record_vehicle(
+def generate_scenarios_for_record(
     recording_meta_fn: str,
     tracks_meta_fn: str,
     tracks_fn: str,
@@ -261,55 +501,114 @@ def generate_scenarios_for_record_vehicle(
     output_dir: str,
     ind_config: Dict,
     obstacle_start_at_zero: bool,
-):
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    detect_static_vehicles: bool = False,
+    benchmark_ids: Union[Set[str], None] = None,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    lanelet_assignment: bool = False,
+    collision_screen: bool = False,
+    min_on_map_ratio: Union[float, None] = None,
+    derive_kinematics: bool = False,
+    seed: Union[int, None] = None,
+    min_ego_arc_length: float = 0.0,
+    critical_ego: bool = False,
+) -> Counter:
     """
-    Generate CommonRoad scenarios with given paths to inD for an inD recording
+    Generate CommonRoad scenarios with given paths to inD for an inD recording and write them to files,
+    see iter_scenarios_for_record
 
-    :param recording_meta_fn: path to *_recordingMeta.csv
-    :param tracks_meta_fn: path to *_tracksMeta.csv
-    :param tracks_fn: path to *_tracks.csv
-    :param num_time_steps_scenario: maximal number of time steps per CommonRoad scenario
-    :param num_planning_problems: number of planning problems per CommonRoad scenario
-    :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
     :param output_dir: path to store generated CommonRoad scenario files
-    :param ind_config: dictionary with configuration parameters for inD scenario generation
-    :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to start
-    at time step zero
+    :return: number of windows skipped by the pre-screening, per reason
     """
-    recording_meta_df, tracks_meta_df, tracks_df, meta_scenario = load_data(
-        recording_meta_fn, tracks_meta_fn, tracks_fn, ind_config
+    report = Counter()
+    scenarios = iter_scenarios_for_record(
+        recording_meta_fn,
+        tracks_meta_fn,
+        tracks_fn,
+        num_time_steps_scenario,
+        num_planning_problems,
+        keep_ego,
+        ind_config,
+        obstacle_start_at_zero,
+        downsample,
+        target_dt,
+        detect_static_vehicles,
+        report,
+        benchmark_ids,
+        event_margins,
+        stride,
+        lanelet_assignment,
+        collision_screen,
+        min_on_map_ratio,
+        derive_kinematics,
+        seed,
+        min_ego_arc_length=min_ego_arc_length,
+        critical_ego=critical_ego,
     )
+    write_scenarios(scenarios, output_dir, obstacle_start_at_zero)
+    return report
 
-    # iterate all cars and create one scenario for each car
-    tracks_meta_df_car = tracks_meta_df[
-        (tracks_meta_df["class"] == "car") & (tracks_meta_df.numFrames >= num_time_steps_scenario)
-    ]
-    time_step_half_range = 25
-
-    for ego_vehicle_id in tracks_meta_df_car.trackId.unique():
-        track_df_vehicle = tracks_df[tracks_df.trackId == ego_vehicle_id]
-        max_velocity = max(track_df_vehicle.xVelocity**2 + track_df_vehicle.yVelocity**2)
-        if max_velocity > 10.0:
-            # select this moving vehicle as ego vehicle
-            # cut tracks_df into track_df_vehicle
-            frame_start = min(track_df_vehicle.frame)
-            frame_end = max(track_df_vehicle.frame) + time_step_half_range
-
-            benchmark_id = construct_benchmark_id(ind_config, recording_meta_df, ego_vehicle_id)
-            generate_single_scenario(
-                ind_config,
-                num_planning_problems,
-                keep_ego,
-                output_dir,
-                tracks_df,
-                tracks_meta_df,
-                meta_scenario,
-                benchmark_id,
-                frame_start,
-                frame_end,
-                obstacle_start_at_zero,
-                ego_vehicle_id=ego_vehicle_id,
-            )
+
+def generate_scenarios_for_record_vehicle(
+    recording_meta_fn: str,
+    tracks_meta_fn: str,
+    tracks_fn: str,
+    num_time_steps_scenario: int,
+    num_planning_problems: int,
+    keep_ego: bool,
+    output_dir: str,
+    ind_config: Dict,
+    obstacle_start_at_zero: bool,
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    detect_static_vehicles: bool = False,
+    benchmark_ids: Union[Set[str], None] = None,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    lanelet_assignment: bool = False,
+    collision_screen: bool = False,
+    min_on_map_ratio: Union[float, None] = None,
+    derive_kinematics: bool = False,
+    seed: Union[int, None] = None,
+    min_ego_arc_length: float = 0.0,
+    critical_ego: bool = False,
+) -> Counter:
+    """
+    Generate one CommonRoad scenario for each moving car of an inD recording and write them to files,
+    see iter_scenarios_for_record_vehicle
+
+    :param output_dir: path to store generated CommonRoad scenario files
+    :return: number of scenarios skipped by the catalog filter, no windows are pre-screened
+    """
+    report = Counter()
+    scenarios = iter_scenarios_for_record_vehicle(
+        recording_meta_fn,
+        tracks_meta_fn,
+        tracks_fn,
+        num_time_steps_scenario,
+        num_planning_problems,
+        keep_ego,
+        ind_config,
+        obstacle_start_at_zero,
+        downsample,
+        target_dt,
+        detect_static_vehicles,
+        report,
+        benchmark_ids,
+        event_margins,
+        stride,
+        lanelet_assignment,
+        collision_screen,
+        min_on_map_ratio,
+        derive_kinematics,
+        seed,
+        min_ego_arc_length,
+        critical_ego,
+    )
+    write_scenarios(scenarios, output_dir, obstacle_start_at_zero)
+    return report
 
 
 def create_ind_scenarios(
@@ -320,10 +619,23 @@ def create_ind_scenarios(
     keep_ego: bool,
     obstacle_start_at_zero: bool,
     map_dir: Union[str, None] = None,
-    seed: int = 0,
+    seed: Union[int, None] = None,
     verbose: bool = True,
     num_processes: int = 1,
     inD_all: bool = False,
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    detect_static_vehicles: bool = False,
+    benchmark_ids: Union[Set[str], None] = None,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    lanelet_assignment: bool = False,
+    collision_screen: bool = False,
+    min_on_map_ratio: Union[float, None] = None,
+    derive_kinematics: bool = False,
+    shard: Union[Tuple[int, int], None] = None,
+    min_ego_arc_length: float = 0.0,
+    critical_ego: bool = False,
 ):
     if verbose:
         LOGGER.setLevel(logging.INFO)
@@ -335,9 +647,6 @@ def create_ind_scenarios(
     if map_dir is None:
         map_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "repaired_maps")
 
-    # set the seed for random slices
-    random.seed(seed)
-
     # generate path to highd data files
     path_tracks = os.path.join(input_dir, "data/*_tracks.csv")
     path_metas = os.path.join(input_dir, "data/*_tracksMeta.csv")
@@ -347,6 +656,9 @@ def create_ind_scenarios(
     listing_tracks = sorted(glob.glob(path_tracks))
     listing_metas = sorted(glob.glob(path_metas))
     listing_recording = sorted(glob.glob(path_recording))
+    listing_recording, listing_metas, listing_tracks = shard_recordings(
+        shard, listing_recording, listing_metas, listing_tracks
+    )
 
     ind_config = load_yaml(os.path.dirname(os.path.abspath(__file__)) + "/config.yaml")
     load_lanelet_networks(map_dir, ind_config=ind_config)
@@ -356,13 +668,14 @@ def create_ind_scenarios(
     else:
         fn = generate_scenarios_for_record
 
+    report = Counter()
     if num_processes < 2:
         for index, (recording_meta_fn, tracks_meta_fn, tracks_fn) in enumerate(
             zip(listing_recording, listing_metas, listing_tracks)
         ):
             print("=" * 80)
             print("Processing file {}...".format(tracks_fn), end="\n")
-            fn(
+            report += fn(
                 recording_meta_fn,
                 tracks_meta_fn,
                 tracks_fn,
@@ -372,10 +685,23 @@ def create_ind_scenarios(
                 output_dir,
                 ind_config,
                 obstacle_start_at_zero,
+                downsample,
+                target_dt,
+                detect_static_vehicles,
+                benchmark_ids,
+                event_margins,
+                stride,
+                lanelet_assignment,
+                collision_screen,
+                min_on_map_ratio,
+                derive_kinematics,
+                seed,
+                min_ego_arc_length,
+                critical_ego,
             )
     else:
         with multiprocessing.Pool(processes=num_processes) as pool:
-            pool.starmap(
+            record_reports = pool.starmap(
                 fn,
                 [
                     (
@@ -388,9 +714,516 @@ def create_ind_scenarios(
                         output_dir,
                         ind_config,
                         obstacle_start_at_zero,
+                        downsample,
+                        target_dt,
+                        detect_static_vehicles,
+                        benchmark_ids,
+                        event_margins,
+                        stride,
+                        lanelet_assignment,
+                        collision_screen,
+                        min_on_map_ratio,
+                        derive_kinematics,
+                        seed,
+                        min_ego_arc_length,
+                        critical_ego,
                     )
                     for recording_meta_fn, tracks_meta_fn, tracks_fn in zip(
                         listing_recording, listing_metas, listing_tracks
                     )
                 ],
             )
+            for record_report in record_reports:
+                report += record_report
+
+    print_conversion_report(report)
+
+
+def iter_ind_scenarios(
+    input_dir: str,
+    num_time_steps_scenario: int,
+    num_planning_problems: int,
+    keep_ego: bool,
+    obstacle_start_at_zero: bool,
+    map_dir: Union[str, None] = None,
+    seed: Union[int, None] = None,
+    num_processes: int = 1,
+    inD_all: bool = False,
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    detect_static_vehicles: bool = False,
+    prefetch: int = 4,
+    benchmark_ids: Union[Set[str], None] = None,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    lanelet_assignment: bool = False,
+    collision_screen: bool = False,
+    min_on_map_ratio: Union[float, None] = None,
+    derive_kinematics: bool = False,
+    shard: Union[Tuple[int, int], None] = None,
+    min_ego_arc_length: float = 0.0,
+    critical_ego: bool = False,
+) -> Iterator[Tuple[Scenario, PlanningProblemSet]]:
+    """
+    Iterates over all dataset files and yields the CommonRoad scenarios without writing them to files.
+    Each recording is a work unit; with multiple processes the scenarios are yielded in the order in which they are
+    finished.
+
+    :param input_dir: path to dataset files
+    :param num_time_steps_scenario: number of time steps per CommonRoad scenario
+    :param num_planning_problems: number of planning problems per CommonRoad scenario
+    :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
+    :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to start
+    at time step zero
+    :param map_dir: path to the repaired maps, the maps shipped with the converter if None
+    :param seed: seed of the random number generators of the windows which choose the ego vehicles, see
+    planning_problem_utils.window_rng, every choice is seeded with zero if None
+    :param num_processes: number of parallel processes producing scenarios
+    :param inD_all: whether to generate one scenario for each moving car instead of fixed windows
+    :param downsample: resample states of trajectories of dynamic obstacles every downsample steps
+    :param target_dt: time step size of the generated scenarios, overrides downsample
+    :param detect_static_vehicles: whether to convert vehicles which do not move during the recording to
+    static obstacles
+    :param prefetch: maximal number of scenarios produced in advance by the processes
+    :param benchmark_ids: benchmark IDs of the windows to convert, e.g., selected from a catalog, all if None
+    :param event_margins: time steps of a window before and after its event, consecutive windows if None
+    :param stride: time steps between the starts of consecutive windows, overlapping windows if smaller than
+    the window length, disjoint windows if None; ignored for event windows
+    :param lanelet_assignment: boolean indicating if the lanelets of the obstacles and of the goals of the
+    planning problems are assigned
+    :param collision_screen: whether windows with overlapping footprints at their first frame or along the
+    trajectories of their ego candidates are discarded before their obstacles are built
+    :param min_on_map_ratio: minimal fraction of the positions of a vehicle within the lanelets of the map, vehicles
+    mostly off the map are removed before obstacles are generated, all vehicles are kept if None
+    :param derive_kinematics: whether the yaw rates of the states are derived from the tracks, see
+    kinematics_utils.track_kinematics
+    :param shard: index and number of shards, only the recordings of this shard are converted, see
+    shard_utils.shard_recordings, all recordings if None
+    :param min_ego_arc_length: minimal length of the path driven by a car within a window to be selected as its ego
+    vehicle, see conversion_utils.WorkUnit
+    :param critical_ego: whether the most critical ego candidates of each window become its ego vehicles instead of
+    random ones, see conversion_utils.WorkUnit.ego_scores
+    :return: iterator over the scenarios with their planning problems
+    """
+    if map_dir is None:
+        map_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "repaired_maps")
+
+    listing_tracks = sorted(glob.glob(os.path.join(input_dir, "data/*_tracks.csv")))
+    listing_metas = sorted(glob.glob(os.path.join(input_dir, "data/*_tracksMeta.csv")))
+    listing_recording = sorted(glob.glob(os.path.join(input_dir, "data/*_recordingMeta.csv")))
+    listing_recording, listing_metas, listing_tracks = shard_recordings(
+        shard, listing_recording, listing_metas, listing_tracks
+    )
+
+    ind_config = load_yaml(os.path.dirname(os.path.abspath(__file__)) + "/config.yaml")
+    load_lanelet_networks(map_dir, ind_config=ind_config)
+
+    work_units = [
+        (
+            recording_meta_fn,
+            tracks_meta_fn,
+            tracks_fn,
+            num_time_steps_scenario,
+            num_planning_problems,
+            keep_ego,
+            ind_config,
+            obstacle_start_at_zero,
+            downsample,
+            target_dt,
+            detect_static_vehicles,
+            None,
+            benchmark_ids,
+            event_margins,
+            stride,
+            lanelet_assignment,
+            collision_screen,
+            min_on_map_ratio,
+            derive_kinematics,
+            seed,
+            min_ego_arc_length,
+            critical_ego,
+        )
+        for recording_meta_fn, tracks_meta_fn, tracks_fn in zip(listing_recording, listing_metas, listing_tracks)
+    ]
+    fn = iter_scenarios_for_record_vehicle if inD_all else iter_scenarios_for_record
+    return prefetch_generators(fn, work_units, num_processes, prefetch)
+
+
+def export_windows_for_record(
+    recording_meta_fn: str,
+    tracks_meta_fn: str,
+    tracks_fn: str,
+    num_time_steps_scenario: int,
+    num_planning_problems: int,
+    keep_ego: bool,
+    output_dir: str,
+    ind_config: Dict,
+    obstacle_start_at_zero: bool,
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    detect_static_vehicles: bool = False,
+    inD_all: bool = False,
+    export_format: str = "npz",
+    benchmark_ids: Union[Set[str], None] = None,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    collision_screen: bool = False,
+    min_on_map_ratio: Union[float, None] = None,
+    seed: Union[int, None] = None,
+    min_ego_arc_length: float = 0.0,
+    critical_ego: bool = False,
+) -> Counter:
+    """
+    Exports the windows of an inD recording as arrays instead of CommonRoad scenarios, one shard per recording.
+    The windows, obstacles and ego vehicles are the same as the ones of iter_scenarios_for_record; parked vehicles
+    keep their recorded states.
+
+    :param recording_meta_fn: path to *_recordingMeta.csv
+    :param tracks_meta_fn: path to *_tracksMeta.csv
+    :param tracks_fn: path to *_tracks.csv
+    :param num_time_steps_scenario: maximal number of time steps per window
+    :param num_planning_problems: number of ego vehicles per window
+    :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
+    :param output_dir: path to store the shards
+    :param ind_config: dictionary with configuration parameters for inD scenario generation
+    :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to start
+    at time step zero
+    :param downsample: resample states of trajectories of dynamic obstacles every downsample steps
+    :param target_dt: time step size of the generated scenarios, overrides downsample
+    :param detect_static_vehicles: whether to type vehicles which do not move during the recording as parked
+    :param inD_all: whether to export one window for each moving car instead of fixed windows
+    :param export_format: npz or arrow, see write_window_arrays
+    :param benchmark_ids: benchmark IDs of the windows to convert, e.g., selected from a catalog, all if None
+    :param event_margins: time steps of a window before and after its event, consecutive windows if None
+    :param stride: time steps between the starts of consecutive windows, overlapping windows if smaller than
+    the window length, disjoint windows if None; ignored for event windows
+    :param collision_screen: whether windows with overlapping footprints at their first frame or along the
+    trajectories of their ego candidates are discarded before their obstacles are built
+    :param min_on_map_ratio: minimal fraction of the positions of a vehicle within the lanelets of the map, vehicles
+    mostly off the map are removed before obstacles are generated, all vehicles are kept if None
+    :param seed: seed of the random number generators of the windows which choose the ego vehicles, see
+    planning_problem_utils.window_rng, every choice is seeded with zero if None
+    :param min_ego_arc_length: minimal length of the path driven by a car within a window to be selected as its ego
+    vehicle, see conversion_utils.WorkUnit
+    :param critical_ego: whether the most critical ego candidates of each window become its ego vehicles instead of
+    random ones, see conversion_utils.WorkUnit.ego_scores
+    :return: number of windows skipped by the pre-screening, per reason
+    """
+    report = Counter()
+    recording_meta_df, tracks_meta_df, track_index, track_table, meta_scenario = load_data(
+        recording_meta_fn,
+        tracks_meta_fn,
+        tracks_fn,
+        ind_config,
+        downsample,
+        target_dt,
+        detect_static_vehicles,
+        min_on_map_ratio,
+        report,
+    )
+    work_unit, window_benchmark_ids = record_work_unit(
+        recording_meta_df,
+        tracks_meta_df,
+        track_index,
+        track_table,
+        ind_config,
+        num_time_steps_scenario,
+        num_planning_problems,
+        keep_ego,
+        obstacle_start_at_zero,
+        inD_all,
+        event_margins,
+        stride,
+        collision_screen,
+        report,
+        min_ego_arc_length=min_ego_arc_length,
+        critical_ego=critical_ego,
+    )
+    benchmark_prefix = "DEU_{0}-{1}".format(
+        ind_config.get("location_benchmark_id")[recording_meta_df.locationId.values[0]],
+        int(recording_meta_df.recordingId),
+    )
+    work_unit.export_windows(
+        window_benchmark_ids,
+        os.path.join(output_dir, benchmark_prefix),
+        meta_scenario.dt,
+        export_format,
+        benchmark_ids,
+        report,
+        seed,
+    )
+    return report
+
+
+def export_ind_windows(
+    input_dir: str,
+    output_dir: str,
+    num_time_steps_scenario: int,
+    num_planning_problems: int,
+    keep_ego: bool,
+    obstacle_start_at_zero: bool,
+    map_dir: Union[str, None] = None,
+    num_processes: int = 1,
+    inD_all: bool = False,
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    detect_static_vehicles: bool = False,
+    export_format: str = "npz",
+    benchmark_ids: Union[Set[str], None] = None,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    collision_screen: bool = False,
+    min_on_map_ratio: Union[float, None] = None,
+    shard: Union[Tuple[int, int], None] = None,
+    seed: Union[int, None] = None,
+    min_ego_arc_length: float = 0.0,
+    critical_ego: bool = False,
+):
+    """
+    Iterates over all dataset files and exports their windows as arrays, see export_windows_for_record
+
+    :param input_dir: path to dataset files
+    :param output_dir: path to store the shards
+    :param num_time_steps_scenario: number of time steps per window
+    :param num_planning_problems: number of ego vehicles per window
+    :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
+    :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to start
+    at time step zero
+    :param map_dir: path to the repaired maps, the maps shipped with the converter if None
+    :param num_processes: number of parallel processes, each process exports one recording
+    :param inD_all: whether to export one window for each moving car instead of fixed windows
+    :param downsample: resample states of trajectories of dynamic obstacles every downsample steps
+    :param target_dt: time step size of the generated scenarios, overrides downsample
+    :param detect_static_vehicles: whether to type vehicles which do not move during the recording as parked
+    :param export_format: npz or arrow, see write_window_arrays
+    :param benchmark_ids: benchmark IDs of the windows to convert, e.g., selected from a catalog, all if None
+    :param event_margins: time steps of a window before and after its event, consecutive windows if None
+    :param stride: time steps between the starts of consecutive windows, overlapping windows if smaller than
+    the window length, disjoint windows if None; ignored for event windows
+    :param collision_screen: whether windows with overlapping footprints at their first frame or along the
+    trajectories of their ego candidates are discarded before their obstacles are built
+    :param min_on_map_ratio: minimal fraction of the positions of a vehicle within the lanelets of the map, vehicles
+    mostly off the map are removed before obstacles are generated, all vehicles are kept if None
+    :param shard: index and number of shards, only the recordings of this shard are converted, see
+    shard_utils.shard_recordings, all recordings if None
+    :param seed: seed of the random number generators of the windows which choose the ego vehicles, see
+    planning_problem_utils.window_rng, every choice is seeded with zero if None
+    :param min_ego_arc_length: minimal length of the path driven by a car within a window to be selected as its ego
+    vehicle, see conversion_utils.WorkUnit
+    :param critical_ego: whether the most critical ego candidates of each window become its ego vehicles instead of
+    random ones, see conversion_utils.WorkUnit.ego_scores
+    """
+    if map_dir is None:
+        map_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "repaired_maps")
+
+    listing_tracks = sorted(glob.glob(os.path.join(input_dir, "data/*_tracks.csv")))
+    listing_metas = sorted(glob.glob(os.path.join(input_dir, "data/*_tracksMeta.csv")))
+    listing_recording = sorted(glob.glob(os.path.join(input_dir, "data/*_recordingMeta.csv")))
+    listing_recording, listing_metas, listing_tracks = shard_recordings(
+        shard, listing_recording, listing_metas, listing_tracks
+    )
+
+    ind_config = load_yaml(os.path.dirname(os.path.abspath(__file__)) + "/config.yaml")
+    load_lanelet_networks(map_dir, ind_config=ind_config)
+
+    work_units = [
+        (
+            recording_meta_fn,
+            tracks_meta_fn,
+            tracks_fn,
+            num_time_steps_scenario,
+            num_planning_problems,
+            keep_ego,
+            output_dir,
+            ind_config,
+            obstacle_start_at_zero,
+            downsample,
+            target_dt,
+            detect_static_vehicles,
+            inD_all,
+            export_format,
+            benchmark_ids,
+            event_margins,
+            stride,
+            collision_screen,
+            min_on_map_ratio,
+            seed,
+            min_ego_arc_length,
+            critical_ego,
+        )
+        for recording_meta_fn, tracks_meta_fn, tracks_fn in zip(listing_recording, listing_metas, listing_tracks)
+    ]
+    report = Counter()
+    if num_processes < 2:
+        for work_unit in work_units:
+            report += export_windows_for_record(*work_unit)
+    else:
+        with multiprocessing.Pool(processes=num_processes) as pool:
+            for record_report in pool.starmap(export_windows_for_record, work_units):
+                report += record_report
+
+    print_conversion_report(report)
+
+
+def catalog_for_record(
+    recording_meta_fn: str,
+    tracks_meta_fn: str,
+    tracks_fn: str,
+    num_time_steps_scenario: int,
+    num_planning_problems: int,
+    keep_ego: bool,
+    ind_config: Dict,
+    obstacle_start_at_zero: bool,
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    detect_static_vehicles: bool = False,
+    inD_all: bool = False,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    collision_screen: bool = False,
+    min_on_map_ratio: Union[float, None] = None,
+    min_ego_arc_length: float = 0.0,
+) -> pd.DataFrame:
+    """
+    Catalogs the windows of an inD recording without generating them, see catalog_utils.window_statistics.
+    The lanelet networks are only used to remove vehicles off the map, see remove_off_map_tracks.
+
+    :param recording_meta_fn: path to *_recordingMeta.csv
+    :param tracks_meta_fn: path to *_tracksMeta.csv
+    :param tracks_fn: path to *_tracks.csv
+    :param num_time_steps_scenario: maximal number of time steps per CommonRoad scenario
+    :param num_planning_problems: number of planning problems per CommonRoad scenario
+    :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
+    :param ind_config: dictionary with configuration parameters for inD scenario generation
+    :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to start
+    at time step zero
+    :param downsample: resample states of trajectories of dynamic obstacles every downsample steps
+    :param target_dt: time step size of the generated scenarios, overrides downsample
+    :param detect_static_vehicles: whether parked cars are excluded from the ego vehicle candidates
+    :param inD_all: whether to catalog one window for each moving car instead of fixed windows
+    :param event_margins: time steps of a window before and after its event, consecutive windows if None
+    :param stride: time steps between the starts of consecutive windows, overlapping windows if smaller than
+    the window length, disjoint windows if None; ignored for event windows
+    :param collision_screen: whether windows with overlapping footprints at their first frame or along the
+    trajectories of their ego candidates are discarded before their obstacles are built
+    :param min_on_map_ratio: minimal fraction of the positions of a vehicle within the lanelets of the map, vehicles
+    mostly off the map are removed before obstacles are generated, all vehicles are kept if None
+    :param min_ego_arc_length: minimal length of the path driven by a car within a window to be selected as its ego
+    vehicle, see conversion_utils.WorkUnit
+    :return: one row per window, windows skipped by the pre-screening have no benchmark ID
+    """
+    recording_meta_df, tracks_meta_df, tracks_df, _ = load_recording(
+        recording_meta_fn, tracks_meta_fn, tracks_fn, downsample, target_dt
+    )
+    if min_on_map_ratio is not None:
+        tracks_meta_df, tracks_df = remove_off_map_tracks(
+            tracks_meta_df,
+            tracks_df,
+            locationId_to_lanelet_network[recording_meta_df.locationId.values[0]],
+            min_on_map_ratio,
+        )
+    track_index = TrackIndex(tracks_df, "trackId")
+    work_unit, window_benchmark_ids = record_work_unit(
+        recording_meta_df,
+        tracks_meta_df,
+        track_index,
+        ind_track_table(track_index, tracks_meta_df, ind_config.get("class_to_obstacleType"), detect_static_vehicles),
+        ind_config,
+        num_time_steps_scenario,
+        num_planning_problems,
+        keep_ego,
+        obstacle_start_at_zero,
+        inD_all,
+        event_margins,
+        stride,
+        collision_screen,
+        min_ego_arc_length=min_ego_arc_length,
+    )
+    tracks_df = track_index.tracks_df
+    return work_unit.catalog(
+        window_benchmark_ids,
+        os.path.basename(tracks_fn),
+        np.hypot(tracks_df.xVelocity.values, tracks_df.yVelocity.values),
+        tracks_df.xVelocity.values,
+        tracks_df.yVelocity.values,
+        tracks_meta_df.set_index("trackId")["class"],
+    )
+
+
+def create_ind_catalog(
+    input_dir: str,
+    num_time_steps_scenario: int,
+    num_planning_problems: int,
+    keep_ego: bool,
+    obstacle_start_at_zero: bool,
+    inD_all: bool = False,
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    detect_static_vehicles: bool = False,
+    event_margins: Union[Tuple[int, int], None] = None,
+    stride: Union[int, None] = None,
+    collision_screen: bool = False,
+    min_on_map_ratio: Union[float, None] = None,
+    map_dir: Union[str, None] = None,
+    min_ego_arc_length: float = 0.0,
+) -> pd.DataFrame:
+    """
+    Catalogs the windows of all dataset files, see catalog_for_record
+
+    :param input_dir: path to dataset files
+    :param num_time_steps_scenario: number of time steps per CommonRoad scenario
+    :param num_planning_problems: number of planning problems per CommonRoad scenario
+    :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
+    :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to start
+    at time step zero
+    :param inD_all: whether to catalog one window for each moving car instead of fixed windows
+    :param downsample: resample states of trajectories of dynamic obstacles every downsample steps
+    :param target_dt: time step size of the generated scenarios, overrides downsample
+    :param detect_static_vehicles: whether parked cars are excluded from the ego vehicle candidates
+    :param event_margins: time steps of a window before and after its event, consecutive windows if None
+    :param stride: time steps between the starts of consecutive windows, overlapping windows if smaller than
+    the window length, disjoint windows if None; ignored for event windows
+    :param collision_screen: whether windows with overlapping footprints at their first frame or along the
+    trajectories of their ego candidates are discarded before their obstacles are built
+    :param min_on_map_ratio: minimal fraction of the positions of a vehicle within the lanelets of the map, vehicles
+    mostly off the map are removed before obstacles are generated, all vehicles are kept if None
+    :param map_dir: path to the repaired maps, the maps shipped with the converter if None; only loaded for
+    min_on_map_ratio
+    :param min_ego_arc_length: minimal length of the path driven by a car within a window to be selected as its ego
+    vehicle, see conversion_utils.WorkUnit
+    :return: one row per window
+    """
+    listing_tracks = sorted(glob.glob(os.path.join(input_dir, "data/*_tracks.csv")))
+    listing_metas = sorted(glob.glob(os.path.join(input_dir, "data/*_tracksMeta.csv")))
+    listing_recording = sorted(glob.glob(os.path.join(input_dir, "data/*_recordingMeta.csv")))
+
+    ind_config = load_yaml(os.path.dirname(os.path.abspath(__file__)) + "/config.yaml")
+    if min_on_map_ratio is not None:
+        if map_dir is None:
+            map_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "repaired_maps")
+        load_lanelet_networks(map_dir, ind_config=ind_config)
+
+    return concat_catalogs(
+        [
+            catalog_for_record(
+                recording_meta_fn,
+                tracks_meta_fn,
+                tracks_fn,
+                num_time_steps_scenario,
+                num_planning_problems,
+                keep_ego,
+                ind_config,
+                obstacle_start_at_zero,
+                downsample,
+                target_dt,
+                detect_static_vehicles,
+                inD_all,
+                event_margins,
+                stride,
+                collision_screen,
+                min_on_map_ratio,
+                min_ego_arc_length,
+            )
+            for recording_meta_fn, tracks_meta_fn, tracks_fn in zip(listing_recording, listing_metas, listing_tracks)
+        ]
+    )
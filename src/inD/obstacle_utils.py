@@ -11,19 +11,18 @@ Extracts planning problems from a big recording by removing a dynamic vehicle an
 with ego vehicle start and goal position
 """
 
-import math
 import logging
 import numpy as np
 import pandas as pd
 from typing import Dict, Union
 
-from commonroad.scenario.obstacle import ObstacleType, DynamicObstacle, StaticObstacle
-from commonroad.geometry.shape import Rectangle, Circle
-from commonroad.scenario.trajectory import Trajectory, State
-from commonroad.prediction.prediction import TrajectoryPrediction
-
-from data_converters.src.helper import make_valid_orientation_pruned
+from commonroad.scenario.obstacle import ObstacleType
+from commonroad.scenario.state import InitialState
 
+from data_converters.src.helper import headings_to_orientations
+from data_converters.src.kinematics_utils import track_kinematics
+from data_converters.src.schema_utils import AGENT_SHAPES, TrackTable
+from data_converters.src.track_utils import TrackIndex
 
 LOGGER = logging.getLogger(__name__)
 
@@ -32,7 +31,7 @@ def state_from_track_tuple(
     time_step: int,
     xcenter: float,
     ycenter: float,
-    heading: float,
+    orientation: float,
     lat_velocity: float,
     lon_velocity: float,
     lat_acceleration: float,
@@ -44,108 +43,89 @@ def state_from_track_tuple(
     The name of the parameter corresponds to the name of the column in the corresponding csv
     :param time_step: The frame for which the information are given. [-]
     :param center: The [x,y] position of the object's centroid in the local coordinate system. [m]
-    :param heading: The heading in the local coordinate system. [deg]
+    :param orientation: The valid orientation in the local coordinate system, see headings_to_orientations. [rad]
     :param lat_velocity: The lateral velocity. 	[m/s]
     :param lon_velocity: The longitudinal velocity. 	[m/s]
     :param lat_acceleration: The lateral acceleration. 	[m/s²]
     :param lon_acceleration: The longitudinal acceleration. 	[m/s²]
     :return:
     """
-    return State(
+    return InitialState(
         time_step=int(time_step),
         position=np.array([xcenter, ycenter]),
-        orientation=make_valid_orientation_pruned(math.radians(heading)),
+        orientation=orientation,
         velocity=lon_velocity,
         acceleration=lon_acceleration,
     )
 
 
-def generate_obstacle(
-    tracks_df: pd.DataFrame,
+def ind_track_table(
+    track_index: TrackIndex,
     tracks_meta_df: pd.DataFrame,
-    vehicle_id: int,
-    obstacle_id: int,
-    frame_start: int,
     class_to_type: Dict[str, ObstacleType],
-    detect_static_vehicles=False,
-) -> Union[StaticObstacle, DynamicObstacle]:
+    detect_static_vehicles: bool = False,
+    kinematics_dt: Union[float, None] = None,
+) -> TrackTable:
     """
-    Converts a single track from a inD dataset recording to a CommonRoad obstacle
-    Assumes that the cutting will leave at least 2 frames remaining
-    and takes into account whether the traffic participant is parking and which type it has
-    :param tracks_df: tracks that contain only the desired frames [frame_start, frame_start + num_steps_scenario]
-    :param tracks_meta_df: tracks that contain meta info of the vehicle
-    :param vehicle_id: vehicle id in the tracks_meta_df
-    :param obstacle_id: unique obstacle id in a CommonRoad Scenario
-    :param frame_start: frame start to offset the time steps of an obstacle
-    :param detect_static_vehicles: whether to regard non-moving vehicles as StaticObstacle
-    :return: A new Obstacle with unique obstacle ID, Static or Dynamic corresponding to movement in the scenario
+    Normalizes the tracks of an inD recording into a track table with the recorded longitudinal velocities and
+    accelerations. Pedestrians are circles and bicycles have a fixed extent, vehicles which do not move during the
+    recording are typed as parked vehicles.
+
+    :param track_index: index of the tracks of the recording
+    :param tracks_meta_df: meta information of the tracks of the recording
+    :param class_to_type: mapping from the classes of the dataset to CommonRoad obstacle types
+    :param detect_static_vehicles: whether to convert vehicles which do not move during the recording to
+    static obstacles, see TrackIndex.static_track_ids
+    :param kinematics_dt: time step size of the tracks for deriving the yaw rates of the states, see
+    kinematics_utils.track_kinematics; the recorded accelerations are kept; no yaw rates if None
+    :return: track table
     """
-
-    vehicle_meta = tracks_meta_df[tracks_meta_df.trackId == vehicle_id].to_dict(orient="records")[0]
-    vehicle_track = tracks_df[tracks_df.trackId == vehicle_id].to_dict(orient="list")
-
-    obstacle_type = ObstacleType(class_to_type[vehicle_meta["class"].lower()])
+    tracks_df = track_index.tracks_df
+    orientations = headings_to_orientations(tracks_df.heading.values)
+    yaw_rates = None
+    if kinematics_dt is not None:
+        yaw_rates = track_kinematics(
+            tracks_df.trackId.values, tracks_df.lonVelocity.values, orientations, kinematics_dt
+        ).yaw_rate.values
+
+    meta_df = tracks_meta_df.set_index("trackId").loc[track_index.track_ids]
+    obstacle_types = np.array([ObstacleType(class_to_type[c.lower()]) for c in meta_df["class"].values])
+    lengths = meta_df["length"].values.astype(float)
+    widths = meta_df["width"].values.astype(float)
+    shapes = np.full(len(meta_df), AGENT_SHAPES[0], dtype=object)
     # if its VRU (pedestrian or cyclist) the rectangle size is 0 (likely undesireable)
-    if obstacle_type == ObstacleType.PEDESTRIAN:
-        # as surveyed by the author (approximation, harmonized with
-        # https://commonroad.in.tum.de/static/scenario_xml/2018b/ZAM_Intersect-1_2_S-1.xml)
-        obstacle_shape = Circle(0.35)
-    elif obstacle_type == ObstacleType.BICYCLE:
-        # as surveyed by the author (handle_width x bicycle length), harmonized
-        # with https://commonroad.in.tum.de/static/scenario_xml/2018b/DEU_Muc-30_1_S-1.xml
-        obstacle_shape = Rectangle(width=0.6, length=1.8)
-    else:
-        obstacle_shape = Rectangle(width=vehicle_meta["width"], length=vehicle_meta["length"])
-
-    # determine if vehicle is parked
-    min_x = min(vehicle_track["xCenter"])
-    max_x = max(vehicle_track["xCenter"])
-    min_y = min(vehicle_track["yCenter"])
-    max_y = max(vehicle_track["yCenter"])
-    # arbitrary 1 meter threshold: if moved at least one meter, is not a parked vehicle
-    # also note that if it disappears before the recording ends or appears after it begins, it is not parked
-    if (
-        detect_static_vehicles
-        and obstacle_type != ObstacleType.PEDESTRIAN
-        # vehicle moved less than one meter total during recording
-        and pow(max_x - min_x, 2) + pow(max_y - min_y, 2) < 1
-    ):
-        obstacle_type = ObstacleType.PARKED_VEHICLE
-        obstacle_initial_state = state_from_track_tuple(
-            time_step=0,
-            xcenter=np.average(vehicle_track["xCenter"]),
-            ycenter=np.average(vehicle_track["yCenter"]),
-            heading=np.average(vehicle_track["heading"]),
-            lat_velocity=0.0,
-            lon_velocity=0.0,
-            lat_acceleration=0.0,
-            lon_acceleration=0.0,
-        )
-
-        return StaticObstacle(obstacle_id, obstacle_type, obstacle_shape, obstacle_initial_state)
-
-    track_tuples = zip(
-        np.array(vehicle_track["frame"]) - frame_start,
-        vehicle_track["xCenter"],
-        vehicle_track["yCenter"],
-        vehicle_track["heading"],
-        vehicle_track["latVelocity"],
-        vehicle_track["lonVelocity"],
-        vehicle_track["latAcceleration"],
-        vehicle_track["lonAcceleration"],
+    # as surveyed by the author (approximation, harmonized with
+    # https://commonroad.in.tum.de/static/scenario_xml/2018b/ZAM_Intersect-1_2_S-1.xml)
+    is_pedestrian = obstacle_types == ObstacleType.PEDESTRIAN
+    lengths[is_pedestrian] = widths[is_pedestrian] = 0.7
+    shapes[is_pedestrian] = "circle"
+    # as surveyed by the author (handle_width x bicycle length), harmonized
+    # with https://commonroad.in.tum.de/static/scenario_xml/2018b/DEU_Muc-30_1_S-1.xml
+    is_bicycle = obstacle_types == ObstacleType.BICYCLE
+    lengths[is_bicycle] = 1.8
+    widths[is_bicycle] = 0.6
+    if detect_static_vehicles:
+        # parked vehicles are detected once per recording
+        is_static = np.isin(track_index.track_ids, track_index.static_track_ids("xCenter", "yCenter"))
+        obstacle_types[is_static & ~is_pedestrian] = ObstacleType.PARKED_VEHICLE
+
+    agents_df = pd.DataFrame(
+        {
+            "obstacle_type": [obstacle_type.value for obstacle_type in obstacle_types],
+            "length": lengths,
+            "width": widths,
+            "shape": shapes,
+        },
+        index=track_index.track_ids,
     )
-    obstacle_initial_state = state_from_track_tuple(*next(track_tuples))
-    obstacle_state_list = [state_from_track_tuple(*track_tuple) for track_tuple in track_tuples]
-    if len(obstacle_state_list) == 0:
-        print("f")
-    obstacle_trajectory = Trajectory(obstacle_state_list[0].time_step, obstacle_state_list[0:])
-    obstacle_trajectory_prediction = TrajectoryPrediction(obstacle_trajectory, obstacle_shape)
-
-    return DynamicObstacle(
-        obstacle_id,
-        obstacle_type,
-        obstacle_shape,
-        obstacle_initial_state,
-        obstacle_trajectory_prediction,
+    return TrackTable(
+        tracks_df.trackId.values,
+        tracks_df.frame.values,
+        tracks_df.xCenter.values,
+        tracks_df.yCenter.values,
+        tracks_df.lonVelocity.values,
+        orientations,
+        agents_df,
+        tracks_df.lonAcceleration.values,
+        yaw_rates,
     )
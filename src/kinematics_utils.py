@@ -0,0 +1,97 @@
+__desc__ = """
+Derives accelerations, yaw rates and jerks of all tracks of a recording at once
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.ndimage import convolve1d
+from scipy.signal import savgol_coeffs
+
+from data_converters.src.track_utils import unwrap_angles
+
+# number of rows and polynomial order of the Savitzky-Golay filter
+SMOOTHING_WINDOW = 9
+SMOOTHING_ORDER = 3
+
+
+def finite_differences(track_ids: np.ndarray, values: np.ndarray, dt: float) -> np.ndarray:
+    """
+    Derivative of the values of each track separately, with central differences within the tracks and one-sided
+    differences at their first and last row, zero for tracks of a single row
+
+    :param track_ids: track ID of each row, the rows of a track have to be contiguous and ordered by time
+    :param values: value of each row
+    :param dt: time step size
+    :return: derivative of each row
+    """
+    rows = np.arange(len(values))
+    is_start = np.ones(len(values), dtype=bool)
+    is_start[1:] = track_ids[1:] != track_ids[:-1]
+    is_end = np.ones(len(values), dtype=bool)
+    is_end[:-1] = is_start[1:]
+    previous_rows = np.where(is_start, rows, rows - 1)
+    next_rows = np.where(is_end, rows, rows + 1)
+    spans = (next_rows - previous_rows) * dt
+    return np.divide(values[next_rows] - values[previous_rows], spans, out=np.zeros(len(values)), where=spans > 0.0)
+
+
+def track_derivative(
+    track_ids: np.ndarray,
+    values: np.ndarray,
+    dt: float,
+    deriv: int = 1,
+    window_length: int = SMOOTHING_WINDOW,
+    polyorder: int = SMOOTHING_ORDER,
+) -> np.ndarray:
+    """
+    Smoothed derivative of the values of all tracks at once. A Savitzky-Golay filter is convolved with the values of
+    the whole recording; rows whose filter window reaches into another track use finite differences instead.
+
+    :param track_ids: track ID of each row, the rows of a track have to be contiguous and ordered by time
+    :param values: value of each row
+    :param dt: time step size
+    :param deriv: order of the derivative
+    :param window_length: number of rows of the filter window, odd
+    :param polyorder: order of the polynomial fitted within the filter window
+    :return: derivative of each row
+    """
+    track_ids = np.asarray(track_ids)
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        return values
+    derivative = convolve1d(values, savgol_coeffs(window_length, polyorder, deriv=deriv, delta=dt), mode="nearest")
+
+    fallback = values
+    for _ in range(deriv):
+        fallback = finite_differences(track_ids, fallback, dt)
+    is_start = np.ones(len(values), dtype=bool)
+    is_start[1:] = track_ids[1:] != track_ids[:-1]
+    starts = np.flatnonzero(is_start)
+    counts = np.diff(np.append(starts, len(values)))
+    offsets = np.arange(len(values)) - np.repeat(starts, counts)
+    half_window = window_length // 2
+    near_boundary = (offsets < half_window) | (np.repeat(counts, counts) - 1 - offsets < half_window)
+    derivative[near_boundary] = fallback[near_boundary]
+    return derivative
+
+
+def track_kinematics(
+    track_ids: np.ndarray, velocities: np.ndarray, orientations: np.ndarray, dt: float
+) -> pd.DataFrame:
+    """
+    Derives the acceleration, yaw rate and jerk of each row of the tracks of a recording, see track_derivative
+
+    :param track_ids: track ID of each row, the rows of a track have to be contiguous and ordered by time
+    :param velocities: velocity of each row
+    :param orientations: orientation of each row in radian
+    :param dt: time step size
+    :return: acceleration, yaw_rate and jerk of each row
+    """
+    track_ids = np.asarray(track_ids)
+    return pd.DataFrame(
+        {
+            "acceleration": track_derivative(track_ids, velocities, dt),
+            "yaw_rate": track_derivative(track_ids, unwrap_angles(orientations, track_ids), dt),
+            "jerk": track_derivative(track_ids, velocities, dt, deriv=2),
+        }
+    )
@@ -0,0 +1,417 @@
+__desc__ = """
+Vectorized queries of positions against the lanelets of a lanelet network
+"""
+
+import copy
+import numpy as np
+import pandas as pd
+from collections import Counter
+from typing import Dict, List, Tuple, Union
+from matplotlib.path import Path
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import shortest_path
+from scipy.spatial import cKDTree
+
+from commonroad.scenario.lanelet import LaneletNetwork
+from commonroad.scenario.obstacle import DynamicObstacle
+from commonroad.scenario.scenario import Scenario
+from commonroad.planning.goal import GoalRegion
+from commonroad.planning.planning_problem import PlanningProblem, PlanningProblemSet
+
+from data_converters.src.trajectory_utils import trajectory_positions
+
+# edge length of the cells of a lanelet grid [m]
+GRID_CELL_SIZE = 10.0
+
+
+class LaneletGrid:
+    """
+    Uniform grid over the bounding boxes of the lanelets of a lanelet network. A position is only tested against the
+    polygons of the lanelets overlapping its cell, and each polygon is tested against all of its candidate positions
+    at once.
+    """
+
+    def __init__(self, lanelet_network: LaneletNetwork, cell_size: float = GRID_CELL_SIZE):
+        """
+        :param lanelet_network: lanelet network of the map
+        :param cell_size: edge length of the cells [m]
+        """
+        lanelets = sorted(lanelet_network.lanelets, key=lambda lanelet: lanelet.lanelet_id)
+        self.cell_size = cell_size
+        self.lanelet_ids = np.array([lanelet.lanelet_id for lanelet in lanelets], dtype=int)
+        self._paths = [Path(lanelet.polygon.vertices) for lanelet in lanelets]
+        if len(lanelets) == 0:
+            self._origin = np.zeros(2)
+            self._shape = np.ones(2, dtype=int)
+            self._cell_starts = np.zeros(2, dtype=int)
+            self._cell_lanelets = np.empty(0, dtype=int)
+            return
+
+        lower = np.array([lanelet.polygon.vertices.min(axis=0) for lanelet in lanelets])
+        upper = np.array([lanelet.polygon.vertices.max(axis=0) for lanelet in lanelets])
+        self._origin = lower.min(axis=0)
+        self._shape = np.floor((upper.max(axis=0) - self._origin) / cell_size).astype(int) + 1
+        first_cells = np.floor((lower - self._origin) / cell_size).astype(int)
+        last_cells = np.floor((upper - self._origin) / cell_size).astype(int)
+
+        # (cell, lanelet) pairs of all cells overlapped by the bounding box of each lanelet
+        cells, indices = [], []
+        for index, (first, last) in enumerate(zip(first_cells, last_cells)):
+            ix, iy = np.meshgrid(np.arange(first[0], last[0] + 1), np.arange(first[1], last[1] + 1), indexing="ij")
+            cells.append((ix * self._shape[1] + iy).ravel())
+            indices.append(np.full(ix.size, index))
+        cells = np.concatenate(cells)
+        indices = np.concatenate(indices)
+        order = np.lexsort((indices, cells))
+        self._cell_lanelets = indices[order]
+        self._cell_starts = np.searchsorted(cells[order], np.arange(self._shape[0] * self._shape[1] + 1))
+
+    def query(
+        self, xs: np.ndarray, ys: np.ndarray, lanelet_ids: Union[np.ndarray, None] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Finds all lanelets which contain each position
+
+        :param xs: x-position of each point
+        :param ys: y-position of each point
+        :param lanelet_ids: IDs of the lanelets which are considered, e.g., of a cropped lanelet network, all if None
+        :return: index of the point and ID of the lanelet of each (point, lanelet) pair, ordered by point and lanelet ID
+        """
+        points = np.column_stack((np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)))
+        cell_indices = np.floor((points - self._origin) / self.cell_size).astype(int)
+        in_grid = np.all((cell_indices >= 0) & (cell_indices < self._shape), axis=1)
+        point_indices = np.flatnonzero(in_grid)
+        cells = cell_indices[in_grid, 0] * self._shape[1] + cell_indices[in_grid, 1]
+
+        # candidate (point, lanelet) pairs of the lanelets overlapping the cell of each point
+        starts, ends = self._cell_starts[cells], self._cell_starts[cells + 1]
+        counts = ends - starts
+        candidate_points = np.repeat(point_indices, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        candidate_lanelets = self._cell_lanelets[np.repeat(starts, counts) + offsets]
+        if lanelet_ids is not None:
+            considered = np.isin(self.lanelet_ids, lanelet_ids)[candidate_lanelets]
+            candidate_points, candidate_lanelets = candidate_points[considered], candidate_lanelets[considered]
+
+        inside = np.zeros(len(candidate_points), dtype=bool)
+        order = np.argsort(candidate_lanelets, kind="stable")
+        boundaries = np.flatnonzero(np.diff(candidate_lanelets[order])) + 1
+        for pairs in np.split(order, boundaries):
+            if len(pairs) == 0:
+                continue
+            path = self._paths[candidate_lanelets[pairs[0]]]
+            inside[pairs] = path.contains_points(points[candidate_points[pairs]])
+        # lanelets are indexed by ascending ID, so sorting by index sorts by ID
+        order = np.lexsort((candidate_lanelets[inside], candidate_points[inside]))
+        return candidate_points[inside][order], self.lanelet_ids[candidate_lanelets[inside][order]]
+
+    def assign(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """
+        Determines for each position a lanelet which contains it, a position within several overlapping lanelets is
+        assigned to the one with the smallest ID
+
+        :param xs: x-position of each point
+        :param ys: y-position of each point
+        :return: lanelet ID of each point, -1 for points outside of all lanelets
+        """
+        point_indices, lanelet_ids = self.query(xs, ys)
+        assignment = np.full(len(np.atleast_1d(xs)), -1, dtype=int)
+        # the pairs are ordered by lanelet ID, so the first pair of a point has its smallest lanelet ID
+        first = np.ones(len(point_indices), dtype=bool)
+        first[1:] = point_indices[1:] != point_indices[:-1]
+        assignment[point_indices[first]] = lanelet_ids[first]
+        return assignment
+
+    def contains(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """
+        Determines for each position if it is within the union of the lanelet polygons, i.e., within any lanelet
+
+        :param xs: x-position of each point
+        :param ys: y-position of each point
+        :return: boolean mask of the points on the map
+        """
+        on_map = np.zeros(len(np.atleast_1d(xs)), dtype=bool)
+        on_map[self.query(xs, ys)[0]] = True
+        return on_map
+
+    def find(self, xs: np.ndarray, ys: np.ndarray, lanelet_ids: Union[np.ndarray, None] = None) -> List[List[int]]:
+        """
+        Finds all lanelets which contain each position, like LaneletNetwork.find_lanelet_by_position
+
+        :param xs: x-position of each point
+        :param ys: y-position of each point
+        :param lanelet_ids: IDs of the lanelets which are considered, all if None
+        :return: list of lanelet IDs per point
+        """
+        point_indices, lanelet_ids = self.query(xs, ys, lanelet_ids)
+        bounds = np.searchsorted(point_indices, np.arange(len(np.atleast_1d(xs)) + 1))
+        return [lanelet_ids[start:end].tolist() for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+# cache of lanelet grids of the cached lanelet networks, see get_lanelet_grid
+_lanelet_grid_cache: Dict[int, Tuple[LaneletNetwork, LaneletGrid]] = {}
+
+
+def get_lanelet_grid(lanelet_network: LaneletNetwork) -> LaneletGrid:
+    """
+    Returns the lanelet grid of a lanelet network, built once per lanelet network object
+
+    :param lanelet_network: lanelet network of the map, e.g., of a cached meta scenario, not to be modified afterwards
+    :return: lanelet grid, shared between all calls with the same lanelet network
+    """
+    # the cache holds a reference to the lanelet network, so that its id is not reused
+    cached = _lanelet_grid_cache.get(id(lanelet_network))
+    if cached is None or cached[0] is not lanelet_network:
+        cached = (lanelet_network, LaneletGrid(lanelet_network))
+        _lanelet_grid_cache[id(lanelet_network)] = cached
+    return cached[1]
+
+
+class LaneletRegionIndex:
+    """
+    Adjacency and boundary vertices of the lanelets of a lanelet network, built once per map, to crop the lanelet
+    network of each scenario to the surroundings of the routes of its ego vehicles
+    """
+
+    def __init__(self, lanelet_network: LaneletNetwork, lanelet_grid: Union[LaneletGrid, None] = None):
+        """
+        :param lanelet_network: lanelet network of the map, not to be modified afterwards
+        :param lanelet_grid: lanelet grid of the lanelet network, built if None
+        """
+        self.lanelet_network = lanelet_network
+        self.lanelet_grid = LaneletGrid(lanelet_network) if lanelet_grid is None else lanelet_grid
+        lanelet_ids = self.lanelet_grid.lanelet_ids
+        lanelets = [lanelet_network.find_lanelet_by_id(lanelet_id) for lanelet_id in lanelet_ids]
+
+        # a route follows the successors of a lanelet or changes to an adjacent lanelet of the same direction
+        sources, targets = [], []
+        for index, lanelet in enumerate(lanelets):
+            neighbors = list(lanelet.successor)
+            if lanelet.adj_left is not None and lanelet.adj_left_same_direction:
+                neighbors.append(lanelet.adj_left)
+            if lanelet.adj_right is not None and lanelet.adj_right_same_direction:
+                neighbors.append(lanelet.adj_right)
+            neighbors = np.intersect1d(neighbors, lanelet_ids)
+            sources.extend([index] * len(neighbors))
+            targets.extend(np.searchsorted(lanelet_ids, neighbors))
+        self._adjacency = csr_matrix(
+            (np.ones(len(sources)), (np.array(sources, dtype=int), np.array(targets, dtype=int))),
+            shape=(len(lanelets), len(lanelets)),
+        )
+        self._center_vertices = [lanelet.center_vertices for lanelet in lanelets]
+        boundaries = [np.vstack((lanelet.left_vertices, lanelet.right_vertices)) for lanelet in lanelets]
+        self._boundary_vertices = np.vstack(boundaries) if len(boundaries) > 0 else np.empty((0, 2))
+        self._boundary_lanelets = np.repeat(np.arange(len(lanelets)), [len(boundary) for boundary in boundaries])
+
+    def route_lanelets(self, start_ids: List[int], goal_ids: List[int]) -> np.ndarray:
+        """
+        Finds the lanelets on the shortest routes, in number of lanelets, from any start lanelet to any goal lanelet
+
+        :param start_ids: IDs of the lanelets of the start position
+        :param goal_ids: IDs of the lanelets of the goal position
+        :return: IDs of the lanelets on the shortest routes, empty if no goal lanelet can be reached
+        """
+        if len(start_ids) == 0 or len(goal_ids) == 0:
+            return np.empty(0, dtype=int)
+        starts = np.searchsorted(self.lanelet_grid.lanelet_ids, start_ids)
+        goals = np.searchsorted(self.lanelet_grid.lanelet_ids, goal_ids)
+        # a lanelet is on a shortest route if its distances from the starts and to the goals sum up to its length
+        distances = np.atleast_2d(shortest_path(self._adjacency, unweighted=True, indices=starts)).min(axis=0)
+        distances += np.atleast_2d(shortest_path(self._adjacency.T, unweighted=True, indices=goals)).min(axis=0)
+        if not np.isfinite(distances.min()):
+            return np.empty(0, dtype=int)
+        return self.lanelet_grid.lanelet_ids[distances == distances.min()]
+
+    def region(self, starts: np.ndarray, goals: np.ndarray, radius: float) -> Tuple[np.ndarray, cKDTree]:
+        """
+        Determines the lanelets on the shortest routes from the start to the goal positions, see route_lanelets,
+        and the lanelets within a radius around these routes
+
+        :param starts: start position of each route
+        :param goals: goal position of each route
+        :param radius: distance from the routes up to which lanelets are kept [m]
+        :return: IDs of the lanelets of the region and KD-tree of the points of the routes
+        """
+        starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+        goals = np.asarray(goals, dtype=float).reshape(-1, 2)
+        start_ids = self.lanelet_grid.find(starts[:, 0], starts[:, 1])
+        goal_ids = self.lanelet_grid.find(goals[:, 0], goals[:, 1])
+        route_ids = [np.empty(0, dtype=int)]
+        for route_start_ids, route_goal_ids in zip(start_ids, goal_ids):
+            route_ids.extend((route_start_ids, route_goal_ids, self.route_lanelets(route_start_ids, route_goal_ids)))
+        route_indices = np.searchsorted(self.lanelet_grid.lanelet_ids, np.unique(np.concatenate(route_ids)))
+
+        # the routes are represented by their start and goal positions and the center vertices of their lanelets
+        route_points = cKDTree(np.vstack([starts, goals] + [self._center_vertices[index] for index in route_indices]))
+        near = np.isfinite(route_points.query(self._boundary_vertices, distance_upper_bound=radius)[0])
+        indices = np.union1d(route_indices, self._boundary_lanelets[near])
+        return self.lanelet_grid.lanelet_ids[indices], route_points
+
+    def sub_network(self, lanelet_ids: np.ndarray) -> LaneletNetwork:
+        """
+        Creates a lanelet network of some of the lanelets with the traffic signs and traffic lights they reference,
+        references to other lanelets are removed
+
+        :param lanelet_ids: IDs of the lanelets
+        :return: new lanelet network with copies of the lanelets
+        """
+        lanelets = [self.lanelet_network.find_lanelet_by_id(lanelet_id) for lanelet_id in lanelet_ids]
+        lanelet_network = LaneletNetwork.create_from_lanelet_list(lanelets, cleanup_ids=True)
+        for traffic_sign_id in sorted(set().union(*[lanelet.traffic_signs for lanelet in lanelets])):
+            traffic_sign = self.lanelet_network.find_traffic_sign_by_id(traffic_sign_id)
+            lanelet_network.add_traffic_sign(copy.deepcopy(traffic_sign), set())
+        for traffic_light_id in sorted(set().union(*[lanelet.traffic_lights for lanelet in lanelets])):
+            traffic_light = self.lanelet_network.find_traffic_light_by_id(traffic_light_id)
+            lanelet_network.add_traffic_light(copy.deepcopy(traffic_light), set())
+        return lanelet_network
+
+
+def on_map_ratios(lanelet_grid: LaneletGrid, track_ids: np.ndarray, xs: np.ndarray, ys: np.ndarray) -> pd.Series:
+    """
+    Computes for each track the fraction of its positions which are within the lanelets of the map, with one batch
+    query for all positions of a recording
+
+    :param lanelet_grid: lanelet grid of the lanelet network of the map
+    :param track_ids: track ID of each position
+    :param xs: x-position of each point
+    :param ys: y-position of each point
+    :return: fraction of the positions on the map indexed by track ID
+    """
+    unique_ids, inverse = np.unique(track_ids, return_inverse=True)
+    num_on_map = np.bincount(inverse, weights=lanelet_grid.contains(xs, ys), minlength=len(unique_ids))
+    return pd.Series(num_on_map / np.bincount(inverse, minlength=len(unique_ids)), index=unique_ids)
+
+
+def assign_lanelets(lanelet_network: LaneletNetwork, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+    """
+    Determines for each position a lanelet which contains it, see LaneletGrid.assign
+
+    :param lanelet_network: lanelet network of the map
+    :param xs: x-position of each point
+    :param ys: y-position of each point
+    :return: lanelet ID of each point, -1 for points outside of all lanelets
+    """
+    return LaneletGrid(lanelet_network).assign(xs, ys)
+
+
+def assign_scenario_lanelets(
+    scenario: Scenario, planning_problem_set: PlanningProblemSet, lanelet_grid: LaneletGrid
+) -> Scenario:
+    """
+    Assigns the lanelets of the centers of all states of the dynamic obstacles and the lanelets of the goal positions
+    of the planning problems with one batch query each, like CommonRoadFileReader.open(lanelet_assignment=True)
+    for the centers; static obstacles get the lanelets of their initial position
+
+    :param scenario: CommonRoad scenario
+    :param planning_problem_set: planning problems of the scenario, updated in place
+    :param lanelet_grid: lanelet grid of the lanelet network of the scenario
+    :return: scenario with assigned obstacles
+    """
+    # the lanelet network of a cropped scenario only holds some of the lanelets of the grid, see crop_scenario
+    scenario_lanelet_ids = np.array([lanelet.lanelet_id for lanelet in scenario.lanelet_network.lanelets], dtype=int)
+    obstacles: List[DynamicObstacle] = scenario.dynamic_obstacles
+    obstacle_positions = [
+        np.vstack((obstacle.initial_state.position, trajectory_positions(obstacle.prediction.trajectory)))
+        for obstacle in obstacles
+    ]
+    positions = np.vstack(obstacle_positions) if len(obstacles) > 0 else np.empty((0, 2))
+    lanelet_ids = lanelet_grid.find(positions[:, 0], positions[:, 1], scenario_lanelet_ids)
+    offset = 0
+    for obstacle, states_positions in zip(obstacles, obstacle_positions):
+        obstacle_lanelet_ids = lanelet_ids[offset : offset + len(states_positions)]
+        offset += len(states_positions)
+        obstacle.initial_center_lanelet_ids = set(obstacle_lanelet_ids[0])
+        initial_time_step = obstacle.prediction.trajectory.initial_time_step
+        obstacle.prediction.center_lanelet_assignment = {
+            initial_time_step + index: set(ids) for index, ids in enumerate(obstacle_lanelet_ids[1:])
+        }
+
+    if len(scenario.static_obstacles) > 0:
+        positions = np.array([obstacle.initial_state.position for obstacle in scenario.static_obstacles])
+        static_lanelet_ids = lanelet_grid.find(positions[:, 0], positions[:, 1], scenario_lanelet_ids)
+        for obstacle, ids in zip(scenario.static_obstacles, static_lanelet_ids):
+            obstacle.initial_center_lanelet_ids = set(ids)
+
+    # goals are immutable, planning problems with lanelets of their goal positions replace the original ones
+    planning_problems = list(planning_problem_set.planning_problem_dict.values())
+    goals = [
+        (planning_problem.planning_problem_id, state_id, state.position.center)
+        for planning_problem in planning_problems
+        for state_id, state in enumerate(planning_problem.goal.state_list)
+        if hasattr(state.position, "center")
+    ]
+    if len(goals) == 0:
+        return scenario
+    centers = np.array([center for _, _, center in goals])
+    lanelets_of_goal_positions = {planning_problem.planning_problem_id: {} for planning_problem in planning_problems}
+    goal_lanelet_ids = lanelet_grid.find(centers[:, 0], centers[:, 1], scenario_lanelet_ids)
+    for (planning_problem_id, state_id, _), ids in zip(goals, goal_lanelet_ids):
+        if len(ids) > 0:
+            lanelets_of_goal_positions[planning_problem_id][state_id] = ids
+    for planning_problem in planning_problems:
+        lanelets_of_goal_position = lanelets_of_goal_positions[planning_problem.planning_problem_id]
+        if len(lanelets_of_goal_position) == 0:
+            continue
+        planning_problem_set.planning_problem_dict[planning_problem.planning_problem_id] = PlanningProblem(
+            planning_problem.planning_problem_id,
+            planning_problem.initial_state,
+            GoalRegion(planning_problem.goal.state_list, lanelets_of_goal_position),
+        )
+    return scenario
+
+
+def crop_scenario(
+    scenario: Scenario,
+    planning_problem_set: PlanningProblemSet,
+    region_index: LaneletRegionIndex,
+    radius: float,
+    report: Union[Counter, None] = None,
+) -> Scenario:
+    """
+    Crops the lanelet network of a scenario to the routes of its planning problems from their initial states to the
+    centers of their goal positions and to their surroundings, see LaneletRegionIndex.region, and removes the
+    obstacles which never come closer to these routes than the radius
+
+    :param scenario: CommonRoad scenario with the lanelet network of the map, before it is annotated
+    :param planning_problem_set: planning problems of the scenario
+    :param region_index: region index of the lanelet network of the map
+    :param radius: distance from the routes up to which lanelets and obstacles are kept [m]
+    :param report: counter of the removed lanelets and obstacles, updated in place
+    :return: new scenario with the cropped lanelet network and the remaining obstacles
+    """
+    starts, goals = [], []
+    for planning_problem in planning_problem_set.planning_problem_dict.values():
+        start = planning_problem.initial_state.position
+        centers = [
+            state.position.center for state in planning_problem.goal.state_list if hasattr(state.position, "center")
+        ]
+        starts.append(start)
+        goals.append(centers[0] if len(centers) > 0 else start)
+    if len(starts) == 0:
+        # without planning problems, there is no route to crop to
+        return scenario
+    lanelet_ids, route_points = region_index.region(np.array(starts), np.array(goals), radius)
+
+    # obstacles are kept if any of their states is close to the routes
+    obstacles = scenario.dynamic_obstacles + scenario.static_obstacles
+    obstacle_positions = [
+        (
+            np.vstack((obstacle.initial_state.position, trajectory_positions(obstacle.prediction.trajectory)))
+            if isinstance(obstacle, DynamicObstacle)
+            else np.reshape(obstacle.initial_state.position, (1, 2))
+        )
+        for obstacle in obstacles
+    ]
+    positions = np.vstack(obstacle_positions) if len(obstacles) > 0 else np.empty((0, 2))
+    near = np.isfinite(route_points.query(positions, distance_upper_bound=radius)[0])
+    num_states = np.array([len(states_positions) for states_positions in obstacle_positions], dtype=int)
+    kept = np.add.reduceat(near, np.cumsum(num_states) - num_states) > 0 if len(obstacles) > 0 else []
+
+    # the lanelet network of the map is shared between scenarios, the cropped scenario gets its own copy
+    cropped_scenario = Scenario(dt=scenario.dt, scenario_id=scenario.scenario_id)
+    cropped_scenario.add_objects(region_index.sub_network(lanelet_ids))
+    cropped_scenario.add_objects([obstacle for obstacle, keep in zip(obstacles, kept) if keep])
+    if report is not None:
+        report["cropped_lanelets"] += len(scenario.lanelet_network.lanelets) - len(lanelet_ids)
+        report["cropped_obstacles"] += len(obstacles) - int(np.sum(kept))
+    return cropped_scenario
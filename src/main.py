@@ -1,13 +1,20 @@
 import os
+import glob
 import time
 import argparse
 import warnings
+import numpy as np
 
-from data_converters.src.highD.highd_to_cr import create_highd_scenarios
-from data_converters.src.inD.ind_to_cr import create_ind_scenarios
+from data_converters.src.catalog_utils import select_benchmark_ids, write_catalog
+from data_converters.src.export_utils import check_window_arrays
+from data_converters.src.highD.highd_to_cr import create_highd_catalog, create_highd_scenarios, export_highd_windows
+from data_converters.src.inD.ind_to_cr import create_ind_catalog, create_ind_scenarios, export_ind_windows
 from data_converters.src.INTERACTION.interaction_to_cr import (
+    create_interaction_catalog,
     create_interaction_scenarios,
+    export_interaction_windows,
 )
+from data_converters.src.shard_utils import parse_shard
 
 
 def get_args() -> argparse.Namespace:
@@ -66,11 +73,143 @@ def get_args() -> argparse.Namespace:
         " since it has less recordings available, note that if enabled, num_time_steps_scenario"
         " becomes the minimal number of time steps of one CommonRoad scenario",
     )
+    parser.add_argument(
+        "--detect_static_vehicles",
+        default=False,
+        action="store_true",
+        help="(Only inD) Convert vehicles which move less than one meter during the whole recording to static "
+        "obstacles",
+    )
     parser.add_argument(
         "--downsample",
         type=int,
         default=1,
-        help="Decrease dt by n*dt, works only for highD converter",
+        help="Decrease dt by n*dt",
+    )
+    parser.add_argument(
+        "--dt",
+        type=float,
+        default=None,
+        help="Time step size of the generated scenarios, trajectories are interpolated if it is no multiple of the "
+        "time step size of the dataset, overrides downsample",
+    )
+    parser.add_argument(
+        "--export_format",
+        type=str,
+        default="xml",
+        choices=["xml", "npz", "arrow"],
+        help="Format of the output: CommonRoad scenario files, or fixed-size arrays of the windows for machine "
+        "learning, stored in one NPZ or Arrow shard per recording without creating CommonRoad objects",
+    )
+    parser.add_argument(
+        "--check_export",
+        type=str,
+        default=None,
+        help="(Only npz) Path to the CommonRoad scenarios converted with the same options, the ego vehicles and agents "
+        "of the exported windows are compared with their planning problems and obstacles",
+    )
+    parser.add_argument(
+        "--event_windows",
+        type=int,
+        nargs=2,
+        default=None,
+        metavar=("PRE", "POST"),
+        help="Place the windows around events instead of tiling the recordings, with PRE time steps before and POST "
+        "time steps after each event: lane changes (highD), merges (INTERACTION) and close interactions with cars "
+        "(inD); overlapping windows are de-duplicated",
+    )
+    parser.add_argument(
+        "--lanelet_assignment",
+        default=False,
+        action="store_true",
+        help="Assign the lanelets of the obstacles and write the lanelets of the goal positions of the planning "
+        "problems, using a grid index over the lanelets of each map",
+    )
+    parser.add_argument(
+        "--stride",
+        type=int,
+        default=None,
+        help="Number of time steps between the starts of consecutive windows, windows overlap if it is smaller than "
+        "num_time_steps_scenario; disjoint windows by default",
+    )
+    parser.add_argument(
+        "--collision_screen",
+        default=False,
+        action="store_true",
+        help="(Only inD and INTERACTION) Discard windows in which the footprints of two obstacles overlap at the "
+        "first time step or the footprint of an ego vehicle candidate overlaps another obstacle",
+    )
+    parser.add_argument(
+        "--min_on_map_ratio",
+        type=float,
+        default=None,
+        help="(Only inD and INTERACTION) Remove vehicles of which less than this fraction of positions is within the "
+        "lanelets of the map, e.g., in parking lots, before obstacles are generated; all vehicles are kept by default",
+    )
+    parser.add_argument(
+        "--derive_kinematics",
+        default=False,
+        action="store_true",
+        help="Derive the accelerations and yaw rates of the states from the smoothed velocities and orientations of "
+        "the tracks, for all tracks of a recording at once",
+    )
+    parser.add_argument(
+        "--crop_radius",
+        type=float,
+        default=None,
+        help="(Only INTERACTION) Crop the lanelet network of each scenario to the routes of its ego vehicles and the "
+        "lanelets within this distance of them, obstacles farther away are removed; the whole map is kept by default",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        default=None,
+        metavar="i/N",
+        help="Only convert the i-th of N shards of the recordings (highD, inD) or maps (INTERACTION), e.g., on one of "
+        "N nodes; the shards are balanced by the size of the track files and their outputs can be merged into one tree",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Seed of the random choice of the ego vehicles, each window draws from its own random number generator "
+        "derived from the seed and its benchmark ID, so that the choices do not depend on the processes or shards; "
+        "every choice is seeded with zero by default",
+    )
+    parser.add_argument(
+        "--min_ego_arc_length",
+        type=float,
+        default=0.0,
+        help="Minimal length in meters of the path a car drives within a window to be selected as its ego vehicle, "
+        "windows without enough such cars are skipped by the pre-screening; applied to all outputs and the catalog",
+    )
+    parser.add_argument(
+        "--critical_ego",
+        default=False,
+        action="store_true",
+        help="Select the ego candidates with the smallest time-to-collision to any road user within their window as "
+        "ego vehicles instead of random ones, see conversion_utils.WorkUnit.ego_scores",
+    )
+    parser.add_argument(
+        "--catalog",
+        default=False,
+        action="store_true",
+        help="Only write a catalog of all windows with their statistics to the output directory, computed from the "
+        "tracks without creating CommonRoad objects",
+    )
+    parser.add_argument(
+        "--catalog_filter",
+        type=str,
+        default=None,
+        help="Path to a catalog, e.g., written with --catalog and filtered, only its windows with a benchmark ID are "
+        "converted",
+    )
+    parser.add_argument(
+        "--catalog_query",
+        type=str,
+        default=None,
+        help="Pandas query on the columns of the catalog of --catalog_filter selecting the windows to convert, "
+        'e.g., "num_lane_changes > 0"',
     )
     parser.add_argument(
         "--num_vertices",
@@ -82,6 +221,174 @@ def get_args() -> argparse.Namespace:
     return parser
 
 
+def event_margins(args):
+    """
+    Reads the margins of the windows placed around events
+
+    :param args: command line arguments
+    :return: time steps before and after each event, None if the recordings are tiled into consecutive windows
+    """
+    return None if args.event_windows is None else tuple(args.event_windows)
+
+
+def create_catalog(args):
+    """
+    Writes a catalog of the windows of the dataset
+
+    :param args: command line arguments
+    """
+    if args.dataset == "highD":
+        catalog = create_highd_catalog(
+            args.input_dir,
+            args.num_time_steps_scenario,
+            args.num_planning_problems,
+            args.keep_ego,
+            args.obstacle_start_at_zero,
+            args.downsample,
+            args.dt,
+            event_margins(args),
+            args.stride,
+            min_ego_arc_length=args.min_ego_arc_length,
+        )
+    elif args.dataset == "inD":
+        catalog = create_ind_catalog(
+            args.input_dir,
+            args.num_time_steps_scenario,
+            args.num_planning_problems,
+            args.keep_ego,
+            args.obstacle_start_at_zero,
+            inD_all=args.inD_all,
+            downsample=args.downsample,
+            target_dt=args.dt,
+            detect_static_vehicles=args.detect_static_vehicles,
+            event_margins=event_margins(args),
+            stride=args.stride,
+            collision_screen=args.collision_screen,
+            min_on_map_ratio=args.min_on_map_ratio,
+            min_ego_arc_length=args.min_ego_arc_length,
+        )
+    else:
+        catalog = create_interaction_catalog(
+            args.input_dir,
+            obstacle_start_at_zero=args.obstacle_start_at_zero,
+            num_planning_problems=args.num_planning_problems,
+            keep_ego=args.keep_ego,
+            num_time_steps_scenario=args.num_time_steps_scenario,
+            downsample=args.downsample,
+            target_dt=args.dt,
+            event_margins=event_margins(args),
+            stride=args.stride,
+            collision_screen=args.collision_screen,
+            min_on_map_ratio=args.min_on_map_ratio,
+            min_ego_arc_length=args.min_ego_arc_length,
+        )
+    filename = write_catalog(catalog, args.output_dir)
+    print("Catalog of {} windows stored in {}".format(len(catalog), filename))
+
+
+def export_windows(args, benchmark_ids=None):
+    """
+    Exports the windows of the dataset as arrays instead of CommonRoad scenarios
+
+    :param args: command line arguments
+    :param benchmark_ids: benchmark IDs of the windows to export, all if None
+    """
+    if args.dataset == "highD":
+        export_highd_windows(
+            args.input_dir,
+            args.output_dir,
+            args.num_time_steps_scenario,
+            args.num_planning_problems,
+            args.keep_ego,
+            args.obstacle_start_at_zero,
+            args.num_processes,
+            args.downsample,
+            args.dt,
+            args.export_format,
+            benchmark_ids,
+            event_margins(args),
+            args.stride,
+            args.shard,
+            args.seed,
+            min_ego_arc_length=args.min_ego_arc_length,
+            critical_ego=args.critical_ego,
+        )
+    elif args.dataset == "inD":
+        export_ind_windows(
+            args.input_dir,
+            args.output_dir,
+            args.num_time_steps_scenario,
+            args.num_planning_problems,
+            args.keep_ego,
+            args.obstacle_start_at_zero,
+            num_processes=args.num_processes,
+            inD_all=args.inD_all,
+            downsample=args.downsample,
+            target_dt=args.dt,
+            detect_static_vehicles=args.detect_static_vehicles,
+            export_format=args.export_format,
+            benchmark_ids=benchmark_ids,
+            event_margins=event_margins(args),
+            stride=args.stride,
+            collision_screen=args.collision_screen,
+            min_on_map_ratio=args.min_on_map_ratio,
+            shard=args.shard,
+            seed=args.seed,
+            min_ego_arc_length=args.min_ego_arc_length,
+            critical_ego=args.critical_ego,
+        )
+    elif args.dataset == "INTERACTION":
+        export_interaction_windows(
+            args.input_dir,
+            args.output_dir,
+            obstacle_start_at_zero=args.obstacle_start_at_zero,
+            num_planning_problems=args.num_planning_problems,
+            keep_ego=args.keep_ego,
+            num_time_steps_scenario=args.num_time_steps_scenario,
+            num_processes=args.num_processes,
+            downsample=args.downsample,
+            target_dt=args.dt,
+            export_format=args.export_format,
+            benchmark_ids=benchmark_ids,
+            event_margins=event_margins(args),
+            stride=args.stride,
+            collision_screen=args.collision_screen,
+            min_on_map_ratio=args.min_on_map_ratio,
+            shard=args.shard,
+            seed=args.seed,
+            min_ego_arc_length=args.min_ego_arc_length,
+            critical_ego=args.critical_ego,
+        )
+
+
+def check_export(args):
+    """
+    Compares the exported windows with the CommonRoad scenarios of the same windows, see
+    export_utils.check_window_arrays
+
+    :param args: command line arguments
+    """
+    # the scenarios of INTERACTION are stored in one directory per map
+    scenario_files = {
+        os.path.splitext(os.path.basename(filename))[0]: filename
+        for filename in glob.glob(os.path.join(args.check_export, "**", "*.xml"), recursive=True)
+    }
+    mismatches = []
+    num_windows = 0
+    for filename in sorted(glob.glob(os.path.join(args.output_dir, "**", "*.npz"), recursive=True)):
+        with np.load(filename) as arrays:
+            arrays = {name: arrays[name] for name in arrays.files}
+        num_windows += len(arrays["benchmark_id"])
+        mismatches += check_window_arrays(arrays, scenario_files, args.keep_ego)
+    print(
+        "{} of {} exported windows differ from the scenarios in {}".format(
+            len(mismatches), num_windows, args.check_export
+        )
+    )
+    for benchmark_id in mismatches:
+        print(benchmark_id)
+
+
 def main(args):
     start_time = time.time()
 
@@ -89,12 +396,53 @@ def main(args):
     os.makedirs(args.output_dir, exist_ok=True)
 
     # check parameters for specific converters
-    if args.dataset != "higD" and (args.downsample != 1 or args.num_vertices != 10):
-        warnings.warn("Downsample and num_vertices are only available for highD converter! Ignored")
+    if args.dataset != "highD" and args.num_vertices != 10:
+        warnings.warn("num_vertices is only available for highD converter! Ignored")
+    if args.dt is not None and args.downsample != 1:
+        warnings.warn("Both dt and downsample are specified, downsample is ignored!")
     if args.dataset != "inD" and args.inD_all:
         warnings.warn("inD_all are only available for inD converter! Ignored")
+    if args.dataset != "inD" and args.detect_static_vehicles:
+        warnings.warn("detect_static_vehicles is only available for inD converter! Ignored")
+    if args.inD_all and args.event_windows is not None:
+        warnings.warn("event_windows is not available with inD_all, the windows follow the ego vehicles! Ignored")
+    if args.inD_all and args.stride is not None:
+        warnings.warn("stride is not available with inD_all, the windows follow the ego vehicles! Ignored")
+    if args.dataset == "highD" and args.collision_screen:
+        warnings.warn("collision_screen is only available for inD and INTERACTION converters! Ignored")
+    if args.dataset == "highD" and args.min_on_map_ratio is not None:
+        warnings.warn("min_on_map_ratio is only available for inD and INTERACTION converters! Ignored")
+    if args.inD_all and args.collision_screen:
+        warnings.warn("collision_screen is not available with inD_all, the windows follow the ego vehicles! Ignored")
+    if args.derive_kinematics and (args.catalog or args.export_format != "xml"):
+        warnings.warn("derive_kinematics is only applied to CommonRoad scenarios! Ignored")
+    if args.dataset != "INTERACTION" and args.crop_radius is not None:
+        warnings.warn("crop_radius is only available for INTERACTION converter! Ignored")
+    if args.crop_radius is not None and (args.catalog or args.export_format != "xml"):
+        warnings.warn("crop_radius is only applied to CommonRoad scenarios! Ignored")
+    if args.event_windows is not None and args.stride is not None:
+        warnings.warn("stride is not applied to event_windows, which are placed around the events! Ignored")
 
-    if args.dataset == "highD":
+    if args.shard is not None and args.catalog:
+        warnings.warn("shard is not applied to catalog, which covers the whole dataset! Ignored")
+
+    if args.catalog_query is not None and args.catalog_filter is None:
+        warnings.warn("catalog_query is only applied with catalog_filter! Ignored")
+    if args.check_export is not None and (args.catalog or args.export_format != "npz"):
+        warnings.warn("check_export is only applied to the npz export! Ignored")
+
+    benchmark_ids = None
+    if args.catalog_filter is not None:
+        benchmark_ids = select_benchmark_ids(args.catalog_filter, args.catalog_query)
+        print("{} windows selected from {}".format(len(benchmark_ids), args.catalog_filter))
+
+    if args.catalog:
+        create_catalog(args)
+    elif args.export_format != "xml":
+        export_windows(args, benchmark_ids)
+        if args.check_export is not None and args.export_format == "npz":
+            check_export(args)
+    elif args.dataset == "highD":
         create_highd_scenarios(
             args.input_dir,
             args.output_dir,
@@ -105,10 +453,18 @@ def main(args):
             args.num_processes,
             args.downsample,
             args.num_vertices,
+            args.dt,
+            benchmark_ids,
+            event_margins(args),
+            args.stride,
+            args.lanelet_assignment,
+            args.derive_kinematics,
+            args.shard,
+            args.seed,
+            min_ego_arc_length=args.min_ego_arc_length,
+            critical_ego=args.critical_ego,
         )
     elif args.dataset == "inD":
-        if args.downsample != 1:
-            warnings.warn("Downsampling only implemented for highD. Using original temporal resolution!")
         create_ind_scenarios(
             args.input_dir,
             args.output_dir,
@@ -118,10 +474,22 @@ def main(args):
             args.obstacle_start_at_zero,
             num_processes=args.num_processes,
             inD_all=args.inD_all,
+            downsample=args.downsample,
+            target_dt=args.dt,
+            detect_static_vehicles=args.detect_static_vehicles,
+            benchmark_ids=benchmark_ids,
+            event_margins=event_margins(args),
+            stride=args.stride,
+            lanelet_assignment=args.lanelet_assignment,
+            collision_screen=args.collision_screen,
+            min_on_map_ratio=args.min_on_map_ratio,
+            derive_kinematics=args.derive_kinematics,
+            shard=args.shard,
+            seed=args.seed,
+            min_ego_arc_length=args.min_ego_arc_length,
+            critical_ego=args.critical_ego,
         )
     elif args.dataset == "INTERACTION":
-        if args.downsample != 1:
-            warnings.warn("Downsampling only implemented for highD. Using original temporal resolution!")
         create_interaction_scenarios(
             args.input_dir,
             args.output_dir,
@@ -130,6 +498,20 @@ def main(args):
             keep_ego=args.keep_ego,
             num_time_steps_scenario=args.num_time_steps_scenario,
             num_processes=args.num_processes,
+            downsample=args.downsample,
+            target_dt=args.dt,
+            benchmark_ids=benchmark_ids,
+            event_margins=event_margins(args),
+            stride=args.stride,
+            lanelet_assignment=args.lanelet_assignment,
+            collision_screen=args.collision_screen,
+            min_on_map_ratio=args.min_on_map_ratio,
+            derive_kinematics=args.derive_kinematics,
+            crop_radius=args.crop_radius,
+            shard=args.shard,
+            seed=args.seed,
+            min_ego_arc_length=args.min_ego_arc_length,
+            critical_ego=args.critical_ego,
         )
     else:
         print("Unknown dataset in command line parameter!")
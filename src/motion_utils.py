@@ -0,0 +1,172 @@
+__desc__ = """
+Vectorized motion summaries of trajectories, computed from track arrays and cached with the obstacles
+"""
+
+import numpy as np
+import pandas as pd
+from typing import NamedTuple, Union
+
+from commonroad.scenario.obstacle import DynamicObstacle
+
+# velocity below which a vehicle is regarded as standing still [m/s]
+STOP_VELOCITY = 0.5
+
+# name of the attribute under which the summary is cached at an obstacle
+_MOTION_SUMMARY_ATTRIBUTE = "_motion_summary"
+
+
+class MotionSummary(NamedTuple):
+    """
+    Summary of the motion of a single trajectory
+    """
+
+    arc_length: float
+    displacement: float
+    max_velocity: float
+    stop_ratio: float
+    # total turning, the sum of the absolute changes of the orientation between consecutive states
+    heading_change: float
+
+
+def _wrap_to_pi(angles: np.ndarray) -> np.ndarray:
+    return np.arctan2(np.sin(angles), np.cos(angles))
+
+
+def compute_motion_summary(
+    xs: np.ndarray,
+    ys: np.ndarray,
+    velocities: np.ndarray,
+    orientations: np.ndarray,
+    stop_velocity: float = STOP_VELOCITY,
+) -> MotionSummary:
+    """
+    Computes the motion summary of a single trajectory
+
+    :param xs: x-positions of the trajectory
+    :param ys: y-positions of the trajectory
+    :param velocities: velocities of the trajectory
+    :param orientations: orientations of the trajectory in radian
+    :param stop_velocity: velocity below which a state counts as standing still
+    :return: motion summary
+    """
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+    velocities = np.asarray(velocities, dtype=float)
+    orientations = np.asarray(orientations, dtype=float)
+
+    return MotionSummary(
+        arc_length=float(np.sum(np.hypot(np.diff(xs), np.diff(ys)))),
+        displacement=float(np.hypot(xs[-1] - xs[0], ys[-1] - ys[0])),
+        max_velocity=float(np.max(np.abs(velocities))),
+        stop_ratio=float(np.mean(np.abs(velocities) < stop_velocity)),
+        heading_change=float(np.sum(np.abs(_wrap_to_pi(np.diff(orientations))))),
+    )
+
+
+def compute_motion_summaries(
+    track_ids: np.ndarray,
+    xs: np.ndarray,
+    ys: np.ndarray,
+    velocities: np.ndarray,
+    orientations: np.ndarray,
+    stop_velocity: float = STOP_VELOCITY,
+) -> pd.DataFrame:
+    """
+    Computes the motion summaries of all tracks of a recording with grouped reductions.
+    The rows of each track have to be ordered by time, tracks may be interleaved.
+
+    :param track_ids: track ID of each row
+    :param xs: x-position of each row
+    :param ys: y-position of each row
+    :param velocities: velocity of each row
+    :param orientations: orientation in radian of each row
+    :param stop_velocity: velocity below which a state counts as standing still
+    :return: data frame with one row of motion summary per track, indexed by track ID
+    """
+    track_ids = np.asarray(track_ids)
+    order = np.argsort(track_ids, kind="stable")
+    track_ids = track_ids[order]
+    xs = np.asarray(xs, dtype=float)[order]
+    ys = np.asarray(ys, dtype=float)[order]
+    velocities = np.abs(np.asarray(velocities, dtype=float)[order])
+    orientations = np.asarray(orientations, dtype=float)[order]
+
+    unique_ids, starts, counts = np.unique(track_ids, return_index=True, return_counts=True)
+    ends = starts + counts - 1
+
+    # segment lengths and heading changes between consecutive rows, with segments across two tracks masked out
+    segment_lengths = np.zeros_like(xs)
+    segment_lengths[1:] = np.hypot(np.diff(xs), np.diff(ys))
+    segment_lengths[starts] = 0.0
+    segment_heading_changes = np.zeros_like(orientations)
+    segment_heading_changes[1:] = np.abs(_wrap_to_pi(np.diff(orientations)))
+    segment_heading_changes[starts] = 0.0
+
+    return pd.DataFrame(
+        {
+            "arc_length": np.add.reduceat(segment_lengths, starts),
+            "displacement": np.hypot(xs[ends] - xs[starts], ys[ends] - ys[starts]),
+            "max_velocity": np.maximum.reduceat(velocities, starts),
+            "stop_ratio": np.add.reduceat((velocities < stop_velocity).astype(float), starts) / counts,
+            "heading_change": np.add.reduceat(segment_heading_changes, starts),
+        },
+        index=pd.Index(unique_ids, name="track_id"),
+    )
+
+
+def window_arc_lengths(
+    track_ids: np.ndarray, xs: np.ndarray, ys: np.ndarray, starts: np.ndarray, ends: np.ndarray
+) -> np.ndarray:
+    """
+    Computes the lengths of the paths driven within many row ranges of the tracks of a recording at once, with one
+    cumulative sum over all rows. The rows of each track have to be contiguous and ordered by time.
+
+    :param track_ids: track ID of each row
+    :param xs: x-position of each row
+    :param ys: y-position of each row
+    :param starts: first row of each range
+    :param ends: row after the last row of each range, the ranges must not be empty
+    :return: arc length of each range
+    """
+    track_ids = np.asarray(track_ids)
+    segment_lengths = np.zeros(len(track_ids))
+    segment_lengths[1:] = np.hypot(np.diff(xs), np.diff(ys))
+    segment_lengths[1:][track_ids[1:] != track_ids[:-1]] = 0.0
+    cumulative_lengths = np.concatenate(([0.0], np.cumsum(segment_lengths)))
+    # the segment into the first row of a range lies before the range
+    return cumulative_lengths[ends] - cumulative_lengths[np.asarray(starts) + 1]
+
+
+def attach_motion_summary(obstacle: DynamicObstacle, summary: Union[MotionSummary, pd.Series]) -> DynamicObstacle:
+    """
+    Caches the motion summary at the obstacle
+
+    :param obstacle: CommonRoad dynamic obstacle
+    :param summary: motion summary of the obstacle's trajectory
+    :return: obstacle with attached summary
+    """
+    if isinstance(summary, pd.Series):
+        summary = MotionSummary(**{field: float(summary[field]) for field in MotionSummary._fields})
+    setattr(obstacle, _MOTION_SUMMARY_ATTRIBUTE, summary)
+    return obstacle
+
+
+def get_motion_summary(obstacle: DynamicObstacle) -> MotionSummary:
+    """
+    Returns the motion summary cached at the obstacle, computes and caches it if not available
+
+    :param obstacle: CommonRoad dynamic obstacle
+    :return: motion summary of the initial state and the trajectory of the obstacle
+    """
+    summary = getattr(obstacle, _MOTION_SUMMARY_ATTRIBUTE, None)
+    if summary is None:
+        states = [obstacle.initial_state] + obstacle.prediction.trajectory.state_list
+        positions = np.array([state.position for state in states])
+        summary = compute_motion_summary(
+            positions[:, 0],
+            positions[:, 1],
+            np.array([state.velocity for state in states]),
+            np.array([state.orientation for state in states]),
+        )
+        attach_motion_summary(obstacle, summary)
+    return summary
@@ -0,0 +1,119 @@
+__desc__ = """
+Per-frame neighbor index over the tracks of a whole recording for density and criticality metrics
+"""
+
+import numpy as np
+from typing import Tuple
+from scipy.spatial import cKDTree
+
+from data_converters.src.track_utils import TrackIndex
+
+# distance between the positions of two road users up to which they are neighbors [m]
+NEIGHBOR_RADIUS = 50.0
+
+
+def range_minimum(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    Minimum of values over many ranges of rows at once
+
+    :param values: value of each row
+    :param starts: first row of each range
+    :param ends: row after the last row of each range
+    :return: minimum per range, inf for empty ranges
+    """
+    starts = np.asarray(starts, dtype=int)
+    ends = np.asarray(ends, dtype=int)
+    minimum = np.full(len(starts), np.inf)
+    non_empty = ends > starts
+    if len(values) == 0 or not non_empty.any():
+        return minimum
+    # reduceat reduces from each start to the next index, so every range is followed by its end as separator
+    indices = np.column_stack((starts[non_empty], ends[non_empty])).ravel()
+    padded = np.append(np.asarray(values, dtype=float), np.inf)
+    minimum[non_empty] = np.minimum.reduceat(padded, indices)[::2]
+    return minimum
+
+
+class NeighborIndex:
+    """
+    Neighbors of each state of a recording, found with a single KD-tree over the positions of all frames whose third
+    dimension separates the frames. The metrics of each state are computed once, so that windows and ego candidates
+    are scored by range queries over the rows of the track index.
+    """
+
+    def __init__(
+        self,
+        track_index: TrackIndex,
+        xs: np.ndarray,
+        ys: np.ndarray,
+        vxs: np.ndarray,
+        vys: np.ndarray,
+        radius: float = NEIGHBOR_RADIUS,
+    ):
+        """
+        :param track_index: index of the tracks of the recording
+        :param xs: x-position of each row of the track index
+        :param ys: y-position of each row of the track index
+        :param vxs: velocity along the x-axis of each row of the track index
+        :param vys: velocity along the y-axis of each row of the track index
+        :param radius: distance up to which two road users are neighbors
+        """
+        self.track_index = track_index
+        self.radius = radius
+        frames = track_index.tracks_df[track_index.frame_column].values
+        num_rows = len(frames)
+        positions = np.column_stack((xs, ys)).astype(float)
+        velocities = np.column_stack((vxs, vys)).astype(float)
+
+        if num_rows > 1:
+            separation = 2.0 * radius + 1.0
+            tree = cKDTree(np.column_stack((positions, (frames - frames.min()) * separation)))
+            pairs = tree.query_pairs(radius, output_type="ndarray")
+        else:
+            pairs = np.empty((0, 2), dtype=int)
+        first, second = pairs[:, 0], pairs[:, 1]
+
+        relative_positions = positions[second] - positions[first]
+        distances = np.hypot(relative_positions[:, 0], relative_positions[:, 1])
+        # the distance shrinks with the projection of the relative velocity onto the relative position
+        closing_speeds = -np.einsum("ij,ij->i", relative_positions, velocities[second] - velocities[first])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            closing_speeds = np.where(distances > 0.0, closing_speeds / distances, 0.0)
+            times_to_collision = np.where(closing_speeds > 0.0, distances / closing_speeds, np.inf)
+
+        self.neighbor_counts = np.bincount(first, minlength=num_rows) + np.bincount(second, minlength=num_rows)
+        self.min_center_distances = np.full(num_rows, np.inf)
+        self.min_times_to_collision = np.full(num_rows, np.inf)
+        for rows in (first, second):
+            np.minimum.at(self.min_center_distances, rows, distances)
+            np.minimum.at(self.min_times_to_collision, rows, times_to_collision)
+        self._cumulative_counts = np.concatenate(([0], np.cumsum(self.neighbor_counts)))
+
+    def density(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """
+        Number of neighbors summed over ranges of rows, e.g., of the (vehicle, window) pairs of
+        TrackIndex.rows_of_windows
+
+        :param starts: first row of each range
+        :param ends: row after the last row of each range
+        :return: number of neighbors per range
+        """
+        return self._cumulative_counts[np.asarray(ends)] - self._cumulative_counts[np.asarray(starts)]
+
+    def criticality(
+        self, track_ids: np.ndarray, frame_starts: np.ndarray, frame_ends: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Minimal center distance and minimal time-to-collision of road users to any neighbor within frame ranges, e.g.,
+        of ego candidates to the other road users of their windows
+
+        :param track_ids: ID of the track of each pair
+        :param frame_starts: first frame of each pair
+        :param frame_ends: last frame of each pair
+        :return: minimal distance between the positions and minimal time-to-collision per pair, inf without neighbors
+        or without approaching neighbors
+        """
+        starts, ends = self.track_index.rows_of_windows(track_ids, frame_starts, frame_ends)
+        return range_minimum(self.min_center_distances, starts, ends), range_minimum(
+            self.min_times_to_collision, starts, ends
+        )
@@ -1,5 +1,6 @@
+import hashlib
 import random
-import numpy as np
+from typing import Dict, List, Sequence, Union
 from commonroad.scenario.trajectory import State, InitialState
 from commonroad.common.util import Interval, AngleInterval
 from commonroad.geometry.shape import Rectangle
@@ -8,6 +9,9 @@ from commonroad.planning.goal import GoalRegion
 from commonroad.scenario.scenario import Scenario
 from commonroad.scenario.obstacle import ObstacleType, DynamicObstacle
 
+from data_converters.src.helper import make_valid_orientation_intervals_pruned
+from data_converters.src.motion_utils import get_motion_summary
+
 
 class NoCarException(Exception):
     pass
@@ -17,6 +21,71 @@ class NoLengthException(Exception):
     pass
 
 
+def window_rng(seed: Union[int, None], dataset: str, benchmark_id: str) -> Union[random.Random, None]:
+    """
+    Creates the random number generator of a window. It only depends on the seed and on the identity of the window,
+    so that the choices of a window are the same whatever the order in which the windows are converted, e.g., by
+    parallel processes, shards or with a catalog filter.
+
+    :param seed: seed of the conversion, None for the choices seeded with zero, see choose_ego_vehicle
+    :param dataset: name of the dataset
+    :param benchmark_id: benchmark ID of the window, unique per recording and window
+    :return: random number generator of the window, None if seed is None
+    """
+    if seed is None:
+        return None
+    key = "{}/{}/{}".format(seed, dataset, benchmark_id).encode("utf-8")
+    return random.Random(int.from_bytes(hashlib.sha256(key).digest()[:8], "little"))
+
+
+def choose_ego_vehicle(candidates: Sequence, rng: Union[random.Random, None] = None, scores: Union[Dict, None] = None):
+    """
+    Chooses the ego vehicle of a planning problem pseudo-randomly. Without random number generator, every choice is
+    seeded with zero and only depends on the number of candidates. If the candidates are scored, e.g., by
+    conversion_utils.WorkUnit.ego_scores, the first candidate with the highest score is chosen instead.
+
+    :param candidates: obstacles or vehicle IDs eligible as ego vehicle, ordered by their obstacle ID
+    :param rng: random number generator of the window, see window_rng
+    :param scores: score of each candidate, keyed by the candidate itself, random choice if None
+    :return: selected candidate
+    """
+    if scores is not None:
+        return max(candidates, key=lambda candidate: scores[candidate])
+    if rng is None:
+        rng = random.Random(0)
+    return rng.choice(candidates)
+
+
+def select_ego_vehicles(
+    candidates: Sequence,
+    num_planning_problems: int,
+    keep_ego: bool,
+    rng: Union[random.Random, None] = None,
+    scores: Union[Dict, None] = None,
+) -> List:
+    """
+    Selects the ego vehicles of all planning problems of a window like repeated calls of generate_planning_problem,
+    without building the scenario
+
+    :param candidates: vehicle IDs eligible as ego vehicle, ordered by their obstacle ID
+    :param num_planning_problems: number of planning problems
+    :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
+    :param rng: random number generator of the window, see window_rng
+    :param scores: score of each candidate by vehicle ID, see choose_ego_vehicle, random choice if None
+    :return: selected vehicle IDs, one per planning problem
+    """
+    candidates = list(candidates)
+    ego_vehicles = []
+    for _ in range(num_planning_problems):
+        if len(candidates) == 0:
+            raise NoCarException("There is no car in dynamic obstacles which can be used as planning problem.")
+        ego_vehicle = choose_ego_vehicle(candidates, rng, scores)
+        ego_vehicles.append(ego_vehicle)
+        if not keep_ego:
+            candidates.remove(ego_vehicle)
+    return ego_vehicles
+
+
 def obstacle_to_planning_problem(
     obstacle: DynamicObstacle,
     planning_problem_id: int,
@@ -33,10 +102,11 @@ def obstacle_to_planning_problem(
     dynamic_obstacle_final_state = obstacle.prediction.trajectory.final_state
 
     # define orientation, velocity and time step intervals as goal region
-    orientation_interval = AngleInterval(
+    orientation_start, orientation_end = make_valid_orientation_intervals_pruned(
         dynamic_obstacle_final_state.orientation - orientation_half_range,
         dynamic_obstacle_final_state.orientation + orientation_half_range,
     )
+    orientation_interval = AngleInterval(float(orientation_start), float(orientation_end))
     velocity_interval = Interval(
         dynamic_obstacle_final_state.velocity - velocity_half_range,
         dynamic_obstacle_final_state.velocity + velocity_half_range,
@@ -63,7 +133,9 @@ def obstacle_to_planning_problem(
         ]
     )
 
-    dynamic_obstacle_initial_state.yaw_rate = 0.0
+    # derived yaw rates are kept, see kinematics_utils.track_kinematics
+    if dynamic_obstacle_initial_state.yaw_rate is None:
+        dynamic_obstacle_initial_state.yaw_rate = 0.0
     dynamic_obstacle_initial_state.slip_angle = 0.0
 
     return PlanningProblem(planning_problem_id, dynamic_obstacle_initial_state, goal_region)
@@ -76,6 +148,7 @@ def generate_planning_problem(
     time_step_half_range: int = 25,
     keep_ego: bool = False,
     dynamic_obstacle_selected=None,
+    rng: Union[random.Random, None] = None,
 ) -> PlanningProblem:
     """
     Generates planning problem for scenario by taking obstacle trajectory
@@ -85,11 +158,9 @@ def generate_planning_problem(
     :param time_step_half_range: parameter for goal state time step
     :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
     :param dynamic_obstacle_selected: the predefined dynamic obstacles (Only Consider in CHN Merging)
+    :param rng: random number generator of the window, see window_rng
     :return: CommonRoad planning problem
     """
-    # random choose obstacle as ego vehicle
-    random.seed(0)
-
     # only choose car type as ego vehicle
     if dynamic_obstacle_selected is None:
         car_obstacles = [
@@ -98,7 +169,8 @@ def generate_planning_problem(
             if obstacle.obstacle_type == ObstacleType.CAR and obstacle.initial_state.time_step == 0
         ]
         if len(car_obstacles) > 0:
-            dynamic_obstacle_selected = random.choice(car_obstacles)
+            # random choose obstacle as ego vehicle
+            dynamic_obstacle_selected = choose_ego_vehicle(car_obstacles, rng)
         else:
             raise NoCarException("There is no car in dynamic obstacles which can be used as planning problem.")
 
@@ -109,7 +181,7 @@ def generate_planning_problem(
         planning_problem_id = scenario.generate_object_id()
 
     if len(scenario.dynamic_obstacles) > 0:
-        max_time_step = max([obs.prediction.trajectory.state_list[-1].time_step for obs in scenario.dynamic_obstacles])
+        max_time_step = max([obs.prediction.trajectory.final_state.time_step for obs in scenario.dynamic_obstacles])
         final_time_step = min(
             dynamic_obstacle_selected.prediction.trajectory.final_state.time_step + time_step_half_range,
             max_time_step,
@@ -130,17 +202,13 @@ def generate_planning_problem(
 
 
 def filt_traj_len(car_obstacles: list = None, traj_threshold: float = 100.0):
-    filt_car_obstacles = []
-    for car_obstacle in car_obstacles:
-        traj_len = len(car_obstacle.prediction.trajectory.state_list)
-        s = 0.0
-        for i in range(traj_len - 1):
-            # add s
-            delta_position = (
-                car_obstacle.prediction.trajectory.state_list[i].position
-                - car_obstacle.prediction.trajectory.state_list[i + 1].position
-            )
-            s += np.hypot(delta_position[0], delta_position[1])
-        if s > traj_threshold:
-            filt_car_obstacles.append(car_obstacle)
-    return filt_car_obstacles
+    """
+    Filters obstacles by the length of their driven path
+
+    :param car_obstacles: list of dynamic obstacles
+    :param traj_threshold: minimal length of the path [m]
+    :return: obstacles whose path is longer than the threshold
+    """
+    return [
+        car_obstacle for car_obstacle in car_obstacles if get_motion_summary(car_obstacle).arc_length > traj_threshold
+    ]
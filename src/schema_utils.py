@@ -0,0 +1,173 @@
+__desc__ = """
+Dataset-independent columnar schema of the tracks of a recording, which the datasets are normalized into by thin
+adapters, see the obstacle_utils of each dataset
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.stats import circmean
+from typing import Sequence, Union
+
+from commonroad.geometry.shape import Circle, Rectangle, Shape
+from commonroad.scenario.obstacle import DynamicObstacle, ObstacleType, StaticObstacle
+from commonroad.scenario.state import InitialState
+
+from data_converters.src.helper import make_valid_orientations_pruned
+from data_converters.src.track_utils import TrackIndex
+from data_converters.src.trajectory_utils import CompactTrajectory
+
+# columns of every track table, positions and orientations in the CommonRoad frame
+TRACK_COLUMNS = ("track_id", "frame", "x", "y", "velocity", "orientation")
+
+# columns of a track table which are only part of the states if the dataset provides them or they are derived
+OPTIONAL_TRACK_COLUMNS = ("acceleration", "yaw_rate")
+
+# columns of the agents of a track table, indexed by track ID
+AGENT_COLUMNS = ("obstacle_type", "length", "width")
+
+# shapes of the agents, circles have a diameter of length and width, e.g., pedestrians
+AGENT_SHAPES = ("rectangle", "circle")
+
+
+class TrackTable:
+    """
+    Tracks of a recording in one typed, contiguous column per attribute, with the obstacle type and shape of each
+    track. Obstacles, windows and array exports are built from slices of the table, independent of the dataset.
+    """
+
+    def __init__(
+        self,
+        track_ids: np.ndarray,
+        frames: np.ndarray,
+        xs: np.ndarray,
+        ys: np.ndarray,
+        velocities: np.ndarray,
+        orientations: np.ndarray,
+        agents_df: pd.DataFrame,
+        accelerations: Union[np.ndarray, None] = None,
+        yaw_rates: Union[np.ndarray, None] = None,
+    ):
+        """
+        :param track_ids: track ID of each row
+        :param frames: integer frame of each row
+        :param xs: x-positions in the CommonRoad frame
+        :param ys: y-positions in the CommonRoad frame
+        :param velocities: velocities
+        :param orientations: valid orientations in radian in the CommonRoad frame
+        :param agents_df: obstacle_type (value of the CommonRoad obstacle type), length and width indexed by track ID,
+        optionally the shape of each agent, see AGENT_SHAPES, rectangles if not given; parked vehicles are converted to
+        static obstacles
+        :param accelerations: accelerations, not part of the states if None
+        :param yaw_rates: yaw rates, not part of the states if None
+        """
+        columns = {
+            "track_id": np.asarray(track_ids),
+            "frame": np.asarray(frames, dtype=np.int64),
+            "x": np.asarray(xs, dtype=float),
+            "y": np.asarray(ys, dtype=float),
+            "velocity": np.asarray(velocities, dtype=float),
+            "orientation": np.asarray(orientations, dtype=float),
+        }
+        for column, values in zip(OPTIONAL_TRACK_COLUMNS, (accelerations, yaw_rates)):
+            if values is not None:
+                columns[column] = np.asarray(values, dtype=float)
+        self.track_index = TrackIndex(pd.DataFrame(columns), "track_id", "frame")
+        self.agents_df = pd.DataFrame(
+            {
+                "obstacle_type": agents_df.obstacle_type.values,
+                "length": agents_df.length.values.astype(float),
+                "width": agents_df.width.values.astype(float),
+                "shape": agents_df["shape"].values if "shape" in agents_df.columns else AGENT_SHAPES[0],
+            },
+            index=agents_df.index.values,
+        )
+
+        # contiguous columns of the sorted rows, see TrackIndex
+        tracks_df = self.track_index.tracks_df
+        self._columns = {column: tracks_df[column].values for column in tracks_df.columns}
+
+    @property
+    def tracks_df(self) -> pd.DataFrame:
+        return self.track_index.tracks_df
+
+    def column(self, column: str) -> np.ndarray:
+        """
+        Returns a column of the sorted rows, optional columns which are not part of the states are NaN
+
+        :param column: name of a column of TRACK_COLUMNS or OPTIONAL_TRACK_COLUMNS
+        :return: value of each row of the track index
+        """
+        if column not in self._columns and column in OPTIONAL_TRACK_COLUMNS:
+            return np.full(len(self.tracks_df), np.nan)
+        return self._columns[column]
+
+    def state_array(self, fields: Sequence[str]) -> np.ndarray:
+        """
+        Returns the states of the whole recording as one array, see export_utils.build_window_arrays
+
+        :param fields: names of the columns in the order of the last axis
+        :return: one row per row of the track index
+        """
+        return np.column_stack([self.column(field) for field in fields])
+
+    def trajectory(self, track_id, frame_start: int, frame_end: Union[int, None] = None) -> CompactTrajectory:
+        """
+        Slices the states of a track within [frame_start, frame_end]
+
+        :param track_id: ID of the track
+        :param frame_start: first frame, time step zero of the trajectory
+        :param frame_end: last frame, until the end of the track if None
+        :return: trajectory with time steps relative to frame_start
+        """
+        rows = slice(*self.track_index.rows(track_id, frame_start, frame_end))
+        optional = [
+            self._columns[column][rows] if column in self._columns else None for column in OPTIONAL_TRACK_COLUMNS
+        ]
+        return CompactTrajectory(
+            self._columns["frame"][rows.start] - frame_start,
+            self._columns["x"][rows],
+            self._columns["y"][rows],
+            self._columns["orientation"][rows],
+            self._columns["velocity"][rows],
+            *optional,
+        )
+
+    def shape(self, track_id) -> Shape:
+        """
+        Returns the shape of the obstacle of a track
+
+        :param track_id: ID of the track
+        :return: rectangle or circle with the extent of the agent
+        """
+        agent = self.agents_df.loc[track_id]
+        if agent["shape"] == "circle":
+            return Circle(agent.length / 2)
+        return Rectangle(width=agent.width, length=agent.length)
+
+    def generate_obstacle(
+        self, track_id, obstacle_id: int, frame_start: int, frame_end: Union[int, None] = None
+    ) -> Union[StaticObstacle, DynamicObstacle]:
+        """
+        Converts the part of a track within [frame_start, frame_end] to an obstacle, parked vehicles are static
+        obstacles at their mean pose within the frames
+
+        :param track_id: ID of the track
+        :param obstacle_id: unique obstacle ID in the CommonRoad scenario
+        :param frame_start: frame of time step zero of the scenario
+        :param frame_end: last frame of the scenario, until the end of the track if None
+        :return: CommonRoad static or dynamic obstacle
+        """
+        obstacle_type = ObstacleType(self.agents_df.obstacle_type.loc[track_id])
+        if obstacle_type == ObstacleType.PARKED_VEHICLE:
+            rows = slice(*self.track_index.rows(track_id, frame_start, frame_end))
+            initial_state = InitialState(
+                time_step=0,
+                position=np.array([np.average(self._columns["x"][rows]), np.average(self._columns["y"][rows])]),
+                orientation=float(make_valid_orientations_pruned(circmean(self._columns["orientation"][rows]))),
+                velocity=0.0,
+                acceleration=0.0,
+            )
+            return StaticObstacle(obstacle_id, obstacle_type, self.shape(track_id), initial_state)
+        return self.trajectory(track_id, frame_start, frame_end).to_dynamic_obstacle(
+            obstacle_id, obstacle_type, self.shape(track_id)
+        )
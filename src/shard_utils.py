@@ -0,0 +1,109 @@
+__desc__ = """
+Deterministic partitioning of the work units of a conversion into shards, e.g., for nodes without a coordinator
+"""
+
+import os
+import glob
+import zlib
+import numpy as np
+from typing import List, Sequence, Tuple, Union
+
+
+def parse_shard(text: str) -> Tuple[int, int]:
+    """
+    Parses a shard given as i/N, with 0 <= i < N
+
+    :param text: index and number of shards separated by a slash, e.g., 0/4
+    :return: index and number of shards
+    """
+    try:
+        index, num_shards = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise ValueError("shard {} is not of the form i/N".format(text))
+    if num_shards < 1 or not 0 <= index < num_shards:
+        raise ValueError("shard index {} is not within [0, {})".format(index, num_shards))
+    return index, num_shards
+
+
+def assign_shards(names: Sequence[str], costs: Sequence[float], num_shards: int) -> np.ndarray:
+    """
+    Assigns work units to shards, balancing their costs: the units are handed out by decreasing cost, each one to the
+    shard with the lowest total cost so far. Units of equal cost are ordered by a stable hash of their names, so that
+    every node computes the same assignment from the same dataset, independent of its listing order.
+
+    :param names: unique name of each work unit, e.g., the file name of a recording
+    :param costs: estimated cost of each work unit, e.g., the size of its track files
+    :param num_shards: number of shards
+    :return: shard index of each work unit
+    """
+    hashes = [zlib.crc32(name.encode("utf-8")) for name in names]
+    order = sorted(range(len(names)), key=lambda unit: (-costs[unit], hashes[unit], names[unit]))
+    loads = np.zeros(num_shards)
+    shards = np.zeros(len(names), dtype=int)
+    for unit in order:
+        shards[unit] = int(np.argmin(loads))
+        loads[shards[unit]] += costs[unit]
+    return shards
+
+
+def select_shard(shard: Tuple[int, int], names: Sequence[str], costs: Sequence[float]) -> List[int]:
+    """
+    Selects the work units of a shard, see assign_shards
+
+    :param shard: index and number of shards
+    :param names: unique name of each work unit
+    :param costs: estimated cost of each work unit
+    :return: indices of the work units of the shard, in their original order
+    """
+    index, num_shards = shard
+    selected = np.flatnonzero(assign_shards(names, costs, num_shards) == index).tolist()
+    print("Shard {}/{}: {} of {} work units".format(index, num_shards, len(selected), len(names)))
+    return selected
+
+
+def shard_recordings(
+    shard: Union[Tuple[int, int], None],
+    listing_recording: List[str],
+    listing_metas: List[str],
+    listing_tracks: List[str],
+) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Selects the recordings of a shard of highD or inD, weighted by the size of their track files
+
+    :param shard: index and number of shards, all recordings if None
+    :param listing_recording: paths to the *_recordingMeta.csv files
+    :param listing_metas: paths to the *_tracksMeta.csv files
+    :param listing_tracks: paths to the *_tracks.csv files
+    :return: paths of the recordings of the shard
+    """
+    if shard is None:
+        return listing_recording, listing_metas, listing_tracks
+    selected = select_shard(
+        shard,
+        [os.path.basename(tracks_fn) for tracks_fn in listing_tracks],
+        [os.path.getsize(tracks_fn) for tracks_fn in listing_tracks],
+    )
+    return (
+        [listing_recording[unit] for unit in selected],
+        [listing_metas[unit] for unit in selected],
+        [listing_tracks[unit] for unit in selected],
+    )
+
+
+def shard_locations(shard: Union[Tuple[int, int], None], locations: List[str], directories: List[str]) -> List[str]:
+    """
+    Selects the maps of a shard of INTERACTION, weighted by the size of their track files. A map is not split, since
+    the configuration IDs of its scenarios are numbered across all of its track files.
+
+    :param shard: index and number of shards, all maps if None
+    :param locations: location name of each map
+    :param directories: path to the directory with the track files of each map
+    :return: location names of the maps of the shard
+    """
+    if shard is None:
+        return locations
+    costs = [
+        sum(os.path.getsize(path_file) for path_file in glob.glob(os.path.join(directory, "*.csv")))
+        for directory in directories
+    ]
+    return [locations[unit] for unit in select_shard(shard, locations, costs)]
@@ -0,0 +1,273 @@
+__desc__ = """
+Operations on the columnar track data of a whole recording, shared by all converters
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, Tuple, Union
+
+
+def _track_boundaries(track_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the first row and the number of rows of each track, the rows of a track have to be contiguous
+
+    :param track_ids: track ID of each row
+    :return: first rows and numbers of rows
+    """
+    is_start = np.ones(len(track_ids), dtype=bool)
+    is_start[1:] = track_ids[1:] != track_ids[:-1]
+    starts = np.flatnonzero(is_start)
+    counts = np.diff(np.append(starts, len(track_ids)))
+    return starts, counts
+
+
+def unwrap_angles(angles: np.ndarray, track_ids: np.ndarray, period: float = 2 * np.pi) -> np.ndarray:
+    """
+    Unwraps the angles of each track separately, removing jumps of one period between consecutive rows
+
+    :param angles: angle of each row, the rows of a track have to be contiguous and ordered by time
+    :param track_ids: track ID of each row
+    :param period: period of the angles, e.g., 2 * pi for radian and 360 for degree
+    :return: unwrapped angles
+    """
+    angles = np.asarray(angles, dtype=float)
+    if len(angles) == 0:
+        return angles
+    starts, counts = _track_boundaries(np.asarray(track_ids))
+
+    deltas = np.zeros_like(angles)
+    deltas[1:] = np.diff(angles)
+    deltas = np.mod(deltas + period / 2, period) - period / 2
+    deltas[starts] = 0.0
+    cumulative_deltas = np.cumsum(deltas)
+
+    # restart the accumulation at the first angle of each track
+    offsets = np.repeat(angles[starts] - cumulative_deltas[starts], counts)
+    return cumulative_deltas + offsets
+
+
+def resample_tracks(
+    tracks_df: pd.DataFrame,
+    id_column: str,
+    frame_column: str,
+    dt: float,
+    downsample: int = 1,
+    target_dt: Union[float, None] = None,
+    angle_columns: Union[Dict[str, float], None] = None,
+) -> Tuple[pd.DataFrame, float]:
+    """
+    Resamples the tracks of a recording to a new time step size.
+    Frame k of the resampled tracks corresponds to time k * new_dt of the recording. If the new time step size is an
+    integer multiple of dt, the tracks are decimated; otherwise all float columns are linearly interpolated, angles
+    after unwrapping, and all other columns are taken from the preceding frame.
+
+    :param tracks_df: data frame with the tracks of a recording
+    :param id_column: name of the column with the track IDs
+    :param frame_column: name of the column with the integer frames
+    :param dt: time step size of the recording
+    :param downsample: resample every downsample frames, ignored if target_dt is given
+    :param target_dt: time step size after resampling
+    :param angle_columns: names of the angle columns with their periods, e.g., {"heading": 360.0}
+    :return: resampled tracks and time step size after resampling
+    """
+    if target_dt is None:
+        target_dt = dt * downsample
+    ratio = target_dt / dt
+    if np.isclose(ratio, 1.0):
+        return tracks_df, dt
+
+    tracks_df = tracks_df.sort_values([id_column, frame_column], kind="stable")
+
+    # decimation: keep every frame which is a multiple of the ratio
+    if np.isclose(ratio, round(ratio)):
+        ratio = int(round(ratio))
+        resampled_df = tracks_df[tracks_df[frame_column] % ratio == 0].copy()
+        resampled_df[frame_column] = resampled_df[frame_column] // ratio
+        return resampled_df.reset_index(drop=True), target_dt
+
+    # interpolation: sample each track at all new frames within its time span
+    track_ids = tracks_df[id_column].values
+    frames = tracks_df[frame_column].values.astype(float)
+    starts, counts = _track_boundaries(track_ids)
+    ends = starts + counts - 1
+
+    first_new_frames = np.ceil(frames[starts] / ratio - 1e-9).astype(int)
+    last_new_frames = np.floor(frames[ends] / ratio + 1e-9).astype(int)
+    new_counts = np.maximum(last_new_frames - first_new_frames + 1, 0)
+    track_idx = np.repeat(np.arange(len(starts)), new_counts)
+    new_frames = first_new_frames[track_idx] + (
+        np.arange(len(track_idx)) - np.repeat(np.cumsum(new_counts) - new_counts, new_counts)
+    )
+
+    # locate the preceding row of each new frame by searching in frames made unique over all tracks
+    frame_span = frames.max() - frames.min() + 2.0
+    keys = np.repeat(np.arange(len(starts)), counts) * frame_span + frames
+    query = track_idx * frame_span + new_frames * ratio
+    left = np.clip(np.searchsorted(keys, query, side="right") - 1, starts[track_idx], ends[track_idx])
+    right = np.minimum(left + 1, ends[track_idx])
+    frame_gaps = frames[right] - frames[left]
+    weights = np.divide(new_frames * ratio - frames[left], frame_gaps, out=np.zeros(len(left)), where=frame_gaps > 0)
+
+    angle_columns = angle_columns or {}
+    resampled = {}
+    for column in tracks_df.columns:
+        values = tracks_df[column].values
+        if column == frame_column:
+            resampled[column] = new_frames
+        elif column in angle_columns:
+            period = angle_columns[column]
+            unwrapped = unwrap_angles(values, track_ids, period)
+            interpolated = unwrapped[left] + weights * (unwrapped[right] - unwrapped[left])
+            resampled[column] = np.mod(interpolated + period / 2, period) - period / 2
+        elif np.issubdtype(values.dtype, np.floating):
+            resampled[column] = values[left] + weights * (values[right] - values[left])
+        else:
+            resampled[column] = values[left]
+
+    return pd.DataFrame(resampled, columns=tracks_df.columns), target_dt
+
+
+def update_tracks_meta(
+    tracks_meta_df: pd.DataFrame,
+    tracks_df: pd.DataFrame,
+    id_column: str,
+    frame_column: str = "frame",
+) -> pd.DataFrame:
+    """
+    Updates the first frame, last frame and number of frames of the track meta information after resampling
+    and drops tracks without remaining frames
+
+    :param tracks_meta_df: meta information with columns initialFrame, finalFrame and numFrames
+    :param tracks_df: resampled tracks
+    :param id_column: name of the column with the track IDs in both data frames
+    :param frame_column: name of the column with the frames in tracks_df
+    :return: updated meta information
+    """
+    frames = tracks_df.groupby(id_column)[frame_column].agg(["min", "max", "count"])
+    tracks_meta_df = tracks_meta_df[tracks_meta_df[id_column].isin(frames.index)].copy()
+    frames = frames.loc[tracks_meta_df[id_column].values]
+    tracks_meta_df["initialFrame"] = frames["min"].values
+    tracks_meta_df["finalFrame"] = frames["max"].values
+    tracks_meta_df["numFrames"] = frames["count"].values
+    return tracks_meta_df
+
+
+class TrackIndex:
+    """
+    Index of the tracks of a recording which slices the rows of a single track and frame range without masking the
+    whole data frame. A frame recorded several times for the same track keeps its first row, so that every consumer of
+    the index sees the same single state per track and frame.
+    """
+
+    def __init__(self, tracks_df: pd.DataFrame, id_column: str, frame_column: str = "frame"):
+        """
+        :param tracks_df: data frame with the tracks of a recording
+        :param id_column: name of the column with the track IDs
+        :param frame_column: name of the column with the integer frames
+        """
+        self.id_column = id_column
+        self.frame_column = frame_column
+        tracks_df = tracks_df.sort_values([id_column, frame_column], kind="stable")
+        track_ids = tracks_df[id_column].values
+        frames = tracks_df[frame_column].values
+        repeated = np.zeros(len(tracks_df), dtype=bool)
+        repeated[1:] = (track_ids[1:] == track_ids[:-1]) & (frames[1:] == frames[:-1])
+        if np.any(repeated):
+            tracks_df = tracks_df[~repeated]
+        self.tracks_df = tracks_df.reset_index(drop=True)
+        self._frames = self.tracks_df[frame_column].values
+        track_ids = self.tracks_df[id_column].values
+        starts, counts = _track_boundaries(track_ids)
+        self.track_ids = track_ids[starts]
+        self._starts = starts
+        self._rows = {
+            track_id: (start, start + count) for track_id, start, count in zip(self.track_ids, starts, counts)
+        }
+        self._static_track_ids = {}
+
+    def __contains__(self, track_id) -> bool:
+        return track_id in self._rows
+
+    def rows(
+        self, track_id, frame_start: Union[int, None] = None, frame_end: Union[int, None] = None
+    ) -> Tuple[int, int]:
+        """
+        Returns the range of rows of a track in tracks_df, optionally restricted to the frames in
+        [frame_start, frame_end]
+
+        :param track_id: ID of the track
+        :param frame_start: first frame
+        :param frame_end: last frame
+        :return: first row and the row after the last row
+        """
+        start, end = self._rows[track_id]
+        frames = self._frames[start:end]
+        if frame_end is not None:
+            end = start + int(np.searchsorted(frames, frame_end, side="right"))
+        if frame_start is not None:
+            start = start + int(np.searchsorted(frames, frame_start, side="left"))
+        return start, end
+
+    def frame_ranges(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the first and last frame of each track
+
+        :return: first and last frames in the order of track_ids
+        """
+        ends = np.append(self._starts[1:], len(self._frames))[: len(self._starts)] - 1
+        return self._frames[self._starts], self._frames[ends]
+
+    def rows_of_windows(
+        self, track_ids: np.ndarray, frame_starts: np.ndarray, frame_ends: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized version of rows for many pairs of tracks and frame ranges
+
+        :param track_ids: ID of the track of each pair
+        :param frame_starts: first frame of each pair
+        :param frame_ends: last frame of each pair
+        :return: first rows and the rows after the last rows
+        """
+        # rows sorted by track and frame are sorted by the key position of the track * scale + frame
+        positions = np.searchsorted(self.track_ids, track_ids)
+        offset = min(int(self._frames.min(initial=0)), int(np.min(frame_starts, initial=0)))
+        scale = max(int(self._frames.max(initial=0)), int(np.max(frame_ends, initial=0))) - offset + 2
+        row_positions = np.repeat(np.arange(len(self.track_ids)), np.diff(np.append(self._starts, len(self._frames))))
+        keys = row_positions * scale + (self._frames - offset)
+        starts = np.searchsorted(keys, positions * scale + (np.asarray(frame_starts) - offset), side="left")
+        ends = np.searchsorted(keys, positions * scale + (np.asarray(frame_ends) - offset), side="right")
+        return starts, ends
+
+    def track(self, track_id, frame_start: Union[int, None] = None, frame_end: Union[int, None] = None) -> pd.DataFrame:
+        """
+        Returns the rows of a track, optionally restricted to the frames in [frame_start, frame_end]
+
+        :param track_id: ID of the track
+        :param frame_start: first frame
+        :param frame_end: last frame
+        :return: rows of the track ordered by frame
+        """
+        start, end = self.rows(track_id, frame_start, frame_end)
+        return self.tracks_df.iloc[start:end]
+
+    def static_track_ids(self, x_column: str, y_column: str, max_extent: float = 1.0) -> np.ndarray:
+        """
+        Returns the tracks which stay within a bounding box with a diagonal shorter than max_extent during the whole
+        recording, e.g., parked vehicles. The result is computed once with grouped reductions over all tracks and
+        cached.
+
+        :param x_column: name of the column with the x-positions
+        :param y_column: name of the column with the y-positions
+        :param max_extent: maximal diagonal of the bounding box of a static track
+        :return: IDs of the static tracks
+        """
+        key = (x_column, y_column, max_extent)
+        if key not in self._static_track_ids:
+            if len(self.track_ids) == 0:
+                return self.track_ids
+            extents = []
+            for column in (x_column, y_column):
+                values = self.tracks_df[column].values
+                extents.append(np.maximum.reduceat(values, self._starts) - np.minimum.reduceat(values, self._starts))
+            self._static_track_ids[key] = self.track_ids[np.hypot(*extents) < max_extent]
+        return self._static_track_ids[key]
@@ -0,0 +1,216 @@
+__desc__ = """
+Array-backed trajectories which materialize CommonRoad states only when they are needed
+"""
+
+import numpy as np
+from typing import List, Tuple, Union
+
+from commonroad.geometry.shape import Shape
+from commonroad.prediction.prediction import Occupancy, TrajectoryPrediction
+from commonroad.scenario.obstacle import DynamicObstacle, ObstacleType
+from commonroad.scenario.state import InitialState
+from commonroad.scenario.trajectory import Trajectory
+
+from data_converters.src.motion_utils import MotionSummary, attach_motion_summary, compute_motion_summary
+
+
+class CompactTrajectory:
+    """
+    Trajectory with one contiguous float array per state attribute instead of one State object per time step.
+    The converters build these from the track arrays of a recording; the dynamic obstacles created from them keep
+    referencing the arrays and only materialize CommonRoad states when they are accessed, e.g., by the file writer.
+    """
+
+    __slots__ = ("initial_time_step", "xs", "ys", "orientations", "velocities", "accelerations", "yaw_rates")
+
+    def __init__(
+        self,
+        initial_time_step: int,
+        xs: np.ndarray,
+        ys: np.ndarray,
+        orientations: np.ndarray,
+        velocities: np.ndarray,
+        accelerations: Union[np.ndarray, None] = None,
+        yaw_rates: Union[np.ndarray, None] = None,
+    ):
+        """
+        :param initial_time_step: time step of the first state
+        :param xs: x-positions
+        :param ys: y-positions
+        :param orientations: valid orientations in radian
+        :param velocities: velocities
+        :param accelerations: accelerations, not part of the states if None
+        :param yaw_rates: yaw rates, not part of the states if None
+        """
+        self.initial_time_step = int(initial_time_step)
+        self.xs = np.asarray(xs, dtype=float)
+        self.ys = np.asarray(ys, dtype=float)
+        self.orientations = np.asarray(orientations, dtype=float)
+        self.velocities = np.asarray(velocities, dtype=float)
+        self.accelerations = None if accelerations is None else np.asarray(accelerations, dtype=float)
+        self.yaw_rates = None if yaw_rates is None else np.asarray(yaw_rates, dtype=float)
+
+    def __len__(self) -> int:
+        return len(self.xs)
+
+    @property
+    def final_time_step(self) -> int:
+        return self.initial_time_step + len(self) - 1
+
+    def state(self, index: int) -> InitialState:
+        """
+        Materializes a single state
+
+        :param index: index of the state, zero for the initial state
+        :return: CommonRoad state
+        """
+        attributes = {}
+        if self.accelerations is not None:
+            attributes["acceleration"] = self.accelerations[index]
+        if self.yaw_rates is not None:
+            attributes["yaw_rate"] = self.yaw_rates[index]
+        return InitialState(
+            position=np.array([self.xs[index], self.ys[index]]),
+            velocity=self.velocities[index],
+            orientation=self.orientations[index],
+            time_step=self.initial_time_step + index,
+            **attributes,
+        )
+
+    def to_states(self) -> List[InitialState]:
+        """
+        Materializes all states
+
+        :return: CommonRoad states ordered by time
+        """
+        return [self.state(index) for index in range(len(self))]
+
+    def motion_summary(self) -> MotionSummary:
+        """
+        Summarizes the motion without materializing states
+
+        :return: motion summary
+        """
+        return compute_motion_summary(self.xs, self.ys, self.velocities, self.orientations)
+
+    def to_dynamic_obstacle(
+        self, obstacle_id: int, obstacle_type: ObstacleType, obstacle_shape: Shape
+    ) -> DynamicObstacle:
+        """
+        Creates a dynamic obstacle with the first state as initial state, the states of its trajectory are only
+        materialized on first access, see LazyTrajectory
+
+        :param obstacle_id: unique obstacle ID in the CommonRoad scenario
+        :param obstacle_type: CommonRoad obstacle type
+        :param obstacle_shape: shape of the obstacle
+        :return: CommonRoad dynamic obstacle with cached motion summary
+        """
+        dynamic_obstacle = DynamicObstacle(
+            obstacle_id,
+            obstacle_type,
+            obstacle_shape,
+            self.state(0),
+            LazyTrajectoryPrediction(LazyTrajectory(self), obstacle_shape),
+        )
+        return attach_motion_summary(dynamic_obstacle, self.motion_summary())
+
+
+class LazyTrajectory(Trajectory):
+    """
+    Trajectory whose states are materialized from a compact trajectory on first access. Until then, it only
+    references the arrays of the compact trajectory. It overrides the private members of Trajectory of the
+    commonroad-io version pinned in requirements.txt.
+    """
+
+    def __init__(self, compact_trajectory: CompactTrajectory, first_index: int = 1):
+        """
+        :param compact_trajectory: states as arrays
+        :param first_index: index of the first state of the trajectory, the states before belong to the initial state
+        of the obstacle
+        """
+        # Trajectory.__init__ validates and stores the list of states, which is deferred here
+        self.initial_time_step = compact_trajectory.initial_time_step + first_index
+        self._compact_trajectory = compact_trajectory
+        self._first_index = first_index
+        self._states = None
+
+    @property
+    def _state_list(self) -> Tuple[InitialState, ...]:
+        if self._states is None:
+            self._states = tuple(
+                self._compact_trajectory.state(index)
+                for index in range(self._first_index, len(self._compact_trajectory))
+            )
+        return self._states
+
+    @_state_list.setter
+    def _state_list(self, state_list: Tuple[InitialState, ...]):
+        self._states = tuple(state_list)
+
+    @property
+    def final_state(self) -> InitialState:
+        if self._states is None:
+            return self._compact_trajectory.state(len(self._compact_trajectory) - 1)
+        return self._states[-1]
+
+    def positions(self) -> np.ndarray:
+        """
+        Returns the positions of the states without materializing them
+
+        :return: array of shape states x 2
+        """
+        if self._states is None:
+            rows = slice(self._first_index, None)
+            return np.column_stack((self._compact_trajectory.xs[rows], self._compact_trajectory.ys[rows]))
+        return np.array([state.position for state in self._states]).reshape(-1, 2)
+
+
+class LazyTrajectoryPrediction(TrajectoryPrediction):
+    """
+    Trajectory prediction whose occupancies are created on first access, the file writer only needs the trajectory.
+    Like LazyTrajectory, it overrides private members of the pinned commonroad-io version.
+    """
+
+    def __init__(self, trajectory: LazyTrajectory, shape: Shape):
+        """
+        :param trajectory: trajectory of the prediction
+        :param shape: shape of the obstacle
+        """
+        # TrajectoryPrediction.__init__ creates the occupancy of every state, which is deferred here
+        self.shape = shape
+        self.trajectory = trajectory
+        self.shape_lanelet_assignment = None
+        self.center_lanelet_assignment = None
+        self.initial_time_step = trajectory.initial_time_step
+        self._occupancies = None
+
+    @property
+    def _occupancy_set(self) -> List[Occupancy]:
+        if self._occupancies is None:
+            self._occupancies = self._create_occupancy_set()
+        return self._occupancies
+
+    @_occupancy_set.setter
+    def _occupancy_set(self, occupancy_set: List[Occupancy]):
+        self._occupancies = occupancy_set
+
+    @property
+    def final_time_step(self) -> int:
+        return self._trajectory.final_state.time_step
+
+    @final_time_step.setter
+    def final_time_step(self, final_time_step: int):
+        # derived from the trajectory, see the setter of Prediction.occupancy_set
+        pass
+
+
+def trajectory_positions(trajectory: Trajectory) -> np.ndarray:
+    """
+    Returns the positions of the states of a trajectory, without materializing the states of a LazyTrajectory
+
+    :param trajectory: CommonRoad trajectory
+    :return: array of shape states x 2
+    """
+    if isinstance(trajectory, LazyTrajectory):
+        return trajectory.positions()
+    return np.array([state.position for state in trajectory.state_list]).reshape(-1, 2)
@@ -0,0 +1,170 @@
+__desc__ = """
+Window handling shared by all converters, working on the meta information of the tracks only
+"""
+
+import math
+import numpy as np
+import pandas as pd
+from typing import Tuple, Union
+
+
+def eligibility_mask(
+    initial_frames: np.ndarray,
+    final_frames: np.ndarray,
+    frame_starts: np.ndarray,
+    frame_ends: np.ndarray,
+    obstacle_start_at_zero: bool,
+    min_time_steps: int = 2,
+) -> np.ndarray:
+    """
+    Determines which vehicles are converted to obstacles of which windows.
+    A vehicle is skipped if it appears less than min_time_steps frames after the window starts or before it ends;
+    if obstacles have to start at time step zero, it is also skipped if it appears after the window starts.
+
+    :param initial_frames: first frame of each vehicle
+    :param final_frames: last frame of each vehicle
+    :param frame_starts: first frame of each window
+    :param frame_ends: last frame of each window
+    :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to start
+    at time step zero
+    :param min_time_steps: minimal number of frames a vehicle has to appear within the window
+    :return: boolean mask of shape vehicles x windows
+    """
+    initial_frames = np.asarray(initial_frames)[:, np.newaxis]
+    final_frames = np.asarray(final_frames)[:, np.newaxis]
+    frame_starts = np.atleast_1d(frame_starts)[np.newaxis, :]
+    frame_ends = np.atleast_1d(frame_ends)[np.newaxis, :]
+
+    mask = final_frames - frame_starts >= min_time_steps
+    if obstacle_start_at_zero:
+        mask &= initial_frames <= frame_starts
+    else:
+        mask &= frame_ends - initial_frames >= min_time_steps
+    # an obstacle needs its initial state and at least one more state within the window
+    mask &= np.minimum(final_frames, frame_ends) - np.maximum(initial_frames, frame_starts) >= 1
+    return mask
+
+
+def eligible_vehicle_ids(
+    vehicle_ids: np.ndarray,
+    initial_frames: np.ndarray,
+    final_frames: np.ndarray,
+    frame_start: int,
+    frame_end: int,
+    obstacle_start_at_zero: bool,
+    min_time_steps: int = 2,
+) -> np.ndarray:
+    """
+    Selects the vehicles which are converted to obstacles of a single window, see eligibility_mask
+
+    :param vehicle_ids: ID of each vehicle
+    :param initial_frames: first frame of each vehicle
+    :param final_frames: last frame of each vehicle
+    :param frame_start: first frame of the window
+    :param frame_end: last frame of the window
+    :param obstacle_start_at_zero: boolean indicating if the initial state of an obstacle has to start
+    at time step zero
+    :param min_time_steps: minimal number of frames a vehicle has to appear within the window
+    :return: IDs of the eligible vehicles
+    """
+    mask = eligibility_mask(
+        initial_frames, final_frames, frame_start, frame_end, obstacle_start_at_zero, min_time_steps
+    )
+    return np.asarray(vehicle_ids)[mask[:, 0]]
+
+
+def required_ego_candidates(num_planning_problems: int, keep_ego: bool) -> int:
+    """
+    Number of eligible ego vehicles a scenario needs so that no planning problem runs out of cars
+
+    :param num_planning_problems: number of planning problems per CommonRoad scenario
+    :param keep_ego: boolean indicating if vehicles selected for planning problem should be kept in scenario
+    :return: minimal number of eligible ego vehicles
+    """
+    if num_planning_problems < 1:
+        return 0
+    return 1 if keep_ego else num_planning_problems
+
+
+def event_windows(
+    event_frames: np.ndarray,
+    pre_event_time_steps: int,
+    post_event_time_steps: int,
+    first_frame: int,
+    last_frame: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Places windows of pre_event_time_steps + post_event_time_steps time steps around events instead of tiling the
+    whole recording. Overlapping windows are de-duplicated: events within a placed window are covered by it, and the
+    window of a later event starts after the end of the previous window at the earliest, shortening its margin before
+    the event.
+
+    :param event_frames: frame of each event, in any order and possibly repeated
+    :param pre_event_time_steps: number of time steps of a window before its event
+    :param post_event_time_steps: number of time steps of a window after its event
+    :param first_frame: first frame of the recording
+    :param last_frame: last frame of the recording
+    :return: first and last frame of each window
+    """
+    length = pre_event_time_steps + post_event_time_steps
+    frame_starts = []
+    previous_end = first_frame - 1
+    for event_frame in np.unique(event_frames):
+        if event_frame <= previous_end:
+            continue
+        frame_start = max(event_frame - pre_event_time_steps, previous_end + 1)
+        # windows at the end of the recording are shifted back, at the risk of overlapping the previous window
+        frame_start = max(min(frame_start, last_frame - length), first_frame)
+        frame_starts.append(frame_start)
+        previous_end = frame_start + length
+    frame_starts = np.asarray(frame_starts, dtype=int)
+    return frame_starts, frame_starts + length
+
+
+def sliding_windows(
+    first_frame: int, last_frame: int, window_time_steps: int, stride: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Slides windows of window_time_steps time steps over a recording, consecutive windows overlap if the stride is
+    smaller than the window length
+
+    :param first_frame: first frame of the recording
+    :param last_frame: last frame of the recording
+    :param window_time_steps: number of time steps of a window
+    :param stride: number of time steps between the starts of consecutive windows
+    :return: first and last frame of each window
+    """
+    if stride < 1:
+        raise ValueError("The stride has to be at least one time step, got {}".format(stride))
+    # the last window ends at the end of the recording at the latest, a short recording gets a single window
+    frame_starts = np.arange(first_frame, max(last_frame - window_time_steps, first_frame) + 1, stride)
+    return frame_starts, frame_starts + window_time_steps
+
+
+def get_windows(
+    tracks_meta_df: pd.DataFrame,
+    num_time_steps_scenario: int,
+    stride: Union[int, None] = None,
+    initial_frame_column: str = "initialFrame",
+    final_frame_column: str = "finalFrame",
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Separates a recording into consecutive windows, or slides overlapping windows over it
+
+    :param tracks_meta_df: track meta information of the recording
+    :param num_time_steps_scenario: maximal number of time steps per CommonRoad scenario
+    :param stride: time steps between the starts of consecutive windows, disjoint windows if None
+    :param initial_frame_column: name of the column with the first frame of each track
+    :param final_frame_column: name of the column with the last frame of each track
+    :return: first and last frame of each window
+    """
+    if stride is not None:
+        return sliding_windows(
+            int(tracks_meta_df[initial_frame_column].min()),
+            int(tracks_meta_df[final_frame_column].max()),
+            num_time_steps_scenario,
+            stride,
+        )
+    num_scenarios = math.ceil(max(tracks_meta_df[final_frame_column]) / num_time_steps_scenario)
+    frame_starts = np.arange(num_scenarios) * (num_time_steps_scenario + 1) + 1
+    return frame_starts, frame_starts + num_time_steps_scenario